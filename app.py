@@ -19,7 +19,7 @@ logging.getLogger("uvicorn.access").setLevel(logging.WARNING)  # we log ourselve
 log = logging.getLogger("movesure")
 
 from fastapi import FastAPI, Request, Query, Path
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
@@ -41,11 +41,18 @@ from services.ewaybill.transporter_details_service import get_transporter_detail
 from services.ewaybill.generate_ewaybill_service import generate_ewaybill, generate_delivery_challan_ewaybill
 from services.bilty.reference_data_service import get_reference_data
 from services.bilty.bilty_save_service import save_bilty, get_bilty_with_cities
+from services.bilty.rate_write_queue import flush_rate_queue, get_rate_queue_stats
+from services.bilty.rate_table import get_rate_table_stats
+from services.name_cache import get_name_cache_stats
+from services.challan.available_set import get_available_set_stats
 from services.bilty.payment_tracking_service import (
     save_bilty_payment, save_station_bilty_payment,
     get_bilty_payment_details, get_station_bilty_payment_details
 )
-from services.bilty.consignor_rates_service import get_consignor_rates, get_default_rates, get_all_rates, calculate_dd_charge
+from services.bilty.consignor_rates_service import (
+    get_consignor_rates, get_default_rates, get_all_rates, calculate_dd_charge,
+    calculate_charges_batch,
+)
 from services.bilty.gr_reservation_service import (
     get_next_available_grs, reserve_gr, release_reservation,
     complete_reservation, extend_reservation, get_branch_gr_status,
@@ -68,13 +75,15 @@ from services.challan.challan_book_service import (
 from services.challan.challan_service import (
     list_challans, get_challan, create_challan, update_challan,
     dispatch_challan, undispatch_challan, mark_hub_received, delete_challan,
-    get_challan_init,
+    get_challan_init, get_challan_workspace,
 )
 from services.challan.transit_service import (
     get_available_bilties, get_transit_bilties, add_to_transit,
     remove_from_transit, bulk_remove_from_transit,
-    bulk_update_delivery_status, get_challan_stats,
+    bulk_update_delivery_status,
 )
+from services.challan.challan_stats_service import get_challan_stats, rebuild_challan_stats
+from services.challan.challan_pdf_service import get_challan_pdf, get_challan_pdf_stats
 from services.challan.truck_trip_service import (
     list_trips, get_trip, create_trip, update_trip, delete_trip,
     dispatch_trip, receive_trip, link_challans, unlink_challan,
@@ -86,13 +95,14 @@ from services.crossing_bill.crossing_bill_service import (
     get_unbilled_pohonch, create_crossing_bill, add_transaction,
     update_bill, list_crossing_bills, get_crossing_bill,
     remove_pohonch_from_bill, cancel_crossing_bill, recalculate_crossing_bill,
-    delete_crossing_bill,
+    delete_crossing_bill, get_transport_outstanding, bulk_recalculate_crossing_bills,
 )
 from services.pohonch.pohonch_service import (
-    list_pohonch, get_pohonch, get_pohonch_by_number,
+    list_pohonch, get_pohonch, get_pohonch_by_number, find_pohonch_by_gr,
     update_pohonch, sign_pohonch, unsign_pohonch, delete_pohonch,
 )
 from services.pohonch.pohonch_create_service import create_pohonch_from_gr_items
+from services.pohonch.pohonch_pdf_service import get_pohonch_batch_pdf, get_pohonch_pdf_stats
 from services.pohonch.pohonch_edit_service import (
     edit_pohonch, update_gr_fields, recalculate_pohonch, bulk_recalculate_pohonch,
 )
@@ -110,13 +120,14 @@ from services.invoices.series_service import (
     list_series, create_series, update_series, delete_series,
 )
 from services.invoices.invoice_service import (
-    create_invoice, list_invoices, get_invoice,
+    create_invoice, bulk_create_invoices, list_invoices, get_invoice,
     update_invoice, edit_invoice, cancel_invoice, delete_invoice, update_line_items,
 )
 from services.invoices.payment_service import (
     add_payment, list_payments, delete_payment,
 )
 from services.analytics.party_analytics_service import get_party_analytics
+from services.jobs import get_job
 
 
 @asynccontextmanager
@@ -139,6 +150,7 @@ async def lifespan(app):
     log.info("Available Endpoints:")
     for ep in [
         "GET  /api/health",
+        "GET  /api/metrics",
         "GET  /api/ewaybill?eway_bill_number=XXX&gstin=YYY",
         "POST /api/consolidated-ewaybill",
         "POST /api/transporter-update",
@@ -164,10 +176,15 @@ async def lifespan(app):
     log.info("Token auto-refresh enabled - Server will run continuously!")
     log.info("=" * 70)
     yield
-    # Shutdown — clean up both thread pools
-    from services.thread_pool import shared_pool
+    # Shutdown — write out any coalesced rate saves, then clean up both thread pools
+    try:
+        flush_rate_queue()
+    except Exception as e:
+        log.error("Rate queue flush on shutdown failed: %s", e)
+    from services.thread_pool import job_pool, shared_pool
     _executor.shutdown(wait=False)
     shared_pool.shutdown(wait=False)
+    job_pool.shutdown(wait=False)
 
 
 app = FastAPI(title="Movesure Backend", lifespan=lifespan)
@@ -601,6 +618,33 @@ async def bilty_calculate_dd(
         return JSONResponse(content={"status": "error", "message": f"Internal server error: {str(e)}"}, status_code=500)
 
 
+@app.post("/api/bilty/calculate/batch")
+async def bilty_calculate_batch(request: Request):
+    """
+    Price many bilties in one call (freight, labour, bill, toll, DD, minimum freight).
+
+    Body:
+    {
+      "branch_id": "uuid",            // optional — rates-table fallback when no profile
+      "rows": [
+        { "consignor_id": "uuid", "city_id": "uuid", "weight": 120, "packages": 4,
+          "delivery_type": "door", "ref": "A08044" }
+      ]
+    }
+    DD is charged only for door delivery (is_dd, else delivery_type "door").
+    Returns per-row breakdowns (in request order) plus column totals.
+    """
+    try:
+        data = await request.json()
+        rows = data.get("rows", [])
+        if not rows:
+            return JSONResponse(content={"status": "error", "message": "rows array is required"}, status_code=400)
+        result = await _run(calculate_charges_batch, rows, data.get("branch_id"))
+        return _response(result)
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "message": f"Internal server error: {str(e)}"}, status_code=500)
+
+
 # ============================================================
 # GR RESERVATION ENDPOINTS - Atomic GR number management
 # ============================================================
@@ -750,8 +794,12 @@ async def master_list(
     branch_id: str = Query(None),
     city_id: str = Query(None),
     consignor_id: str = Query(None),
+    cursor: str = Query(None, description="Keyset paging: '' for first page, then next_cursor"),
+    count_mode: str = Query("exact", description="exact | estimated | planned | none"),
+    search_mode: str = Query("contains", description="contains | prefix (name column only)"),
 ):
-    """Paginated list. 40 rows/page. Pass search for text filter."""
+    """Paginated list. 40 rows/page. Pass search for text filter.
+    Pass cursor to switch from offset to keyset paging (flat cost for deep pages)."""
     try:
         filters = {}
         if branch_id:
@@ -760,7 +808,10 @@ async def master_list(
             filters["city_id"] = city_id
         if consignor_id:
             filters["consignor_id"] = consignor_id
-        result = await _run(list_records, entity, page, page_size, search, filters if filters else None)
+        result = await _run(
+            list_records, entity, page, page_size, search, filters if filters else None,
+            cursor, count_mode, search_mode,
+        )
         return _response(result)
     except Exception as e:
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
@@ -1018,6 +1069,16 @@ async def transit_stats(challan_no: str = Path(...)):
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
 
 
+@app.post("/api/challan/transit/stats/{challan_no}/rebuild")
+async def transit_stats_rebuild(challan_no: str = Path(...)):
+    """Recompute cached challan counters from transit_details (repair)."""
+    try:
+        result = await _run(rebuild_challan_stats, challan_no)
+        return _response(result)
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+
 @app.post("/api/challan/transit/add")
 async def transit_add(request: Request):
     try:
@@ -1283,10 +1344,27 @@ async def crossing_bill_pohonch(
     transport_id:    str = Query(None),
     from_date:       str = Query(None),
     to_date:         str = Query(None),
+    include_rows:    bool = Query(True, description="false → preview_totals only"),
 ):
     """Return unbilled pohonch eligible for a new crossing bill."""
     try:
-        result = await _run(get_unbilled_pohonch, transport_gstin, transport_name, transport_id, from_date, to_date)
+        result = await _run(
+            get_unbilled_pohonch, transport_gstin, transport_name, transport_id,
+            from_date, to_date, include_rows,
+        )
+        return _response(result)
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+
+@app.get("/api/crossing-bill/outstanding")
+async def crossing_bill_outstanding(
+    transport_gstin: str = Query(None),
+    as_of:           str = Query(None, description="YYYY-MM-DD, default today"),
+):
+    """Per-transport balances across live bills, with aging of the open ones."""
+    try:
+        result = await _run(get_transport_outstanding, transport_gstin, as_of)
         return _response(result)
     except Exception as e:
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
@@ -1320,6 +1398,41 @@ async def crossing_bill_create(request: Request):
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
 
 
+@app.post("/api/crossing-bill/bulk-recalculate")
+async def crossing_bill_bulk_recalculate(request: Request):
+    """
+    Refresh all open (draft / sent / partial_paid) bills from live pohonch data.
+
+    Body (any combination of selectors):
+    {
+      "bill_ids":        ["uuid1", "uuid2"],
+      "transport_gstin": "09ABCDE1234F1Z5", // full GSTIN, exact match
+      "transport_id":    "uuid",
+      "from_date":       "2026-09-01",     // bills whose period overlaps the range
+      "to_date":         "2026-09-30",
+      "updated_by":      "uuid",
+      "dry_run":         false,
+      "background":      null              // true / false / null = auto (large selections)
+    }
+    """
+    try:
+        data = await request.json()
+        result = await _run(
+            bulk_recalculate_crossing_bills,
+            data.get("bill_ids"),
+            data.get("transport_gstin"),
+            data.get("transport_id"),
+            data.get("from_date"),
+            data.get("to_date"),
+            data.get("updated_by"),
+            bool(data.get("dry_run", False)),
+            data.get("background"),
+        )
+        return _response(result)
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+
 @app.get("/api/crossing-bill/{bill_id}")
 async def crossing_bill_get(bill_id: str = Path(...)):
     try:
@@ -1426,6 +1539,37 @@ async def challan_get(challan_id: str = Path(...)):
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
 
 
+@app.get("/api/challan/{challan_id}/workspace")
+async def challan_workspace(challan_id: str = Path(...)):
+    """Header + transit bilties + stats + challan books in one call."""
+    try:
+        result = await _run(get_challan_workspace, challan_id)
+        return _response(result)
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+
+@app.get("/api/challan/{challan_id}/pdf")
+async def challan_pdf(challan_id: str = Path(...), kind: str = Query("challan")):
+    """Challan (kind=challan) or loading sheet (kind=loading) PDF, streamed."""
+    try:
+        result = await _run(get_challan_pdf, challan_id, kind)
+        if result.get("status") != "success":
+            return _response(result)
+        data = result["data"]
+        return StreamingResponse(
+            data["chunks"],
+            media_type="application/pdf",
+            headers={
+                "Content-Disposition": f'inline; filename="{data["filename"]}"',
+                "ETag": f'"{data["version"]}"',
+                "X-Cache": "HIT" if data["cached"] else "MISS",
+            },
+        )
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+
 @app.put("/api/challan/{challan_id}")
 async def challan_update(request: Request, challan_id: str = Path(...)):
     try:
@@ -1597,6 +1741,7 @@ class BulkKaatUpdateRequest(BaseModel):
     station_name: str
     new_kaat_rate: float
     new_kaat_dd: Optional[float] = None
+    dry_run: bool = False
 
 
 class SingleGrKaatUpdateRequest(BaseModel):
@@ -1619,12 +1764,15 @@ async def kaat_bulk_update(body: BulkKaatUpdateRequest):
       station_name     — partial city name, e.g. "SULTANPUR", "PRATAPGARH"
       new_kaat_rate    — new rate (kaat = weight * new_kaat_rate)
       new_kaat_dd      — optional, updates dd_chrg on each bilty
+      dry_run          — optional; return the old → new diff without writing
+
+    Response includes timing.rows_per_sec for the batched write.
     """
     try:
         result = await _run(
             bulk_update_kaat_rate,
             body.transport_gstin, body.from_date, body.to_date,
-            body.station_name, body.new_kaat_rate, body.new_kaat_dd,
+            body.station_name, body.new_kaat_rate, body.new_kaat_dd, body.dry_run,
         )
         return _response(result)
     except Exception as e:
@@ -1636,6 +1784,7 @@ class BulkKaatUpdateByGrRequest(BaseModel):
     gr_nos: list[str]
     new_kaat_rate: float
     new_kaat_dd: Optional[float] = None
+    dry_run: bool = False
 
 
 @app.post("/api/kaat/bulk-update-by-grs")
@@ -1647,6 +1796,7 @@ async def kaat_bulk_update_by_grs(body: BulkKaatUpdateByGrRequest):
       gr_nos        — list of GR numbers to update (bilty or station type)
       new_kaat_rate — new rate; kaat = weight * new_kaat_rate
       new_kaat_dd   — optional; updates dd_chrg on each bilty
+      dry_run       — optional; return the old → new diff without writing
 
     For each GR, weight/total are fetched from bilty or station_bilty_summary.
     kaat = weight * new_kaat_rate
@@ -1656,7 +1806,7 @@ async def kaat_bulk_update_by_grs(body: BulkKaatUpdateByGrRequest):
     try:
         result = await _run(
             bulk_update_kaat_by_gr_nos,
-            body.gr_nos, body.new_kaat_rate, body.new_kaat_dd,
+            body.gr_nos, body.new_kaat_rate, body.new_kaat_dd, body.dry_run,
         )
         return _response(result)
     except Exception as e:
@@ -1909,22 +2059,69 @@ async def pohonch_list(
     page: int = Query(1),
     page_size: int = Query(40),
     search: str = Query(None),
+    cursor: str = Query(None, description="Keyset paging: '' for first page, then next_cursor"),
+    search_mode: str = Query("contains", description="contains | prefix (pohonch_number only)"),
+    summary: bool = Query(True, description="Include count / signed / amount totals for the filter (first page only)"),
 ):
     """
     List pohonch records with optional filters.
     Filters: transport_name (partial), transport_gstin (exact), is_signed, is_active, search.
+    Pass cursor to switch from offset to keyset paging (flat cost for deep pages).
+    The summary comes with the first page (cursor="" / page=1); reuse it for later pages.
     """
     try:
         result = await _run(
             list_pohonch,
             transport_name, transport_gstin, is_signed, is_active,
-            page, page_size, search,
+            page, page_size, search, cursor, search_mode, summary,
         )
         return _response(result)
     except Exception as e:
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
 
 
+@app.post("/api/pohonch/pdf")
+async def pohonch_batch_pdf(request: Request):
+    """
+    Print a batch of pohonch sheets as ONE multi-page PDF, streamed.
+
+    Body (supply ONE selector):
+    {
+      "pohonch_ids":     ["uuid1", "uuid2"],       // printed in this order
+      "transport_gstin": "09XXXXX",                // + optional window on created_at
+      "date_from":       "2026-09-01",
+      "date_to":         "2026-09-30"
+    }
+
+    Sheets are cached per pohonch by updated_at, so a reprint only renders
+    the pohonch that changed since the last print.
+    """
+    try:
+        data = await request.json()
+        result = await _run(
+            get_pohonch_batch_pdf,
+            data.get("pohonch_ids"),
+            data.get("transport_gstin"),
+            data.get("date_from"),
+            data.get("date_to"),
+        )
+        if result.get("status") != "success":
+            return _response(result)
+        data = result["data"]
+        return StreamingResponse(
+            data["chunks"],
+            media_type="application/pdf",
+            headers={
+                "Content-Disposition": f'inline; filename="{data["filename"]}"',
+                "ETag": f'"{data["version"]}"',
+                "X-Pohonch-Count": str(data["count"]),
+                "X-Pohonch-Cached": str(data["cached"]),
+            },
+        )
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+
 @app.get("/api/pohonch/number/{pohonch_number}")
 async def pohonch_get_by_number(pohonch_number: str = Path(...)):
     """Get a single pohonch by its pohonch_number (e.g. JMST0001)."""
@@ -1935,6 +2132,16 @@ async def pohonch_get_by_number(pohonch_number: str = Path(...)):
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
 
 
+@app.get("/api/pohonch/gr/{gr_no}")
+async def pohonch_find_by_gr(gr_no: str = Path(...)):
+    """Every pohonch that contains gr_no, with that GR's entry."""
+    try:
+        result = await _run(find_pohonch_by_gr, gr_no)
+        return _response(result)
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+
 @app.put("/api/pohonch/{pohonch_id}")
 async def pohonch_update(request: Request, pohonch_id: str = Path(...)):
     """Update pohonch fields. Pass user_id in body for audit trail."""
@@ -2070,11 +2277,16 @@ async def pohonch_bulk_recalculate(request: Request):
       "transport_gstin":  "09XXXXX",
       "transport_name":   "NEW INDIA EXPRESS",
       "user_id": "uuid",
-      "force": false
+      "force": false,
+      "background": null        // true / false / null = auto (large selections)
     }
+
+    A background run returns job_id — poll GET /api/jobs/{job_id} for progress
+    and the final result.
     """
     try:
         data = await request.json()
+        background = data.get("background")
         result = await _run(
             bulk_recalculate_pohonch,
             data.get("pohonch_ids"),
@@ -2083,6 +2295,7 @@ async def pohonch_bulk_recalculate(request: Request):
             data.get("transport_name"),
             data.get("user_id"),
             bool(data.get("force", False)),
+            None if background is None else bool(background),
         )
         return _response(result)
     except Exception as e:
@@ -2146,6 +2359,37 @@ async def health_check():
     )
 
 
+@app.get("/api/metrics")
+async def metrics():
+    """In-process queue / cache counters for this worker."""
+    return JSONResponse(
+        content={
+            "status": "success",
+            "timestamp": datetime.now().isoformat(),
+            "data": {
+                "rate_write_queue": get_rate_queue_stats(),
+                "rate_table": get_rate_table_stats(),
+                "name_cache": get_name_cache_stats(),
+                "available_set": get_available_set_stats(),
+                "challan_pdf": get_challan_pdf_stats(),
+                "pohonch_pdf": get_pohonch_pdf_stats(),
+            },
+        },
+        status_code=200,
+    )
+
+
+@app.get("/api/jobs/{job_id}")
+async def background_job_status(job_id: str = Path(...)):
+    """Progress / result of a background job (e.g. bulk pohonch recalculation)."""
+    try:
+        result = await _run(get_job, job_id)
+        return _response(result)
+    except Exception as e:
+        log.exception("Error in background_job_status: %s", e)
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+
 # ── Startup ──
 
 
@@ -2353,6 +2597,22 @@ async def invoice_create(request: Request):
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
 
 
+@app.post("/api/invoice/bulk-create")
+async def invoice_bulk_create(request: Request):
+    """
+    Create many invoices in one call.
+    Body: { "invoices": [ <create body>, ... ], "defaults": { shared header fields } }
+    Nothing is created if any invoice fails validation.  Numbers are reserved
+    per insert chunk; a chunk that fails leaves its numbers unused and lists
+    them in data.voided_numbers.
+    """
+    try:
+        result = await _run(bulk_create_invoices, await request.json())
+        return _response(result)
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+
+
 @app.get("/api/invoice/list")
 async def invoice_list(
     tenant_id: str = Query(None),
@@ -2366,13 +2626,20 @@ async def invoice_list(
     transport_name: str = Query(None),
     page: int = Query(1),
     page_size: int = Query(50),
+    cursor: str = Query(None, description="Keyset paging: '' for first page, then next_cursor"),
+    summary: bool = Query(True, description="Include count + taxable / tax / total / paid / balance sums for the filter (first page only)"),
 ):
+    """
+    List active invoices, newest first, with totals for the whole filter.
+    Pass cursor to switch from offset to keyset paging (flat cost for deep pages).
+    The summary comes with the first page (cursor="" / page=1); reuse it for later pages.
+    """
     try:
         result = await _run(
             list_invoices,
             tenant_id, receiver_id, status, payment_status,
             invoice_type, from_date, to_date, gr_no, transport_name,
-            page, page_size,
+            page, page_size, cursor, summary,
         )
         return _response(result)
     except Exception as e:
@@ -0,0 +1,28 @@
+-- Migration: Unique key on rates (branch_id, city_id, consignor_id)
+-- Date: 2026-10-19
+-- Purpose: Lets the bilty rate write-behind queue (services/bilty/rate_write_queue.py)
+--          flush many rate saves as ONE upsert with on_conflict = branch_id,city_id,consignor_id
+-- Safe: Removes exact duplicates first (keeps the most recently updated row)
+
+-- ========================================================================
+-- 1. REMOVE DUPLICATE consignor rates (same branch + city + consignor)
+-- ========================================================================
+
+DELETE FROM public.rates r
+USING public.rates d
+WHERE r.branch_id = d.branch_id
+  AND r.city_id = d.city_id
+  AND r.consignor_id = d.consignor_id
+  AND (
+        COALESCE(r.updated_at, r.created_at) < COALESCE(d.updated_at, d.created_at)
+     OR (COALESCE(r.updated_at, r.created_at) = COALESCE(d.updated_at, d.created_at) AND r.id < d.id)
+  );
+
+-- ========================================================================
+-- 2. UNIQUE INDEX used as the upsert conflict target
+-- ========================================================================
+
+-- Default rates have consignor_id NULL; NULLs never conflict, so
+-- multiple default rows per branch+city keep working as before.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_rates_branch_city_consignor
+ON public.rates(branch_id, city_id, consignor_id);
@@ -0,0 +1,65 @@
+-- Migration: Indexes for master-data list screens (keyset paging + search)
+-- Date: 2026-10-19
+-- Purpose: GET /api/bilty/master/{entity} keyset mode orders by (order col, pk)
+--          and search_mode=prefix / contains use ilike on the search columns.
+--          Without these every page / search is a sequential scan.
+-- Safe: Index-only changes (IF NOT EXISTS)
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ========================================================================
+-- 1. KEYSET ORDER INDEXES  (TABLE_CONFIG "order" column + pk)
+-- ========================================================================
+
+CREATE INDEX IF NOT EXISTS idx_cities_name_id
+ON public.cities(city_name, id);
+
+CREATE INDEX IF NOT EXISTS idx_transports_name_id
+ON public.transports(transport_name, id);
+
+CREATE INDEX IF NOT EXISTS idx_transport_admin_name_id
+ON public.transport_admin(transport_name, transport_id);
+
+CREATE INDEX IF NOT EXISTS idx_consignors_name_id
+ON public.consignors(company_name, id);
+
+CREATE INDEX IF NOT EXISTS idx_consignees_name_id
+ON public.consignees(company_name, id);
+
+CREATE INDEX IF NOT EXISTS idx_rates_rate_id
+ON public.rates(rate, id);
+
+-- ========================================================================
+-- 2. TRIGRAM INDEXES  (ilike 'q%' and ilike '%q%' on search columns)
+-- ========================================================================
+
+CREATE INDEX IF NOT EXISTS idx_cities_city_name_trgm
+ON public.cities USING GIN (city_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_cities_city_code_trgm
+ON public.cities USING GIN (city_code gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_transports_transport_name_trgm
+ON public.transports USING GIN (transport_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_transports_gst_number_trgm
+ON public.transports USING GIN (gst_number gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_consignors_company_name_trgm
+ON public.consignors USING GIN (company_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_consignors_gst_num_trgm
+ON public.consignors USING GIN (gst_num gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_consignees_company_name_trgm
+ON public.consignees USING GIN (company_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_consignees_gst_num_trgm
+ON public.consignees USING GIN (gst_num gin_trgm_ops);
+
+-- Refresh planner stats so count_mode=estimated/planned is accurate
+ANALYZE public.cities;
+ANALYZE public.transports;
+ANALYZE public.consignors;
+ANALYZE public.consignees;
+ANALYZE public.rates;
@@ -0,0 +1,144 @@
+-- Migration: get_available_bilties_page RPC (push-down filters + paging)
+-- Date: 2026-10-19
+-- Purpose: GET /api/challan/transit/available used to pull EVERY available GR
+--          through get_available_gr_numbers(100000, 0), fetch full details
+--          for all of them and only then filter + paginate in Python.
+--          This function applies branch / search / payment / city / source
+--          filters and the page window in SQL and returns one page plus the
+--          counts the screen shows.  Filtering, counting and the window only
+--          carry (source, gr_no, id); the full jsonb row is built for the
+--          page's rows alone.
+-- Safe: New function + indexes only (IF NOT EXISTS). get_available_gr_numbers
+--       is left untouched; the service falls back to it when this function
+--       is not installed.
+
+-- ========================================================================
+-- 1. INDEXES
+-- ========================================================================
+
+-- NOT EXISTS (transit_details.gr_no = ...) probe
+CREATE INDEX IF NOT EXISTS idx_transit_details_gr_no
+ON public.transit_details(gr_no);
+
+-- Branch filter + gr_no order for regular bilties
+CREATE INDEX IF NOT EXISTS idx_bilty_branch_gr_active
+ON public.bilty(branch_id, gr_no)
+WHERE is_active = true;
+
+CREATE INDEX IF NOT EXISTS idx_bilty_gr_no
+ON public.bilty(gr_no);
+
+CREATE INDEX IF NOT EXISTS idx_station_bilty_summary_branch_gr
+ON public.station_bilty_summary(branch_id, gr_no);
+
+-- ========================================================================
+-- 2. FUNCTION
+-- ========================================================================
+
+CREATE OR REPLACE FUNCTION public.get_available_bilties_page(
+  p_branch_id    uuid    DEFAULT NULL,
+  p_search       text    DEFAULT NULL,
+  p_payment_mode text    DEFAULT NULL,
+  p_city_id      uuid    DEFAULT NULL,
+  p_source       text    DEFAULT NULL,   -- 'bilty' | 'station' | NULL (both)
+  p_limit        integer DEFAULT 50,
+  p_offset       integer DEFAULT 0
+)
+RETURNS jsonb
+LANGUAGE sql STABLE
+AS $$
+  -- Filters, counts and the page window work on (source, gr_no, id) only;
+  -- the jsonb row is built for the p_limit rows of the page alone.
+  WITH reg AS (
+    SELECT 'bilty'::text AS source_table, b.gr_no::text AS gr_no, b.id
+    FROM bilty b
+    WHERE COALESCE(p_source, 'bilty') = 'bilty'
+      AND b.is_active = true
+      AND b.consignor_name IS DISTINCT FROM 'CANCEL BILTY'
+      AND (p_branch_id IS NULL OR b.branch_id = p_branch_id)
+      AND (p_payment_mode IS NULL OR b.payment_mode = p_payment_mode)
+      AND (p_city_id IS NULL OR b.to_city_id = p_city_id)
+      AND (p_search IS NULL
+           OR b.gr_no ILIKE '%' || p_search || '%'
+           OR b.consignor_name ILIKE '%' || p_search || '%'
+           OR b.consignee_name ILIKE '%' || p_search || '%'
+           OR b.transport_name ILIKE '%' || p_search || '%')
+      AND NOT EXISTS (SELECT 1 FROM transit_details td WHERE td.gr_no = b.gr_no)
+  ),
+  stn AS (
+    SELECT 'station_bilty_summary'::text AS source_table, s.gr_no::text AS gr_no, s.id
+    FROM station_bilty_summary s
+    WHERE COALESCE(p_source, 'station') = 'station'
+      AND (p_branch_id IS NULL OR s.branch_id = p_branch_id)
+      AND (p_payment_mode IS NULL OR s.payment_status = p_payment_mode)
+      AND (p_city_id IS NULL OR s.city_id = p_city_id)
+      AND (p_search IS NULL
+           OR s.gr_no ILIKE '%' || p_search || '%'
+           OR s.consignor ILIKE '%' || p_search || '%'
+           OR s.consignee ILIKE '%' || p_search || '%'
+           OR s.transport_name ILIKE '%' || p_search || '%')
+      AND NOT EXISTS (SELECT 1 FROM transit_details td WHERE td.gr_no = s.gr_no)
+      AND NOT EXISTS (SELECT 1 FROM bilty b WHERE b.gr_no = s.gr_no)
+  ),
+  allrows AS (
+    SELECT * FROM reg
+    UNION ALL
+    SELECT * FROM stn
+  ),
+  page AS (
+    SELECT source_table, gr_no, id
+    FROM allrows
+    ORDER BY source_table, gr_no
+    LIMIT p_limit OFFSET p_offset
+  ),
+  page_rows AS (
+    SELECT p.source_table, p.gr_no,
+           CASE WHEN p.source_table = 'bilty' THEN
+             jsonb_build_object(
+               'id', b.id, 'gr_no', b.gr_no, 'branch_id', b.branch_id,
+               'bilty_date', b.bilty_date, 'delivery_type', b.delivery_type,
+               'consignor_name', b.consignor_name, 'consignor_gst', b.consignor_gst,
+               'consignor_number', b.consignor_number,
+               'consignee_name', b.consignee_name, 'consignee_gst', b.consignee_gst,
+               'consignee_number', b.consignee_number,
+               'transport_name', b.transport_name, 'transport_gst', b.transport_gst,
+               'transport_number', b.transport_number, 'transport_id', b.transport_id,
+               'payment_mode', b.payment_mode, 'no_of_pkg', b.no_of_pkg, 'wt', b.wt,
+               'rate', b.rate, 'freight_amount', b.freight_amount,
+               'labour_charge', b.labour_charge, 'bill_charge', b.bill_charge,
+               'toll_charge', b.toll_charge, 'dd_charge', b.dd_charge,
+               'other_charge', b.other_charge, 'pf_charge', b.pf_charge,
+               'total', b.total, 'from_city_id', b.from_city_id,
+               'to_city_id', b.to_city_id, 'e_way_bill', b.e_way_bill,
+               'pvt_marks', b.pvt_marks, 'remark', b.remark,
+               'saving_option', b.saving_option, 'is_active', b.is_active,
+               'source_table', 'bilty', 'bilty_type', 'reg'
+             )
+           ELSE
+             jsonb_build_object(
+               'id', s.id, 'gr_no', s.gr_no, 'station', s.station,
+               'consignor', s.consignor, 'consignee', s.consignee,
+               'contents', s.contents, 'no_of_packets', s.no_of_packets,
+               'weight', s.weight, 'payment_status', s.payment_status,
+               'amount', s.amount, 'pvt_marks', s.pvt_marks,
+               'delivery_type', s.delivery_type, 'staff_id', s.staff_id,
+               'branch_id', s.branch_id, 'e_way_bill', s.e_way_bill,
+               'transport_id', s.transport_id, 'transport_name', s.transport_name,
+               'transport_gst', s.transport_gst, 'city_id', s.city_id,
+               'created_at', s.created_at, 'updated_at', s.updated_at,
+               'source_table', 'station_bilty_summary', 'bilty_type', 'mnl'
+             )
+           END AS row
+    FROM page p
+    LEFT JOIN bilty b
+      ON p.source_table = 'bilty' AND b.id = p.id
+    LEFT JOIN station_bilty_summary s
+      ON p.source_table = 'station_bilty_summary' AND s.id = p.id
+  )
+  SELECT jsonb_build_object(
+    'rows',          COALESCE((SELECT jsonb_agg(row ORDER BY source_table, gr_no) FROM page_rows), '[]'::jsonb),
+    'total',         (SELECT count(*) FROM allrows),
+    'regular_count', (SELECT count(*) FROM reg),
+    'station_count', (SELECT count(*) FROM stn)
+  );
+$$;
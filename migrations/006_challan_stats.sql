@@ -0,0 +1,71 @@
+-- Migration: challan_stats counters table + bump_challan_stats RPC
+-- Date: 2026-10-19
+-- Purpose: GET /api/challan/transit/stats/{challan_no} used to read every
+--          transit_details row of the challan and then every bilty /
+--          station row to sum packages, weight and amounts on each open.
+--          challan_stats keeps those aggregates (plus delivery-stage
+--          counts) in one row per challan, maintained incrementally by
+--          add / remove / delivery-status updates in transit_service.
+-- Safe: New table + function only. Rows are (re)built lazily by the
+--       service on first read, or via POST /api/challan/transit/stats/{challan_no}/rebuild.
+
+-- ========================================================================
+-- 1. TABLE
+-- ========================================================================
+
+CREATE TABLE IF NOT EXISTS public.challan_stats (
+  challan_no                text PRIMARY KEY,
+  total                     integer NOT NULL DEFAULT 0,
+  regular                   integer NOT NULL DEFAULT 0,
+  station                   integer NOT NULL DEFAULT 0,
+  total_weight              numeric NOT NULL DEFAULT 0,
+  total_packages            integer NOT NULL DEFAULT 0,
+  ewb_count                 integer NOT NULL DEFAULT 0,
+  topay_amount              numeric NOT NULL DEFAULT 0,
+  paid_amount               numeric NOT NULL DEFAULT 0,
+  out_from_branch1          integer NOT NULL DEFAULT 0,
+  delivered_at_branch2      integer NOT NULL DEFAULT 0,
+  out_from_branch2          integer NOT NULL DEFAULT 0,
+  delivered_at_destination  integer NOT NULL DEFAULT 0,
+  door_delivery             integer NOT NULL DEFAULT 0,
+  updated_at                timestamptz NOT NULL DEFAULT now()
+);
+
+-- ========================================================================
+-- 2. ATOMIC DELTA
+-- ========================================================================
+
+-- Adds p_delta (jsonb of column → increment) to an EXISTING row only.
+-- A challan without a row has never been built; inserting a delta would
+-- create a partial aggregate, so the next read builds it in full instead.
+-- Returns true when a row was updated.
+CREATE OR REPLACE FUNCTION public.bump_challan_stats(
+  p_challan_no text,
+  p_delta      jsonb
+)
+RETURNS boolean
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  n integer;
+BEGIN
+  UPDATE public.challan_stats SET
+    total                    = total                    + COALESCE((p_delta ->> 'total')::integer, 0),
+    regular                  = regular                  + COALESCE((p_delta ->> 'regular')::integer, 0),
+    station                  = station                  + COALESCE((p_delta ->> 'station')::integer, 0),
+    total_weight             = total_weight             + COALESCE((p_delta ->> 'total_weight')::numeric, 0),
+    total_packages           = total_packages           + COALESCE((p_delta ->> 'total_packages')::integer, 0),
+    ewb_count                = ewb_count                + COALESCE((p_delta ->> 'ewb_count')::integer, 0),
+    topay_amount             = topay_amount             + COALESCE((p_delta ->> 'topay_amount')::numeric, 0),
+    paid_amount              = paid_amount              + COALESCE((p_delta ->> 'paid_amount')::numeric, 0),
+    out_from_branch1         = out_from_branch1         + COALESCE((p_delta ->> 'out_from_branch1')::integer, 0),
+    delivered_at_branch2     = delivered_at_branch2     + COALESCE((p_delta ->> 'delivered_at_branch2')::integer, 0),
+    out_from_branch2         = out_from_branch2         + COALESCE((p_delta ->> 'out_from_branch2')::integer, 0),
+    delivered_at_destination = delivered_at_destination + COALESCE((p_delta ->> 'delivered_at_destination')::integer, 0),
+    door_delivery            = door_delivery            + COALESCE((p_delta ->> 'door_delivery')::integer, 0),
+    updated_at               = now()
+  WHERE challan_no = p_challan_no;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n > 0;
+END;
+$$;
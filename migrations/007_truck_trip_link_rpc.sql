@@ -0,0 +1,137 @@
+-- Migration: transactional truck-trip creation + challan linking
+-- Date: 2026-10-19
+-- Purpose: truck_trip_service created the trip, then updated challans one
+--          round trip at a time; a failure midway left a trip with only
+--          some challans linked.  These functions do the trip insert, the
+--          challan link update and the count refresh in ONE transaction
+--          (constant round trips regardless of challan count).
+--            • link_challans_to_trip(trip_id, challan_ids[])
+--            • create_trip_with_challans(trip jsonb, challan_ids[])
+-- Safe: New functions only. Same skip rules as before: challans already on
+--       another trip are reported, not moved; inactive ones are ignored.
+
+-- ========================================================================
+-- 1. LINK CHALLANS (one transaction)
+-- ========================================================================
+
+CREATE OR REPLACE FUNCTION public.link_challans_to_trip(
+  p_trip_id     uuid,
+  p_challan_ids uuid[]
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_trip    record;
+  v_linked  jsonb;
+  v_already jsonb;
+  v_missing jsonb;
+  v_count   integer;
+BEGIN
+  SELECT id, status, is_active INTO v_trip
+  FROM public.truck_trips WHERE id = p_trip_id FOR UPDATE;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Trip not found';
+  END IF;
+  IF NOT v_trip.is_active THEN
+    RAISE EXCEPTION 'Trip is inactive';
+  END IF;
+  IF v_trip.status = 'received' THEN
+    RAISE EXCEPTION 'Cannot add challans to a received trip';
+  END IF;
+
+  -- Lock requested challans so a concurrent link cannot interleave
+  PERFORM 1 FROM public.challan_details WHERE id = ANY(p_challan_ids) FOR UPDATE;
+
+  SELECT COALESCE(jsonb_agg(u), '[]'::jsonb) INTO v_missing
+  FROM unnest(p_challan_ids) AS u
+  WHERE NOT EXISTS (SELECT 1 FROM public.challan_details c WHERE c.id = u);
+
+  SELECT COALESCE(jsonb_agg(jsonb_build_object(
+           'challan_no', c.challan_no, 'existing_trip_id', c.truck_trip_id)), '[]'::jsonb)
+    INTO v_already
+  FROM public.challan_details c
+  WHERE c.id = ANY(p_challan_ids)
+    AND c.is_active = true
+    AND c.truck_trip_id IS NOT NULL
+    AND c.truck_trip_id <> p_trip_id;
+
+  WITH upd AS (
+    UPDATE public.challan_details
+    SET truck_trip_id = p_trip_id
+    WHERE id = ANY(p_challan_ids)
+      AND is_active = true
+      AND (truck_trip_id IS NULL OR truck_trip_id = p_trip_id)
+    RETURNING challan_no
+  )
+  SELECT COALESCE(jsonb_agg(challan_no), '[]'::jsonb) INTO v_linked FROM upd;
+
+  SELECT count(*) INTO v_count
+  FROM public.challan_details
+  WHERE truck_trip_id = p_trip_id AND is_active = true;
+
+  UPDATE public.truck_trips SET total_challan_count = v_count WHERE id = p_trip_id;
+
+  RETURN jsonb_build_object(
+    'linked_count',            v_count,
+    'newly_linked',            v_linked,
+    'already_in_another_trip', v_already,
+    'not_found',               v_missing
+  );
+END;
+$$;
+
+-- ========================================================================
+-- 2. CREATE TRIP + LINK (one transaction)
+-- ========================================================================
+
+-- p_trip: { truck_id, driver_id, owner_id, branch_id, remarks, created_by }
+-- trip_no = TR-YYYYMMDD-NNNN (UTC date), serialised per day with an
+-- advisory lock so two concurrent creates cannot pick the same number.
+CREATE OR REPLACE FUNCTION public.create_trip_with_challans(
+  p_trip        jsonb,
+  p_challan_ids uuid[] DEFAULT '{}'
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_prefix text := 'TR-' || to_char(now() AT TIME ZONE 'utc', 'YYYYMMDD') || '-';
+  v_last   text;
+  v_seq    integer := 0;
+  v_trip   public.truck_trips;
+  v_link   jsonb := NULL;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext(v_prefix));
+
+  SELECT trip_no INTO v_last
+  FROM public.truck_trips
+  WHERE trip_no LIKE v_prefix || '%'
+  ORDER BY trip_no DESC
+  LIMIT 1;
+  IF v_last IS NOT NULL THEN
+    BEGIN
+      v_seq := split_part(v_last, '-', 3)::integer;
+    EXCEPTION WHEN others THEN
+      v_seq := 0;
+    END;
+  END IF;
+
+  INSERT INTO public.truck_trips (
+    trip_no, truck_id, driver_id, owner_id, branch_id,
+    status, remarks, created_by, is_active, total_challan_count
+  )
+  SELECT v_prefix || lpad((v_seq + 1)::text, 4, '0'),
+         r.truck_id, r.driver_id, r.owner_id, r.branch_id,
+         'pending', r.remarks, r.created_by, true, 0
+  FROM jsonb_populate_record(NULL::public.truck_trips, p_trip) r
+  RETURNING * INTO v_trip;
+
+  IF COALESCE(array_length(p_challan_ids, 1), 0) > 0 THEN
+    v_link := public.link_challans_to_trip(v_trip.id, p_challan_ids);
+    v_trip.total_challan_count := (v_link ->> 'linked_count')::integer;
+  END IF;
+
+  RETURN jsonb_build_object('trip', to_jsonb(v_trip), 'link', v_link);
+END;
+$$;
@@ -0,0 +1,150 @@
+-- Migration: pohonch_gr_index (gr_no → pohonch_id) maintained by trigger
+-- Date: 2026-10-19
+-- Purpose: kaat_update_service._sync_pohonch_metadata selected EVERY pohonch
+--          row with its bilty_metadata JSON and walked it in Python to find
+--          the few rows holding the updated GRs.  pohonch_gr_index is an
+--          inverted index over pohonch.bilty_metadata so the sync reads and
+--          rewrites only the affected pohonch rows.
+--            • kept in step by a trigger on pohonch (insert / bilty_metadata
+--              update); deletes cascade through the FK
+--            • bulk_update_rows now also accepts 'pohonch' so the touched
+--              rows are written back in one call
+-- Safe: New table, trigger and backfill; bulk_update_rows whitelist only
+--       grows.  The service falls back to scanning pohonch when the index
+--       table does not exist.
+
+-- ========================================================================
+-- 1. TABLE
+-- ========================================================================
+
+CREATE TABLE IF NOT EXISTS public.pohonch_gr_index (
+  gr_no       text NOT NULL,
+  pohonch_id  uuid NOT NULL REFERENCES public.pohonch(id) ON DELETE CASCADE,
+  PRIMARY KEY (gr_no, pohonch_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_pohonch_gr_index_pohonch
+  ON public.pohonch_gr_index (pohonch_id);
+
+-- ========================================================================
+-- 2. TRIGGER
+-- ========================================================================
+
+CREATE OR REPLACE FUNCTION public.sync_pohonch_gr_index()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP = 'UPDATE' AND NEW.bilty_metadata IS NOT DISTINCT FROM OLD.bilty_metadata THEN
+    RETURN NEW;
+  END IF;
+
+  DELETE FROM public.pohonch_gr_index WHERE pohonch_id = NEW.id;
+
+  IF jsonb_typeof(NEW.bilty_metadata) = 'array' THEN
+    INSERT INTO public.pohonch_gr_index (gr_no, pohonch_id)
+    SELECT DISTINCT e ->> 'gr_no', NEW.id
+    FROM jsonb_array_elements(NEW.bilty_metadata) AS e
+    WHERE COALESCE(e ->> 'gr_no', '') <> ''
+    ON CONFLICT DO NOTHING;
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_pohonch_gr_index ON public.pohonch;
+CREATE TRIGGER trg_pohonch_gr_index
+  AFTER INSERT OR UPDATE OF bilty_metadata ON public.pohonch
+  FOR EACH ROW EXECUTE FUNCTION public.sync_pohonch_gr_index();
+
+-- ========================================================================
+-- 3. BACKFILL
+-- ========================================================================
+
+INSERT INTO public.pohonch_gr_index (gr_no, pohonch_id)
+SELECT DISTINCT e ->> 'gr_no', p.id
+FROM public.pohonch p,
+     jsonb_array_elements(
+       CASE WHEN jsonb_typeof(p.bilty_metadata) = 'array' THEN p.bilty_metadata ELSE '[]'::jsonb END
+     ) AS e
+WHERE COALESCE(e ->> 'gr_no', '') <> ''
+ON CONFLICT DO NOTHING;
+
+-- ========================================================================
+-- 4. bulk_update_rows: allow 'pohonch'
+-- ========================================================================
+
+CREATE OR REPLACE FUNCTION public.bulk_update_rows(
+  p_table text,
+  p_pk    text,
+  p_rows  jsonb
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  r          jsonb;
+  fields     jsonb;
+  id_val     text;
+  pk_type    text;
+  target     text;
+  source     text;
+  n          integer;
+  updated    jsonb := '[]'::jsonb;
+  failed     jsonb := '[]'::jsonb;
+BEGIN
+  IF p_table NOT IN (
+    'cities', 'states', 'transports', 'transport_admin',
+    'consignors', 'consignees', 'rates', 'pohonch'
+  ) THEN
+    RAISE EXCEPTION 'bulk_update_rows: table % is not allowed', p_table;
+  END IF;
+
+  -- Compare the pk column in its own type so the pk index is used
+  SELECT format_type(a.atttypid, a.atttypmod)
+    INTO pk_type
+    FROM pg_attribute a
+   WHERE a.attrelid = format('public.%I', p_table)::regclass
+     AND a.attname = p_pk
+     AND NOT a.attisdropped;
+  IF pk_type IS NULL THEN
+    RAISE EXCEPTION 'bulk_update_rows: column % not found on %', p_pk, p_table;
+  END IF;
+
+  FOR r IN SELECT value FROM jsonb_array_elements(p_rows) LOOP
+    id_val := r ->> p_pk;
+    fields := r - p_pk;
+
+    IF id_val IS NULL THEN
+      failed := failed || jsonb_build_object('id', NULL, 'error', format('Missing %s', p_pk));
+      CONTINUE;
+    END IF;
+    IF fields = '{}'::jsonb THEN
+      failed := failed || jsonb_build_object('id', id_val, 'error', 'No fields to update');
+      CONTINUE;
+    END IF;
+
+    SELECT string_agg(format('%I', k), ', '), string_agg(format('s.%I', k), ', ')
+      INTO target, source
+      FROM jsonb_object_keys(fields) AS k;
+
+    BEGIN
+      EXECUTE format(
+        'UPDATE public.%I t SET (%s) = (SELECT %s FROM jsonb_populate_record(NULL::public.%I, $1) s) '
+        'WHERE t.%I = $2::%s',
+        p_table, target, source, p_table, p_pk, pk_type
+      ) USING fields, id_val;
+      GET DIAGNOSTICS n = ROW_COUNT;
+      IF n = 0 THEN
+        failed := failed || jsonb_build_object('id', id_val, 'error', 'Record not found');
+      ELSE
+        updated := updated || to_jsonb(id_val);
+      END IF;
+    EXCEPTION WHEN OTHERS THEN
+      failed := failed || jsonb_build_object('id', id_val, 'error', SQLERRM);
+    END;
+  END LOOP;
+
+  RETURN jsonb_build_object('updated', updated, 'failed', failed);
+END;
+$$;
@@ -0,0 +1,41 @@
+-- Migration: bulk_update_bilty_kaat RPC for kaat bulk updates
+-- Date: 2026-10-19
+-- Purpose: bulk_update_kaat_rate / bulk_update_kaat_by_gr_nos wrote one
+--          bilty_wise_kaat PATCH per GR (thousands for a monthly rate
+--          change).  This function applies a whole chunk of per-GR values
+--          in ONE set-based UPDATE and returns the gr_nos it touched.
+--            p_rows = [{gr_no, actual_kaat_rate, kaat, pf, dd_chrg?}, ...]
+--          dd_chrg is only written when present in the row.
+-- Safe: New function only. The service falls back to grouped
+--       update().in_() calls when it is not installed.
+
+CREATE OR REPLACE FUNCTION public.bulk_update_bilty_kaat(
+  p_rows jsonb
+)
+RETURNS jsonb
+LANGUAGE sql
+AS $$
+  WITH src AS (
+    SELECT DISTINCT ON (r.gr_no) r.*, (e ? 'dd_chrg') AS has_dd
+    FROM jsonb_array_elements(p_rows) AS e,
+         jsonb_to_record(e) AS r(
+           gr_no            text,
+           actual_kaat_rate numeric,
+           kaat             numeric,
+           pf               numeric,
+           dd_chrg          numeric
+         )
+    WHERE r.gr_no IS NOT NULL
+  ),
+  upd AS (
+    UPDATE public.bilty_wise_kaat k SET
+      actual_kaat_rate = src.actual_kaat_rate,
+      kaat             = src.kaat,
+      pf               = src.pf,
+      dd_chrg          = CASE WHEN src.has_dd THEN src.dd_chrg ELSE k.dd_chrg END
+    FROM src
+    WHERE k.gr_no = src.gr_no
+    RETURNING k.gr_no
+  )
+  SELECT COALESCE(jsonb_agg(DISTINCT gr_no), '[]'::jsonb) FROM upd;
+$$;
@@ -0,0 +1,25 @@
+-- Migration: background_jobs table for long-running bulk operations
+-- Date: 2026-10-19
+-- Purpose: Large bulk recalculations (e.g. every pohonch of a transport)
+--          run on a background thread and report progress here, so
+--          GET /api/jobs/{job_id} works no matter which gunicorn worker
+--          the poll lands on.
+-- Safe: New table only. Without it, services/jobs.py keeps job state in
+--       the worker that started the job.
+
+CREATE TABLE IF NOT EXISTS public.background_jobs (
+  id           uuid PRIMARY KEY,
+  kind         text NOT NULL,
+  status       text NOT NULL DEFAULT 'queued',   -- queued | running | done | failed
+  total        integer NOT NULL DEFAULT 0,
+  done         integer NOT NULL DEFAULT 0,
+  result       jsonb,
+  error        text,
+  created_at   timestamptz NOT NULL DEFAULT now(),
+  updated_at   timestamptz NOT NULL DEFAULT now(),
+  started_at   timestamptz,
+  finished_at  timestamptz
+);
+
+CREATE INDEX IF NOT EXISTS idx_background_jobs_kind_created
+  ON public.background_jobs (kind, created_at DESC);
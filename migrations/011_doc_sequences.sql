@@ -0,0 +1,73 @@
+-- Migration: doc_sequences counter table + atomic number allocation RPCs
+-- Date: 2026-10-19
+-- Purpose: pohonch_create_service._next_seq, crossing_bill_service._make_bill_no
+--          and invoice_service._next_invoice_no found the next number with
+--          ilike(prefix%) + order desc + limit 1 — an unindexed pattern
+--          scan on every create that also hands the same number to two
+--          concurrent requests.  Numbers now come from an atomic counter:
+--            • next_doc_seq(key, count, floor)    → last value of the block
+--            • allocate_series_numbers(series_id, count) → invoice_series
+--              current_number bumped in the same statement that reads it
+-- Safe: New table + functions only. Counters are seeded by the service
+--       from the existing max number (p_floor) the first time a key is used;
+--       without the functions the service keeps the old scan.
+
+-- ========================================================================
+-- 1. TABLE
+-- ========================================================================
+
+CREATE TABLE IF NOT EXISTS public.doc_sequences (
+  key         text PRIMARY KEY,            -- e.g. 'pohonch:NIE', 'crossing_bill:CB-202610-'
+  last_value  bigint NOT NULL DEFAULT 0,
+  updated_at  timestamptz NOT NULL DEFAULT now()
+);
+
+-- ========================================================================
+-- 2. ALLOCATE FROM A NAMED COUNTER
+-- ========================================================================
+
+-- Reserves p_count consecutive numbers and returns the LAST one
+-- (block = result - p_count + 1 .. result).  p_floor lifts the counter to
+-- at least that value first, so a new key starts above numbers that were
+-- issued before the counter existed.
+CREATE OR REPLACE FUNCTION public.next_doc_seq(
+  p_key   text,
+  p_count integer DEFAULT 1,
+  p_floor bigint  DEFAULT 0
+)
+RETURNS bigint
+LANGUAGE sql
+AS $$
+  INSERT INTO public.doc_sequences AS s (key, last_value, updated_at)
+  VALUES (p_key, GREATEST(p_floor, 0) + GREATEST(p_count, 1), now())
+  ON CONFLICT (key) DO UPDATE
+    SET last_value = GREATEST(s.last_value, p_floor) + GREATEST(p_count, 1),
+        updated_at = now()
+  RETURNING last_value;
+$$;
+
+-- ========================================================================
+-- 3. ALLOCATE FROM AN INVOICE SERIES
+-- ========================================================================
+
+-- Returns the series formatting fields plus first_number of a block of
+-- p_count numbers; current_number moves past the block atomically.
+CREATE OR REPLACE FUNCTION public.allocate_series_numbers(
+  p_series_id uuid,
+  p_count     integer DEFAULT 1
+)
+RETURNS jsonb
+LANGUAGE sql
+AS $$
+  UPDATE public.invoice_series
+  SET current_number = current_number + GREATEST(p_count, 1),
+      updated_at     = now()
+  WHERE id = p_series_id
+  RETURNING jsonb_build_object(
+    'prefix',          prefix,
+    'suffix',          suffix,
+    'financial_year',  financial_year,
+    'digits',          digits,
+    'first_number',    current_number - GREATEST(p_count, 1)
+  );
+$$;
@@ -0,0 +1,318 @@
+-- Migration: pohonch_items — normalized pohonch line items
+-- Date: 2026-10-19
+-- Purpose: pohonch.bilty_metadata is a JSONB array that was read, patched
+--          and rewritten in full for every single-GR change (update_gr_fields,
+--          kaat sync).  pohonch_items holds one row per (pohonch_id, gr_no)
+--          with gr_no indexed, so single-GR edits and GR lookups are point
+--          operations.  bilty_metadata (and the total_* columns) become a
+--          derived cache:
+--            • whole-list writers (create / edit / recalculate / PUT) still
+--              write bilty_metadata; a trigger fans it out into pohonch_items
+--            • point writers call patch_pohonch_item / patch_pohonch_items_by_gr,
+--              which update pohonch_items and rebuild the cache in SQL, in
+--              the same transaction
+--          pohonch_items also covers the gr_no → pohonch lookup, so the
+--          pohonch_gr_index table from migration 008 is dropped.
+-- Safe: New table, functions and trigger with backfill. The services fall
+--       back to the JSON read-modify-write path when the RPCs are missing.
+
+-- ========================================================================
+-- 1. TABLE
+-- ========================================================================
+
+CREATE TABLE IF NOT EXISTS public.pohonch_items (
+  pohonch_id        uuid    NOT NULL REFERENCES public.pohonch(id) ON DELETE CASCADE,
+  gr_no             text    NOT NULL,
+  position          integer NOT NULL DEFAULT 0,
+  challan_no        text,
+  date              text,
+  amount            numeric,
+  kaat              numeric,
+  pf                numeric,
+  dd                numeric,
+  weight            numeric,
+  packages          integer,
+  kaat_rate         numeric,
+  consignor         text,
+  consignee         text,
+  e_way_bill        text,
+  destination       text,
+  destination_code  text,
+  payment_mode      text,
+  delivery_type     text,
+  pohonch_bilty     text,
+  is_paid           boolean NOT NULL DEFAULT false,
+  extra             jsonb   NOT NULL DEFAULT '{}'::jsonb,   -- any other entry keys
+  PRIMARY KEY (pohonch_id, gr_no)
+);
+
+CREATE INDEX IF NOT EXISTS idx_pohonch_items_gr_no
+  ON public.pohonch_items (gr_no);
+
+-- ========================================================================
+-- 2. ENTRY <-> ROW CONVERSION
+-- ========================================================================
+
+-- Lenient casts: metadata entries may hold '' or junk in numeric fields.
+CREATE OR REPLACE FUNCTION public.pohonch_item_num(v text)
+RETURNS numeric
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+BEGIN
+  RETURN NULLIF(btrim(v), '')::numeric;
+EXCEPTION WHEN others THEN
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.pohonch_item_bool(v text)
+RETURNS boolean
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+BEGIN
+  RETURN COALESCE(NULLIF(btrim(v), '')::boolean, false);
+EXCEPTION WHEN others THEN
+  RETURN false;
+END;
+$$;
+
+-- pohonch_items row → bilty_metadata entry (same keys the services write)
+CREATE OR REPLACE FUNCTION public.pohonch_item_entry(i public.pohonch_items)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT i.extra || jsonb_build_object(
+    'gr_no',            i.gr_no,
+    'date',             COALESCE(i.date, ''),
+    'challan_no',       COALESCE(i.challan_no, ''),
+    'amount',           COALESCE(i.amount, 0),
+    'kaat',             COALESCE(i.kaat, 0),
+    'pf',               COALESCE(i.pf, 0),
+    'dd',               COALESCE(i.dd, 0),
+    'weight',           COALESCE(i.weight, 0),
+    'packages',         COALESCE(i.packages, 0),
+    'consignor',        COALESCE(i.consignor, ''),
+    'consignee',        COALESCE(i.consignee, ''),
+    'kaat_rate',        COALESCE(i.kaat_rate, 0),
+    'e_way_bill',       COALESCE(i.e_way_bill, ''),
+    'destination',      COALESCE(i.destination, ''),
+    'destination_code', COALESCE(i.destination_code, ''),
+    'payment_mode',     COALESCE(i.payment_mode, ''),
+    'delivery_type',    COALESCE(i.delivery_type, ''),
+    'pohonch_bilty',    COALESCE(i.pohonch_bilty, ''),
+    'is_paid',          i.is_paid
+  );
+$$;
+
+-- Replace a pohonch's items with the entries of its bilty_metadata
+CREATE OR REPLACE FUNCTION public.load_pohonch_items(p_pohonch_id uuid, p_meta jsonb)
+RETURNS void
+LANGUAGE sql
+AS $$
+  DELETE FROM public.pohonch_items WHERE pohonch_id = p_pohonch_id;
+
+  INSERT INTO public.pohonch_items (
+    pohonch_id, gr_no, position, challan_no, date, amount, kaat, pf, dd,
+    weight, packages, kaat_rate, consignor, consignee, e_way_bill,
+    destination, destination_code, payment_mode, delivery_type,
+    pohonch_bilty, is_paid, extra
+  )
+  SELECT DISTINCT ON (t.e ->> 'gr_no')
+    p_pohonch_id,
+    t.e ->> 'gr_no',
+    t.pos::integer,
+    t.e ->> 'challan_no',
+    t.e ->> 'date',
+    public.pohonch_item_num(t.e ->> 'amount'),
+    public.pohonch_item_num(t.e ->> 'kaat'),
+    public.pohonch_item_num(t.e ->> 'pf'),
+    public.pohonch_item_num(t.e ->> 'dd'),
+    public.pohonch_item_num(t.e ->> 'weight'),
+    public.pohonch_item_num(t.e ->> 'packages')::integer,
+    public.pohonch_item_num(t.e ->> 'kaat_rate'),
+    t.e ->> 'consignor',
+    t.e ->> 'consignee',
+    t.e ->> 'e_way_bill',
+    t.e ->> 'destination',
+    t.e ->> 'destination_code',
+    t.e ->> 'payment_mode',
+    t.e ->> 'delivery_type',
+    t.e ->> 'pohonch_bilty',
+    public.pohonch_item_bool(t.e ->> 'is_paid'),
+    t.e - ARRAY[
+      'gr_no', 'challan_no', 'date', 'amount', 'kaat', 'pf', 'dd', 'weight',
+      'packages', 'kaat_rate', 'consignor', 'consignee', 'e_way_bill',
+      'destination', 'destination_code', 'payment_mode', 'delivery_type',
+      'pohonch_bilty', 'is_paid'
+    ]
+  FROM jsonb_array_elements(
+         CASE WHEN jsonb_typeof(p_meta) = 'array' THEN p_meta ELSE '[]'::jsonb END
+       ) WITH ORDINALITY AS t(e, pos)
+  WHERE jsonb_typeof(t.e) = 'object' AND COALESCE(t.e ->> 'gr_no', '') <> ''
+  ORDER BY t.e ->> 'gr_no', t.pos;
+$$;
+
+-- ========================================================================
+-- 3. bilty_metadata → pohonch_items (whole-list writers)
+-- ========================================================================
+
+CREATE OR REPLACE FUNCTION public.sync_pohonch_items()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  -- set by rebuild_pohonch_cache: the JSON was just derived from the items
+  IF current_setting('movesure.pohonch_cache_rebuild', true) = 'on' THEN
+    RETURN NEW;
+  END IF;
+  IF TG_OP = 'UPDATE' AND NEW.bilty_metadata IS NOT DISTINCT FROM OLD.bilty_metadata THEN
+    RETURN NEW;
+  END IF;
+  PERFORM public.load_pohonch_items(NEW.id, NEW.bilty_metadata);
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_pohonch_items ON public.pohonch;
+CREATE TRIGGER trg_pohonch_items
+  AFTER INSERT OR UPDATE OF bilty_metadata ON public.pohonch
+  FOR EACH ROW EXECUTE FUNCTION public.sync_pohonch_items();
+
+-- ========================================================================
+-- 4. pohonch_items → bilty_metadata + totals (point writers)
+-- ========================================================================
+
+CREATE OR REPLACE FUNCTION public.rebuild_pohonch_cache(p_pohonch_ids uuid[])
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  PERFORM set_config('movesure.pohonch_cache_rebuild', 'on', true);
+
+  UPDATE public.pohonch p SET
+    bilty_metadata = agg.meta,
+    total_bilties  = agg.n,
+    total_amount   = agg.amount,
+    total_kaat     = agg.kaat,
+    total_pf       = agg.pf,
+    total_dd       = agg.dd,
+    total_packages = agg.packages,
+    total_weight   = agg.weight,
+    updated_at     = now()
+  FROM (
+    SELECT i.pohonch_id,
+           jsonb_agg(public.pohonch_item_entry(i) ORDER BY i.position, i.gr_no) AS meta,
+           count(*)                                   AS n,
+           round(sum(COALESCE(i.amount, 0)), 2)       AS amount,
+           round(sum(COALESCE(i.kaat, 0)), 2)         AS kaat,
+           round(sum(COALESCE(i.pf, 0)), 2)           AS pf,
+           round(sum(COALESCE(i.dd, 0)), 2)           AS dd,
+           sum(COALESCE(i.packages, 0))               AS packages,
+           round(sum(COALESCE(i.weight, 0)), 2)       AS weight
+    FROM public.pohonch_items i
+    WHERE i.pohonch_id = ANY(p_pohonch_ids)
+    GROUP BY i.pohonch_id
+  ) agg
+  WHERE p.id = agg.pohonch_id;
+
+  PERFORM set_config('movesure.pohonch_cache_rebuild', 'off', true);
+END;
+$$;
+
+-- Patch one line item (update_gr_fields).  p_fields may hold any of the
+-- patchable keys; returns {entry, pohonch} or NULL when the GR is not on
+-- this pohonch.
+CREATE OR REPLACE FUNCTION public.patch_pohonch_item(
+  p_pohonch_id  uuid,
+  p_gr_no       text,
+  p_fields      jsonb,
+  p_updated_by  uuid DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_item public.pohonch_items;
+  v_row  public.pohonch;
+BEGIN
+  UPDATE public.pohonch_items SET
+    destination      = CASE WHEN p_fields ? 'destination'      THEN p_fields ->> 'destination'      ELSE destination END,
+    destination_code = CASE WHEN p_fields ? 'destination_code' THEN p_fields ->> 'destination_code' ELSE destination_code END,
+    kaat             = CASE WHEN p_fields ? 'kaat'             THEN public.pohonch_item_num(p_fields ->> 'kaat')      ELSE kaat END,
+    pf               = CASE WHEN p_fields ? 'pf'               THEN public.pohonch_item_num(p_fields ->> 'pf')        ELSE pf END,
+    dd               = CASE WHEN p_fields ? 'dd'               THEN public.pohonch_item_num(p_fields ->> 'dd')        ELSE dd END,
+    kaat_rate        = CASE WHEN p_fields ? 'kaat_rate'        THEN public.pohonch_item_num(p_fields ->> 'kaat_rate') ELSE kaat_rate END,
+    weight           = CASE WHEN p_fields ? 'weight'           THEN public.pohonch_item_num(p_fields ->> 'weight')    ELSE weight END,
+    packages         = CASE WHEN p_fields ? 'packages'         THEN public.pohonch_item_num(p_fields ->> 'packages')::integer ELSE packages END,
+    amount           = CASE WHEN p_fields ? 'amount'           THEN public.pohonch_item_num(p_fields ->> 'amount')    ELSE amount END,
+    pohonch_bilty    = CASE WHEN p_fields ? 'pohonch_bilty'    THEN p_fields ->> 'pohonch_bilty'    ELSE pohonch_bilty END,
+    e_way_bill       = CASE WHEN p_fields ? 'e_way_bill'       THEN p_fields ->> 'e_way_bill'       ELSE e_way_bill END,
+    is_paid          = CASE WHEN p_fields ? 'is_paid'          THEN public.pohonch_item_bool(p_fields ->> 'is_paid')  ELSE is_paid END,
+    payment_mode     = CASE WHEN p_fields ? 'payment_mode'     THEN p_fields ->> 'payment_mode'     ELSE payment_mode END,
+    delivery_type    = CASE WHEN p_fields ? 'delivery_type'    THEN p_fields ->> 'delivery_type'    ELSE delivery_type END
+  WHERE pohonch_id = p_pohonch_id AND gr_no = p_gr_no
+  RETURNING * INTO v_item;
+
+  IF NOT FOUND THEN
+    RETURN NULL;
+  END IF;
+
+  PERFORM public.rebuild_pohonch_cache(ARRAY[p_pohonch_id]);
+  IF p_updated_by IS NOT NULL THEN
+    UPDATE public.pohonch SET updated_by = p_updated_by WHERE id = p_pohonch_id;
+  END IF;
+
+  SELECT * INTO v_row FROM public.pohonch WHERE id = p_pohonch_id;
+  RETURN jsonb_build_object('entry', public.pohonch_item_entry(v_item), 'pohonch', to_jsonb(v_row));
+END;
+$$;
+
+-- Apply kaat values to every line item of the given GRs, on every pohonch
+-- (kaat_update_service sync).  p_rows = [{gr_no, kaat, pf, kaat_dd?, kaat_rate?}]
+-- amount = pf + kaat + dd.  Returns the number of pohonch touched.
+CREATE OR REPLACE FUNCTION public.patch_pohonch_items_by_gr(p_rows jsonb)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_ids uuid[];
+BEGIN
+  WITH src AS (
+    SELECT DISTINCT ON (r.gr_no) r.*
+    FROM jsonb_to_recordset(p_rows) AS r(
+      gr_no text, kaat numeric, pf numeric, kaat_dd numeric, kaat_rate numeric
+    )
+    WHERE r.gr_no IS NOT NULL
+  ),
+  upd AS (
+    UPDATE public.pohonch_items i SET
+      kaat      = src.kaat,
+      pf        = src.pf,
+      dd        = COALESCE(src.kaat_dd, i.dd, 0),
+      amount    = round(COALESCE(src.pf, 0) + COALESCE(src.kaat, 0) + COALESCE(src.kaat_dd, i.dd, 0), 2),
+      kaat_rate = COALESCE(src.kaat_rate, i.kaat_rate)
+    FROM src
+    WHERE i.gr_no = src.gr_no
+    RETURNING i.pohonch_id
+  )
+  SELECT COALESCE(array_agg(DISTINCT pohonch_id), '{}') INTO v_ids FROM upd;
+
+  IF COALESCE(array_length(v_ids, 1), 0) > 0 THEN
+    PERFORM public.rebuild_pohonch_cache(v_ids);
+  END IF;
+  RETURN COALESCE(array_length(v_ids, 1), 0);
+END;
+$$;
+
+-- ========================================================================
+-- 5. BACKFILL + retire pohonch_gr_index (migration 008)
+-- ========================================================================
+
+SELECT public.load_pohonch_items(p.id, p.bilty_metadata) FROM public.pohonch p;
+
+DROP TRIGGER IF EXISTS trg_pohonch_gr_index ON public.pohonch;
+DROP FUNCTION IF EXISTS public.sync_pohonch_gr_index();
+DROP TABLE IF EXISTS public.pohonch_gr_index;
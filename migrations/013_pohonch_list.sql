@@ -0,0 +1,82 @@
+-- Migration: pohonch list indexes + pohonch_list_summary RPC
+-- Date: 2026-10-19
+-- Purpose: GET /api/pohonch/list paged with count="exact" + offset ranges,
+--          searched with ilike '%q%', and the transport screen summed the
+--          totals client-side across pages.  The list now pages by keyset
+--          on (created_at DESC, id DESC), offers an anchored prefix search
+--          on pohonch_number, and returns a summary block (count, signed /
+--          unsigned, amount / kaat / pf / dd sums) from ONE aggregate query
+--          that also replaces the separate COUNT(*).
+-- Safe: Indexes (IF NOT EXISTS) + new function only. Without the function
+--       the service sums the filtered rows page by page instead.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ========================================================================
+-- 1. KEYSET ORDER INDEXES  (filters the list screen actually uses)
+-- ========================================================================
+
+CREATE INDEX IF NOT EXISTS idx_pohonch_active_created_id
+ON public.pohonch(is_active, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_pohonch_gstin_created_id
+ON public.pohonch(transport_gstin, created_at DESC, id DESC);
+
+-- ========================================================================
+-- 2. SEARCH INDEXES
+-- ========================================================================
+
+-- search_mode=prefix: pohonch_number LIKE 'NIE00%' (numbers are upper-case)
+CREATE INDEX IF NOT EXISTS idx_pohonch_number_pattern
+ON public.pohonch(pohonch_number text_pattern_ops);
+
+-- search_mode=contains / transport_name filter: ilike '%q%'
+CREATE INDEX IF NOT EXISTS idx_pohonch_number_trgm
+ON public.pohonch USING GIN (pohonch_number gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_pohonch_transport_name_trgm
+ON public.pohonch USING GIN (transport_name gin_trgm_ops);
+
+-- ========================================================================
+-- 3. SUMMARY
+-- ========================================================================
+
+-- Same filter semantics as services/pohonch/pohonch_service.py list_pohonch:
+-- transport_gstin (exact, wins over transport_name), transport_name (partial),
+-- search (prefix on pohonch_number, or contains on number / transport name).
+CREATE OR REPLACE FUNCTION public.pohonch_list_summary(
+  p_is_active       boolean DEFAULT true,
+  p_is_signed       boolean DEFAULT NULL,
+  p_transport_gstin text    DEFAULT NULL,
+  p_transport_name  text    DEFAULT NULL,
+  p_search          text    DEFAULT NULL,
+  p_search_mode     text    DEFAULT 'contains'
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT jsonb_build_object(
+    'count',          count(*),
+    'signed',         count(*) FILTER (WHERE p.is_signed),
+    'unsigned',       count(*) FILTER (WHERE NOT COALESCE(p.is_signed, false)),
+    'total_bilties',  COALESCE(sum(p.total_bilties), 0),
+    'total_amount',   COALESCE(sum(p.total_amount), 0),
+    'total_kaat',     COALESCE(sum(p.total_kaat), 0),
+    'total_pf',       COALESCE(sum(p.total_pf), 0),
+    'total_dd',       COALESCE(sum(p.total_dd), 0)
+  )
+  FROM public.pohonch p
+  WHERE (p_is_active IS NULL OR p.is_active = p_is_active)
+    AND (p_is_signed IS NULL OR p.is_signed = p_is_signed)
+    AND (p_transport_gstin IS NULL OR p.transport_gstin = p_transport_gstin)
+    AND (p_transport_gstin IS NOT NULL OR p_transport_name IS NULL
+         OR p.transport_name ILIKE '%' || p_transport_name || '%')
+    AND (
+      p_search IS NULL
+      OR (p_search_mode = 'prefix' AND p.pohonch_number LIKE p_search || '%')
+      OR (p_search_mode <> 'prefix' AND (
+            p.pohonch_number ILIKE '%' || p_search || '%'
+         OR p.transport_name ILIKE '%' || p_search || '%'))
+    );
+$$;
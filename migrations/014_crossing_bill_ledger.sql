@@ -0,0 +1,232 @@
+-- Migration: crossing_bill_ledger — per-transport running balances
+-- Date: 2026-10-19
+-- Purpose: Outstanding amounts per transport could only be had by loading
+--          every crossing bill, and add_transaction re-summed the bill's whole
+--          transactions array on each payment.
+--            • add_crossing_bill_transaction appends one transaction and adds
+--              its amount to total_paid_kaat / total_paid_to_transport in a
+--              single UPDATE (no read-modify-write, no lost payments).
+--            • crossing_bill_ledger keeps one row per transport with the sums
+--              over its live bills (total_kaat, total_pf, paid amounts) and the
+--              running balances balance_on_us / balance_on_transport.  A trigger
+--              on crossing_bill applies each bill's change as a delta.
+--            • crossing_bill_outstanding returns the ledger rows together with
+--              aging buckets of the open bills in ONE query
+--              (GET /api/crossing-bill/outstanding).
+--          Same meaning as the crossing_bill columns:
+--            balance_on_us        = total_pf   - total_paid_to_transport
+--            balance_on_transport = total_kaat - total_paid_kaat
+-- Safe: New table, functions and trigger with backfill. The services fall
+--       back to the previous code paths when the RPCs are missing.
+
+-- ========================================================================
+-- 1. TABLE
+-- ========================================================================
+
+-- Bills are grouped by GSTIN; bills saved without one fall back to the name.
+CREATE OR REPLACE FUNCTION public.crossing_bill_transport_key(
+  p_gstin text,
+  p_name  text
+)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT COALESCE(NULLIF(upper(btrim(p_gstin)), ''), 'name:' || upper(btrim(COALESCE(p_name, ''))));
+$$;
+
+CREATE TABLE IF NOT EXISTS public.crossing_bill_ledger (
+  transport_key            text PRIMARY KEY,
+  transport_id             uuid,
+  transport_gstin          text,
+  transport_name           text,
+  bills                    integer NOT NULL DEFAULT 0,
+  open_bills               integer NOT NULL DEFAULT 0,
+  total_kaat               numeric NOT NULL DEFAULT 0,
+  total_pf                 numeric NOT NULL DEFAULT 0,
+  total_paid_kaat          numeric NOT NULL DEFAULT 0,
+  total_paid_to_transport  numeric NOT NULL DEFAULT 0,
+  balance_on_us            numeric GENERATED ALWAYS AS (total_pf - total_paid_to_transport) STORED,
+  balance_on_transport     numeric GENERATED ALWAYS AS (total_kaat - total_paid_kaat) STORED,
+  updated_at               timestamptz NOT NULL DEFAULT now()
+);
+
+-- Open bills per transport, for the aging half of crossing_bill_outstanding
+CREATE INDEX IF NOT EXISTS idx_crossing_bill_open_transport
+ON public.crossing_bill (public.crossing_bill_transport_key(transport_gstin, transport_name), to_date)
+WHERE is_active AND status NOT IN ('paid', 'cancelled');
+
+-- ========================================================================
+-- 2. LEDGER MAINTENANCE
+-- ========================================================================
+
+-- Adds (p_sign = 1) or removes (p_sign = -1) one bill's contribution.
+-- Cancelled / inactive bills contribute nothing.
+CREATE OR REPLACE FUNCTION public.crossing_bill_ledger_apply(
+  b      public.crossing_bill,
+  p_sign integer
+)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF NOT b.is_active OR b.status = 'cancelled' THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO public.crossing_bill_ledger AS l (
+    transport_key, transport_id, transport_gstin, transport_name,
+    bills, open_bills, total_kaat, total_pf, total_paid_kaat, total_paid_to_transport
+  ) VALUES (
+    public.crossing_bill_transport_key(b.transport_gstin, b.transport_name),
+    b.transport_id,
+    NULLIF(upper(btrim(b.transport_gstin)), ''),
+    b.transport_name,
+    p_sign,
+    CASE WHEN b.status <> 'paid' THEN p_sign ELSE 0 END,
+    p_sign * b.total_kaat,
+    p_sign * b.total_pf,
+    p_sign * b.total_paid_kaat,
+    p_sign * b.total_paid_to_transport
+  )
+  ON CONFLICT (transport_key) DO UPDATE SET
+    bills                   = l.bills + EXCLUDED.bills,
+    open_bills              = l.open_bills + EXCLUDED.open_bills,
+    total_kaat              = l.total_kaat + EXCLUDED.total_kaat,
+    total_pf                = l.total_pf + EXCLUDED.total_pf,
+    total_paid_kaat         = l.total_paid_kaat + EXCLUDED.total_paid_kaat,
+    total_paid_to_transport = l.total_paid_to_transport + EXCLUDED.total_paid_to_transport,
+    transport_id            = CASE WHEN p_sign > 0 THEN COALESCE(EXCLUDED.transport_id, l.transport_id) ELSE l.transport_id END,
+    transport_name          = CASE WHEN p_sign > 0 THEN EXCLUDED.transport_name ELSE l.transport_name END,
+    updated_at              = now();
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.sync_crossing_bill_ledger()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM public.crossing_bill_ledger_apply(OLD, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM public.crossing_bill_ledger_apply(NEW, 1);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_crossing_bill_ledger ON public.crossing_bill;
+CREATE TRIGGER trg_crossing_bill_ledger
+  AFTER INSERT OR DELETE OR UPDATE OF
+    status, is_active, transport_id, transport_gstin, transport_name,
+    total_kaat, total_pf, total_paid_kaat, total_paid_to_transport
+  ON public.crossing_bill
+  FOR EACH ROW EXECUTE FUNCTION public.sync_crossing_bill_ledger();
+
+-- ========================================================================
+-- 3. ADD TRANSACTION
+-- ========================================================================
+
+-- Appends p_txn ({id, date, amount, type, mode, note, recorded_by, recorded_at})
+-- and bumps the matching paid total.  Amount is > 0 (checked by the service),
+-- so the bill becomes 'paid' once both sides are covered, else 'partial_paid'.
+-- Returns the updated bill, or NULL when it does not exist or is cancelled.
+CREATE OR REPLACE FUNCTION public.add_crossing_bill_transaction(
+  p_bill_id    uuid,
+  p_txn        jsonb,
+  p_updated_by uuid DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE sql
+AS $$
+  WITH amt AS (
+    SELECT
+      CASE WHEN p_txn ->> 'type' = 'received_from_transport' THEN (p_txn ->> 'amount')::numeric ELSE 0 END AS kaat,
+      CASE WHEN p_txn ->> 'type' = 'paid_to_transport'       THEN (p_txn ->> 'amount')::numeric ELSE 0 END AS trans
+  )
+  UPDATE public.crossing_bill b SET
+    transactions            = b.transactions || jsonb_build_array(p_txn),
+    total_paid_kaat         = round(b.total_paid_kaat + amt.kaat, 2),
+    total_paid_to_transport = round(b.total_paid_to_transport + amt.trans, 2),
+    status = CASE
+      WHEN b.total_paid_kaat + amt.kaat >= b.total_kaat
+       AND b.total_paid_to_transport + amt.trans >= b.total_pf THEN 'paid'
+      ELSE 'partial_paid'
+    END,
+    updated_by = p_updated_by,
+    updated_at = now()
+  FROM amt
+  WHERE b.id = p_bill_id
+    AND b.status <> 'cancelled'
+  RETURNING to_jsonb(b.*);
+$$;
+
+-- ========================================================================
+-- 4. OUTSTANDING + AGING
+-- ========================================================================
+
+-- One row per transport with live bills: ledger sums and balances, plus the
+-- open bills' net receivable (balance_on_transport - balance_on_us) bucketed
+-- by age (p_as_of - bill to_date, in days).
+CREATE OR REPLACE FUNCTION public.crossing_bill_outstanding(
+  p_as_of           date DEFAULT current_date,
+  p_transport_gstin text DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+  WITH open_bills AS (
+    SELECT
+      public.crossing_bill_transport_key(transport_gstin, transport_name) AS transport_key,
+      to_date,
+      balance_on_us,
+      balance_on_transport,
+      CASE
+        WHEN p_as_of - to_date <= 30 THEN '0_30'
+        WHEN p_as_of - to_date <= 60 THEN '31_60'
+        WHEN p_as_of - to_date <= 90 THEN '61_90'
+        ELSE '90_plus'
+      END AS bucket
+    FROM public.crossing_bill
+    WHERE is_active AND status NOT IN ('paid', 'cancelled')
+      AND (p_transport_gstin IS NULL
+           OR public.crossing_bill_transport_key(transport_gstin, transport_name) = upper(btrim(p_transport_gstin)))
+  ),
+  aging AS (
+    SELECT
+      transport_key,
+      min(to_date) AS oldest_open_to_date,
+      jsonb_build_object(
+        '0_30',    COALESCE(sum(balance_on_transport - balance_on_us) FILTER (WHERE bucket = '0_30'), 0),
+        '31_60',   COALESCE(sum(balance_on_transport - balance_on_us) FILTER (WHERE bucket = '31_60'), 0),
+        '61_90',   COALESCE(sum(balance_on_transport - balance_on_us) FILTER (WHERE bucket = '61_90'), 0),
+        '90_plus', COALESCE(sum(balance_on_transport - balance_on_us) FILTER (WHERE bucket = '90_plus'), 0)
+      ) AS aging
+    FROM open_bills
+    GROUP BY transport_key
+  )
+  SELECT COALESCE(jsonb_agg(
+    to_jsonb(l.*)
+      || jsonb_build_object(
+           'net_receivable',      l.balance_on_transport - l.balance_on_us,
+           'oldest_open_to_date', a.oldest_open_to_date,
+           'aging',               COALESCE(a.aging, '{"0_30": 0, "31_60": 0, "61_90": 0, "90_plus": 0}'::jsonb)
+         )
+    ORDER BY (l.balance_on_transport - l.balance_on_us) DESC, l.transport_key
+  ), '[]'::jsonb)
+  FROM public.crossing_bill_ledger l
+  LEFT JOIN aging a ON a.transport_key = l.transport_key
+  WHERE l.bills > 0
+    AND (p_transport_gstin IS NULL OR l.transport_key = upper(btrim(p_transport_gstin)));
+$$;
+
+-- ========================================================================
+-- 5. BACKFILL
+-- ========================================================================
+
+LOCK TABLE public.crossing_bill IN SHARE ROW EXCLUSIVE MODE;
+TRUNCATE public.crossing_bill_ledger;
+SELECT public.crossing_bill_ledger_apply(b, 1) FROM public.crossing_bill b;
@@ -0,0 +1,84 @@
+-- Migration: bulk_update_rows — allow crossing_bill
+-- Date: 2026-10-19
+-- Purpose: POST /api/crossing-bill/bulk-recalculate writes the refreshed
+--          pohonch_data snapshot and totals of many open bills through
+--          bulk_update_rows (one round trip per chunk instead of one PATCH
+--          per bill).  Same function as migration 008 with 'crossing_bill'
+--          added to the table whitelist.
+-- Safe: Function replacement only. Without it the service writes the
+--       bills one by one.
+
+CREATE OR REPLACE FUNCTION public.bulk_update_rows(
+  p_table text,
+  p_pk    text,
+  p_rows  jsonb
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  r          jsonb;
+  fields     jsonb;
+  id_val     text;
+  pk_type    text;
+  target     text;
+  source     text;
+  n          integer;
+  updated    jsonb := '[]'::jsonb;
+  failed     jsonb := '[]'::jsonb;
+BEGIN
+  IF p_table NOT IN (
+    'cities', 'states', 'transports', 'transport_admin',
+    'consignors', 'consignees', 'rates', 'pohonch', 'crossing_bill'
+  ) THEN
+    RAISE EXCEPTION 'bulk_update_rows: table % is not allowed', p_table;
+  END IF;
+
+  -- Compare the pk column in its own type so the pk index is used
+  SELECT format_type(a.atttypid, a.atttypmod)
+    INTO pk_type
+    FROM pg_attribute a
+   WHERE a.attrelid = format('public.%I', p_table)::regclass
+     AND a.attname = p_pk
+     AND NOT a.attisdropped;
+  IF pk_type IS NULL THEN
+    RAISE EXCEPTION 'bulk_update_rows: column % not found on %', p_pk, p_table;
+  END IF;
+
+  FOR r IN SELECT value FROM jsonb_array_elements(p_rows) LOOP
+    id_val := r ->> p_pk;
+    fields := r - p_pk;
+
+    IF id_val IS NULL THEN
+      failed := failed || jsonb_build_object('id', NULL, 'error', format('Missing %s', p_pk));
+      CONTINUE;
+    END IF;
+    IF fields = '{}'::jsonb THEN
+      failed := failed || jsonb_build_object('id', id_val, 'error', 'No fields to update');
+      CONTINUE;
+    END IF;
+
+    SELECT string_agg(format('%I', k), ', '), string_agg(format('s.%I', k), ', ')
+      INTO target, source
+      FROM jsonb_object_keys(fields) AS k;
+
+    BEGIN
+      EXECUTE format(
+        'UPDATE public.%I t SET (%s) = (SELECT %s FROM jsonb_populate_record(NULL::public.%I, $1) s) '
+        'WHERE t.%I = $2::%s',
+        p_table, target, source, p_table, p_pk, pk_type
+      ) USING fields, id_val;
+      GET DIAGNOSTICS n = ROW_COUNT;
+      IF n = 0 THEN
+        failed := failed || jsonb_build_object('id', id_val, 'error', 'Record not found');
+      ELSE
+        updated := updated || to_jsonb(id_val);
+      END IF;
+    EXCEPTION WHEN OTHERS THEN
+      failed := failed || jsonb_build_object('id', id_val, 'error', SQLERRM);
+    END;
+  END LOOP;
+
+  RETURN jsonb_build_object('updated', updated, 'failed', failed);
+END;
+$$;
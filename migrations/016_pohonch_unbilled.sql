@@ -0,0 +1,115 @@
+-- Migration: unbilled pohonch set per transport
+-- Date: 2026-10-19
+-- Purpose: GET /api/crossing-bill/pohonch filtered pohonch by transport and
+--          crossing_bill_id IS NULL over the transport's whole history and
+--          summed the preview totals in Python on every open.
+--            • idx_pohonch_unbilled — partial index holding only the active,
+--              unbilled pohonch, so the list reads that set and nothing else.
+--            • pohonch_unbilled_totals — one row per transport with the count
+--              and sums of that set.  A trigger on pohonch applies every
+--              change of crossing_bill_id (create / remove-pohonch / cancel /
+--              delete of a crossing bill), is_active, transport or totals as a
+--              delta, so the preview totals are a single-row read.
+--          Rows are keyed like crossing_bill_ledger (migration 014):
+--          crossing_bill_transport_key(transport_gstin, transport_name).
+-- Safe: New index, table and trigger with backfill. Requires migration 014
+--       (crossing_bill_transport_key). The service sums the rows when the
+--       table is missing.
+
+-- ========================================================================
+-- 1. INDEX + TABLE
+-- ========================================================================
+
+CREATE INDEX IF NOT EXISTS idx_pohonch_unbilled
+ON public.pohonch (transport_gstin, created_at)
+WHERE is_active AND crossing_bill_id IS NULL;
+
+CREATE TABLE IF NOT EXISTS public.pohonch_unbilled_totals (
+  transport_key    text PRIMARY KEY,
+  transport_gstin  text,
+  transport_name   text,
+  total_pohonch    integer NOT NULL DEFAULT 0,
+  total_bilties    integer NOT NULL DEFAULT 0,
+  total_kaat       numeric NOT NULL DEFAULT 0,
+  total_pf         numeric NOT NULL DEFAULT 0,
+  total_dd         numeric NOT NULL DEFAULT 0,
+  total_amount     numeric NOT NULL DEFAULT 0,
+  updated_at       timestamptz NOT NULL DEFAULT now()
+);
+
+-- ========================================================================
+-- 2. MAINTENANCE
+-- ========================================================================
+
+-- Adds (p_sign = 1) or removes (p_sign = -1) one pohonch's contribution.
+-- Only active pohonch without a crossing bill count.
+CREATE OR REPLACE FUNCTION public.pohonch_unbilled_apply(
+  p      public.pohonch,
+  p_sign integer
+)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF NOT COALESCE(p.is_active, false) OR p.crossing_bill_id IS NOT NULL THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO public.pohonch_unbilled_totals AS u (
+    transport_key, transport_gstin, transport_name,
+    total_pohonch, total_bilties, total_kaat, total_pf, total_dd, total_amount
+  ) VALUES (
+    public.crossing_bill_transport_key(p.transport_gstin, p.transport_name),
+    NULLIF(upper(btrim(p.transport_gstin)), ''),
+    p.transport_name,
+    p_sign,
+    p_sign * COALESCE(p.total_bilties, 0),
+    p_sign * COALESCE(p.total_kaat, 0),
+    p_sign * COALESCE(p.total_pf, 0),
+    p_sign * COALESCE(p.total_dd, 0),
+    p_sign * COALESCE(p.total_amount, 0)
+  )
+  ON CONFLICT (transport_key) DO UPDATE SET
+    total_pohonch  = u.total_pohonch + EXCLUDED.total_pohonch,
+    total_bilties  = u.total_bilties + EXCLUDED.total_bilties,
+    total_kaat     = u.total_kaat + EXCLUDED.total_kaat,
+    total_pf       = u.total_pf + EXCLUDED.total_pf,
+    total_dd       = u.total_dd + EXCLUDED.total_dd,
+    total_amount   = u.total_amount + EXCLUDED.total_amount,
+    transport_name = CASE WHEN p_sign > 0 THEN EXCLUDED.transport_name ELSE u.transport_name END,
+    updated_at     = now();
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.sync_pohonch_unbilled()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM public.pohonch_unbilled_apply(OLD, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM public.pohonch_unbilled_apply(NEW, 1);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_pohonch_unbilled ON public.pohonch;
+CREATE TRIGGER trg_pohonch_unbilled
+  AFTER INSERT OR DELETE OR UPDATE OF
+    crossing_bill_id, is_active, transport_gstin, transport_name,
+    total_bilties, total_kaat, total_pf, total_dd, total_amount
+  ON public.pohonch
+  FOR EACH ROW EXECUTE FUNCTION public.sync_pohonch_unbilled();
+
+-- ========================================================================
+-- 3. BACKFILL
+-- ========================================================================
+
+LOCK TABLE public.pohonch IN SHARE ROW EXCLUSIVE MODE;
+TRUNCATE public.pohonch_unbilled_totals;
+SELECT public.pohonch_unbilled_apply(p, 1)
+FROM public.pohonch p
+WHERE p.is_active AND p.crossing_bill_id IS NULL;
@@ -0,0 +1,90 @@
+-- Migration: invoice list indexes + invoice_list_summary RPC
+-- Date: 2026-10-19
+-- Purpose: GET /api/invoice/list paged with offset ranges ordered by
+--          invoice_date only (ties in an unstable order), and the month /
+--          year screens summed taxable / tax / total / paid / balance
+--          client-side across every page.  The list now pages by keyset on
+--          (invoice_date DESC, id DESC) and returns a summary block for the
+--          WHOLE filter from ONE aggregate query.
+--          Every index is partial on is_active (the list never shows
+--          soft-deleted invoices) and ends in (invoice_date DESC, id DESC) so
+--          the filtered range is read in page order.
+-- Safe: Indexes (IF NOT EXISTS) + new function only. Without the function
+--       the service sums the filtered rows page by page instead.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ========================================================================
+-- 1. KEYSET ORDER INDEXES  (filters the list screen actually uses)
+-- ========================================================================
+
+CREATE INDEX IF NOT EXISTS idx_invoice_master_list
+ON public.invoice_master(tenant_id, invoice_date DESC, id DESC)
+WHERE is_active;
+
+CREATE INDEX IF NOT EXISTS idx_invoice_master_list_status
+ON public.invoice_master(tenant_id, status, invoice_date DESC, id DESC)
+WHERE is_active;
+
+CREATE INDEX IF NOT EXISTS idx_invoice_master_list_payment
+ON public.invoice_master(tenant_id, payment_status, invoice_date DESC, id DESC)
+WHERE is_active;
+
+CREATE INDEX IF NOT EXISTS idx_invoice_master_list_receiver
+ON public.invoice_master(receiver_id, invoice_date DESC, id DESC)
+WHERE is_active;
+
+CREATE INDEX IF NOT EXISTS idx_invoice_master_list_gr
+ON public.invoice_master(gr_no)
+WHERE is_active;
+
+-- ========================================================================
+-- 2. SEARCH INDEX
+-- ========================================================================
+
+-- transport_name filter: ilike '%q%'
+CREATE INDEX IF NOT EXISTS idx_invoice_master_transport_name_trgm
+ON public.invoice_master USING GIN (transport_name gin_trgm_ops)
+WHERE is_active;
+
+-- ========================================================================
+-- 3. SUMMARY
+-- ========================================================================
+
+-- Same filter semantics as services/invoices/invoice_service.py list_invoices:
+-- every filter is exact except transport_name (partial), dates inclusive.
+CREATE OR REPLACE FUNCTION public.invoice_list_summary(
+  p_tenant_id      uuid DEFAULT NULL,
+  p_receiver_id    uuid DEFAULT NULL,
+  p_status         text DEFAULT NULL,
+  p_payment_status text DEFAULT NULL,
+  p_invoice_type   text DEFAULT NULL,
+  p_from_date      date DEFAULT NULL,
+  p_to_date        date DEFAULT NULL,
+  p_gr_no          text DEFAULT NULL,
+  p_transport_name text DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT jsonb_build_object(
+    'count',          count(*),
+    'taxable_amount', COALESCE(sum(i.taxable_amount), 0),
+    'total_tax',      COALESCE(sum(i.total_tax), 0),
+    'total_amount',   COALESCE(sum(i.total_amount), 0),
+    'paid_amount',    COALESCE(sum(i.paid_amount), 0),
+    'balance_amount', COALESCE(sum(i.balance_amount), 0)
+  )
+  FROM public.invoice_master i
+  WHERE i.is_active
+    AND (p_tenant_id IS NULL OR i.tenant_id = p_tenant_id)
+    AND (p_receiver_id IS NULL OR i.receiver_id = p_receiver_id)
+    AND (p_status IS NULL OR i.status = p_status)
+    AND (p_payment_status IS NULL OR i.payment_status = p_payment_status)
+    AND (p_invoice_type IS NULL OR i.invoice_type = p_invoice_type)
+    AND (p_from_date IS NULL OR i.invoice_date >= p_from_date)
+    AND (p_to_date IS NULL OR i.invoice_date <= p_to_date)
+    AND (p_gr_no IS NULL OR i.gr_no = p_gr_no)
+    AND (p_transport_name IS NULL OR i.transport_name ILIKE '%' || p_transport_name || '%');
+$$;
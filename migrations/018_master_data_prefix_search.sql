@@ -0,0 +1,59 @@
+-- Migration: name-prefix search for master-data lists
+-- Date: 2026-10-19
+-- Purpose: search_mode=prefix on GET /api/bilty/master/{entity} matched the
+--          FIRST search column (city_code for cities) with ilike 'q%', served
+--          by the trigram indexes of migration 003 — the wrong column and a
+--          poor index for an anchored match.  Prefix search now matches the
+--          entity's name column case-insensitively:
+--            • <table>_name_key(row) = lower(name column), exposed to
+--              PostgREST as a computed column so the service can filter
+--              `<table>_name_key LIKE 'q%'` (q lower-cased).  The SQL function
+--              is inlined into lower(col) LIKE 'q%' by the planner ...
+--            • ... which is served by a btree lower(col) text_pattern_ops
+--              index — an index range scan, whatever the database collation.
+-- Safe: New functions + indexes (IF NOT EXISTS) only. Without the functions
+--       the service falls back to ilike 'q%' on the name column.
+
+-- ========================================================================
+-- 1. COMPUTED NAME KEYS
+-- ========================================================================
+
+CREATE OR REPLACE FUNCTION public.cities_name_key(t public.cities)
+RETURNS text LANGUAGE sql IMMUTABLE AS $$ SELECT lower(t.city_name) $$;
+
+CREATE OR REPLACE FUNCTION public.states_name_key(t public.states)
+RETURNS text LANGUAGE sql IMMUTABLE AS $$ SELECT lower(t.state_name) $$;
+
+CREATE OR REPLACE FUNCTION public.transports_name_key(t public.transports)
+RETURNS text LANGUAGE sql IMMUTABLE AS $$ SELECT lower(t.transport_name) $$;
+
+CREATE OR REPLACE FUNCTION public.transport_admin_name_key(t public.transport_admin)
+RETURNS text LANGUAGE sql IMMUTABLE AS $$ SELECT lower(t.transport_name) $$;
+
+CREATE OR REPLACE FUNCTION public.consignors_name_key(t public.consignors)
+RETURNS text LANGUAGE sql IMMUTABLE AS $$ SELECT lower(t.company_name) $$;
+
+CREATE OR REPLACE FUNCTION public.consignees_name_key(t public.consignees)
+RETURNS text LANGUAGE sql IMMUTABLE AS $$ SELECT lower(t.company_name) $$;
+
+-- ========================================================================
+-- 2. PREFIX INDEXES
+-- ========================================================================
+
+CREATE INDEX IF NOT EXISTS idx_cities_name_prefix
+ON public.cities (lower(city_name) text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS idx_states_name_prefix
+ON public.states (lower(state_name) text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS idx_transports_name_prefix
+ON public.transports (lower(transport_name) text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS idx_transport_admin_name_prefix
+ON public.transport_admin (lower(transport_name) text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS idx_consignors_name_prefix
+ON public.consignors (lower(company_name) text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS idx_consignees_name_prefix
+ON public.consignees (lower(company_name) text_pattern_ops);
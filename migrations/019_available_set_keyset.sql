@@ -0,0 +1,87 @@
+-- Migration: keyset reader for the available-for-transit set
+-- Date: 2026-10-19
+-- Purpose: services/challan/available_set.py rebuilt a branch's set every
+--          AVAILABLE_RECONCILE_S by paging get_available_bilties_page with
+--          OFFSET, and that function also re-ran its three COUNT(*)s on every
+--          page.  get_available_bilties_after returns the next p_limit rows of
+--          ONE source (regular bilty or station) after p_after_gr, ordered by
+--          gr_no, with no counts — each page is an index range read on
+--          (branch_id, gr_no) (migration 005) whatever the depth.
+-- Safe: New function only. Without it the service pages
+--       get_available_bilties_page as before.
+
+CREATE OR REPLACE FUNCTION public.get_available_bilties_after(
+  p_branch_id uuid,
+  p_source    text,                   -- 'bilty' | 'station'
+  p_after_gr  text    DEFAULT NULL,   -- last gr_no of the previous page
+  p_limit     integer DEFAULT 1000
+)
+RETURNS jsonb
+LANGUAGE plpgsql STABLE
+AS $$
+BEGIN
+  IF p_source = 'bilty' THEN
+    RETURN (
+      SELECT COALESCE(jsonb_agg(page.row ORDER BY page.gr_no), '[]'::jsonb)
+      FROM (
+        SELECT b.gr_no::text AS gr_no,
+          jsonb_build_object(
+            'id', b.id, 'gr_no', b.gr_no, 'branch_id', b.branch_id,
+            'bilty_date', b.bilty_date, 'delivery_type', b.delivery_type,
+            'consignor_name', b.consignor_name, 'consignor_gst', b.consignor_gst,
+            'consignor_number', b.consignor_number,
+            'consignee_name', b.consignee_name, 'consignee_gst', b.consignee_gst,
+            'consignee_number', b.consignee_number,
+            'transport_name', b.transport_name, 'transport_gst', b.transport_gst,
+            'transport_number', b.transport_number, 'transport_id', b.transport_id,
+            'payment_mode', b.payment_mode, 'no_of_pkg', b.no_of_pkg, 'wt', b.wt,
+            'rate', b.rate, 'freight_amount', b.freight_amount,
+            'labour_charge', b.labour_charge, 'bill_charge', b.bill_charge,
+            'toll_charge', b.toll_charge, 'dd_charge', b.dd_charge,
+            'other_charge', b.other_charge, 'pf_charge', b.pf_charge,
+            'total', b.total, 'from_city_id', b.from_city_id,
+            'to_city_id', b.to_city_id, 'e_way_bill', b.e_way_bill,
+            'pvt_marks', b.pvt_marks, 'remark', b.remark,
+            'saving_option', b.saving_option, 'is_active', b.is_active,
+            'source_table', 'bilty', 'bilty_type', 'reg'
+          ) AS row
+        FROM bilty b
+        WHERE b.branch_id = p_branch_id
+          AND b.is_active = true
+          AND b.consignor_name IS DISTINCT FROM 'CANCEL BILTY'
+          AND (p_after_gr IS NULL OR b.gr_no > p_after_gr)
+          AND NOT EXISTS (SELECT 1 FROM transit_details td WHERE td.gr_no = b.gr_no)
+        ORDER BY b.gr_no
+        LIMIT p_limit
+      ) page
+    );
+  END IF;
+
+  RETURN (
+    SELECT COALESCE(jsonb_agg(page.row ORDER BY page.gr_no), '[]'::jsonb)
+    FROM (
+      SELECT s.gr_no::text AS gr_no,
+        jsonb_build_object(
+          'id', s.id, 'gr_no', s.gr_no, 'station', s.station,
+          'consignor', s.consignor, 'consignee', s.consignee,
+          'contents', s.contents, 'no_of_packets', s.no_of_packets,
+          'weight', s.weight, 'payment_status', s.payment_status,
+          'amount', s.amount, 'pvt_marks', s.pvt_marks,
+          'delivery_type', s.delivery_type, 'staff_id', s.staff_id,
+          'branch_id', s.branch_id, 'e_way_bill', s.e_way_bill,
+          'transport_id', s.transport_id, 'transport_name', s.transport_name,
+          'transport_gst', s.transport_gst, 'city_id', s.city_id,
+          'created_at', s.created_at, 'updated_at', s.updated_at,
+          'source_table', 'station_bilty_summary', 'bilty_type', 'mnl'
+        ) AS row
+      FROM station_bilty_summary s
+      WHERE s.branch_id = p_branch_id
+        AND (p_after_gr IS NULL OR s.gr_no > p_after_gr)
+        AND NOT EXISTS (SELECT 1 FROM transit_details td WHERE td.gr_no = s.gr_no)
+        AND NOT EXISTS (SELECT 1 FROM bilty b WHERE b.gr_no = s.gr_no)
+      ORDER BY s.gr_no
+      LIMIT p_limit
+    ) page
+  );
+END;
+$$;
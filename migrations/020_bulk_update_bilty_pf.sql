@@ -0,0 +1,39 @@
+-- Migration: bulk_update_bilty_pf RPC — pf-only write-back for pohonch recalculation
+-- Date: 2026-10-19
+-- Purpose: recalculate_pohonch / bulk recalculation repair bilty_wise_kaat.pf
+--          when it disagrees with the pohonch's kaat.  They went through
+--          bulk_update_bilty_kaat, which also writes kaat and
+--          actual_kaat_rate — values read at the start of the batch — so a
+--          kaat rate change committed meanwhile was silently reverted.
+--          This function writes pf ONLY, and only where kaat still equals
+--          the value the pf was derived from (p_rows.kaat); rows whose kaat
+--          moved on are left to the writer that changed it.
+--            p_rows = [{gr_no, pf, kaat}, ...]   → gr_nos written
+-- Safe: New function only. The service falls back to update().in_() calls
+--       filtered on the same kaat when it is not installed.
+
+CREATE OR REPLACE FUNCTION public.bulk_update_bilty_pf(
+  p_rows jsonb
+)
+RETURNS jsonb
+LANGUAGE sql
+AS $$
+  WITH src AS (
+    SELECT DISTINCT ON (r.gr_no) r.*
+    FROM jsonb_to_recordset(p_rows) AS r(
+      gr_no text,
+      pf    numeric,
+      kaat  numeric
+    )
+    WHERE r.gr_no IS NOT NULL
+  ),
+  upd AS (
+    UPDATE public.bilty_wise_kaat k SET
+      pf = src.pf
+    FROM src
+    WHERE k.gr_no = src.gr_no
+      AND k.kaat IS NOT DISTINCT FROM src.kaat
+    RETURNING k.gr_no
+  )
+  SELECT COALESCE(jsonb_agg(DISTINCT gr_no), '[]'::jsonb) FROM upd;
+$$;
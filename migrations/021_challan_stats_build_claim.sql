@@ -0,0 +1,17 @@
+-- Migration: challan_stats build claim
+-- Date: 2026-10-19
+-- Purpose: A challan without a challan_stats row is built on its next read:
+--          compute from transit_details, then store.  A bump_challan_stats
+--          delta landing between compute and store found no row (deltas only
+--          touch existing rows) and was lost, and a drop (bilty edit) in the
+--          same window was overwritten by the stale result.
+--          The reader now first inserts a placeholder row with
+--          building = true (ON CONFLICT DO NOTHING), computes, and stores
+--          only while the placeholder is untouched — a bump moves its
+--          updated_at and a drop deletes it, and either makes the store a
+--          no-op.  Rows with building = true are never served.
+-- Safe: Adds one column with a default.  Without it the service stores the
+--       lazily built row with ON CONFLICT DO NOTHING instead.
+
+ALTER TABLE public.challan_stats
+  ADD COLUMN IF NOT EXISTS building boolean NOT NULL DEFAULT false;
@@ -0,0 +1,51 @@
+-- Migration: updated_at maintained by trigger on rates / consignor_bilty_profile
+-- Date: 2026-10-19
+-- Purpose: services/bilty/rate_table.py re-checks each cached branch rate
+--          table and consignor profile table against (row count, max
+--          updated_at) of its source rows.  Nothing kept updated_at current:
+--          an edit that did not send it (SQL, admin UI, older writers) left
+--          the version unchanged and the cached table stale until its TTL.
+--          The triggers stamp updated_at = now() on every insert and update,
+--          and the indexes serve the single-row version probe
+--          (eq(branch_id / consignor_id) ORDER BY updated_at DESC LIMIT 1).
+-- Safe: Trigger function + triggers + indexes (IF NOT EXISTS) only.  Writers
+--       that already set updated_at get now() instead of their own value.
+
+-- ========================================================================
+-- 1. TRIGGER FUNCTION
+-- ========================================================================
+
+CREATE OR REPLACE FUNCTION public.touch_updated_at()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  NEW.updated_at := now();
+  RETURN NEW;
+END;
+$$;
+
+-- ========================================================================
+-- 2. TRIGGERS
+-- ========================================================================
+
+DROP TRIGGER IF EXISTS trg_rates_touch_updated_at ON public.rates;
+CREATE TRIGGER trg_rates_touch_updated_at
+  BEFORE INSERT OR UPDATE ON public.rates
+  FOR EACH ROW EXECUTE FUNCTION public.touch_updated_at();
+
+DROP TRIGGER IF EXISTS trg_consignor_bilty_profile_touch_updated_at ON public.consignor_bilty_profile;
+CREATE TRIGGER trg_consignor_bilty_profile_touch_updated_at
+  BEFORE INSERT OR UPDATE ON public.consignor_bilty_profile
+  FOR EACH ROW EXECUTE FUNCTION public.touch_updated_at();
+
+-- ========================================================================
+-- 3. VERSION PROBE INDEXES
+-- ========================================================================
+
+CREATE INDEX IF NOT EXISTS idx_rates_branch_updated_at
+ON public.rates(branch_id, updated_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_consignor_bilty_profile_consignor_updated_at
+ON public.consignor_bilty_profile(consignor_id, updated_at DESC)
+WHERE is_active = true;
@@ -0,0 +1,23 @@
+-- Migration: normalized transport GSTIN key for the unbilled pohonch list
+-- Date: 2026-10-19
+-- Purpose: GET /api/crossing-bill/pohonch read preview_totals from
+--          pohonch_unbilled_totals (migration 016), keyed by
+--          upper(btrim(transport_gstin)), but filtered the rows with an exact
+--          eq on the raw column — a pohonch stored with a lower-case or padded
+--          GSTIN was counted in the totals and missing from the list.
+--            • pohonch_gstin_key(row) = NULLIF(upper(btrim(transport_gstin)), ''),
+--              exposed to PostgREST as a computed column so the service
+--              filters rows with the same normalization as the totals.
+--            • idx_pohonch_unbilled is re-created on that expression (the
+--              planner inlines the function), replacing the raw-column index.
+-- Safe: New function; one partial index replaced.  Without the function the
+--       service filters the raw column and sums the returned rows instead of
+--       reading pohonch_unbilled_totals.
+
+CREATE OR REPLACE FUNCTION public.pohonch_gstin_key(p public.pohonch)
+RETURNS text LANGUAGE sql IMMUTABLE AS $$ SELECT NULLIF(upper(btrim(p.transport_gstin)), '') $$;
+
+DROP INDEX IF EXISTS public.idx_pohonch_unbilled;
+CREATE INDEX IF NOT EXISTS idx_pohonch_unbilled
+ON public.pohonch ((NULLIF(upper(btrim(transport_gstin)), '')), created_at)
+WHERE is_active AND crossing_bill_id IS NULL;
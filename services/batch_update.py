@@ -0,0 +1,187 @@
+"""
+Batched row updates shared by the bulk endpoints.
+
+Replaces the "one update().eq(pk, id) per item" loops with:
+  1. the bulk_update_rows RPC (migrations/004_bulk_update_rows.sql) —
+     one round trip per chunk, each row applied in its own savepoint so
+     per-item errors are still reported
+  2. fallback when the RPC is not installed: items are grouped by identical
+     payload and sent as update(payload).in_(pk, ids) — one round trip per
+     distinct payload.  A group that errors is retried item-by-item so the
+     failure is pinned to the right id.
+
+Both paths return (updated_ids, failed) where failed is
+[{"id": ..., "error": ...}, ...].
+
+Also home to the helpers the services share for optional database objects
+and keyset paging:
+  try_optional / optional_rpc — call an RPC (or table) a migration may not
+     have installed yet; a {"value": None} flag per object remembers when it
+     is missing so later calls go straight to the fallback.
+  encode_cursor / decode_cursor — opaque next_cursor tokens for the
+     keyset-paged list endpoints.
+"""
+import base64
+import json
+
+RPC_CHUNK = 500        # rows per bulk_update_rows call
+IN_CHUNK = 200         # ids per update().in_() request
+
+# None = not tried yet, False = RPC missing on this database
+_rpc_available = {"value": None}
+
+
+def is_rpc_missing(err: Exception) -> bool:
+    """True when PostgREST reports the called function does not exist."""
+    msg = str(err)
+    return "PGRST202" in msg or "Could not find the function" in msg
+
+
+def is_table_missing(err: Exception) -> bool:
+    """True when PostgREST / Postgres reports the queried table does not exist."""
+    msg = str(err)
+    return "PGRST205" in msg or "42P01" in msg or "Could not find the table" in msg
+
+
+def is_column_missing(err: Exception) -> bool:
+    """True when Postgres reports a queried column (or computed column) does not exist."""
+    return "42703" in str(err)
+
+
+# Returned by try_optional / optional_rpc when the object is not installed
+MISSING = object()
+
+
+def try_optional(flag: dict, call, note: str, missing=is_rpc_missing):
+    """
+    call() unless `flag` already marks its database object missing.
+    Returns call()'s result, or MISSING when missing(err) matches — the flag
+    is then set False and `note` logged once.  Other errors propagate.
+    """
+    if flag["value"] is False:
+        return MISSING
+    try:
+        result = call()
+    except Exception as e:
+        if not missing(e):
+            raise
+        flag["value"] = False
+        print(note)
+        return MISSING
+    flag["value"] = True
+    return result
+
+
+def optional_rpc(sb, flag: dict, fn: str, params: dict, fallback_note: str, fallback=None):
+    """
+    sb.rpc(fn, params).data via try_optional.  When the function is not
+    installed returns fallback() if given, else MISSING.
+    """
+    data = try_optional(
+        flag, lambda: sb.rpc(fn, params).execute().data,
+        f"{fn} RPC not installed — {fallback_note}",
+    )
+    if data is MISSING and fallback is not None:
+        return fallback()
+    return data
+
+
+def encode_cursor(*values) -> str:
+    """Opaque keyset cursor for the sort-key values of a page's last row."""
+    raw = json.dumps(list(values), separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Values passed to encode_cursor; raises on a malformed cursor."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def escape_like(text: str) -> str:
+    """Escape LIKE / ILIKE metacharacters (backslash, % and _) in user text."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _update_via_rpc(sb, table: str, pk: str, items: list):
+    updated, failed = [], []
+    for i in range(0, len(items), RPC_CHUNK):
+        chunk = items[i:i + RPC_CHUNK]
+        try:
+            resp = sb.rpc("bulk_update_rows", {
+                "p_table": table,
+                "p_pk": pk,
+                "p_rows": chunk,
+            }).execute()
+        except Exception as e:
+            if i == 0 and is_rpc_missing(e):
+                raise
+            failed.extend({"id": item.get(pk), "error": str(e)} for item in chunk)
+            continue
+        result = resp.data or {}
+        updated.extend(result.get("updated") or [])
+        failed.extend(result.get("failed") or [])
+    return updated, failed
+
+
+def group_by_payload(items: list, pk: str) -> dict:
+    """{ payload_json: (payload, [ids]) } for items sharing an identical payload."""
+    groups = {}
+    for item in items:
+        payload = {k: v for k, v in item.items() if k != pk}
+        key = json.dumps(payload, sort_keys=True, default=str)
+        groups.setdefault(key, (payload, []))[1].append(item[pk])
+    return groups
+
+
+def update_grouped(sb, table: str, pk: str, payload: dict, ids: list, id_col: str = None):
+    """
+    Apply one payload to many ids with update().in_() in chunks.
+    Returns (updated_ids, failed); a failing chunk is retried per id.
+    """
+    id_col = id_col or pk
+    updated, failed = [], []
+    for i in range(0, len(ids), IN_CHUNK):
+        chunk = ids[i:i + IN_CHUNK]
+        try:
+            resp = sb.table(table).update(payload).in_(id_col, chunk).execute()
+            hit = {str(r.get(id_col)) for r in (resp.data or [])}
+            for rid in chunk:
+                if str(rid) in hit:
+                    updated.append(rid)
+                else:
+                    failed.append({"id": rid, "error": "Record not found"})
+        except Exception:
+            for rid in chunk:
+                try:
+                    resp = sb.table(table).update(payload).eq(id_col, rid).execute()
+                    if resp.data:
+                        updated.append(rid)
+                    else:
+                        failed.append({"id": rid, "error": "Record not found"})
+                except Exception as e:
+                    failed.append({"id": rid, "error": str(e)})
+    return updated, failed
+
+
+def batch_update_rows(sb, table: str, pk: str, items: list):
+    """
+    Update many rows of `table`, each item = {pk: id, **fields}.
+    Returns (updated_ids, failed).
+    """
+    if not items:
+        return [], []
+
+    result = try_optional(
+        _rpc_available, lambda: _update_via_rpc(sb, table, pk, items),
+        "bulk_update_rows RPC not installed — falling back to grouped updates",
+    )
+    if result is not MISSING:
+        return result
+
+    updated, failed = [], []
+    for payload, ids in group_by_payload(items, pk).values():
+        u, f = update_grouped(sb, table, pk, payload, ids)
+        updated.extend(u)
+        failed.extend(f)
+    return updated, failed
@@ -9,6 +9,9 @@ from datetime import datetime, timezone
 from time import sleep
 from services.supabase_client import get_supabase
 from services.thread_pool import shared_pool
+from services.bilty.rate_write_queue import enqueue_rate
+from services.challan.available_set import note_bilty_saved
+from services.challan.transit_service import note_bilties_edited
 
 # Shared thread pool for background tasks (rate save, party auto-create)
 # Uses the centralized pool from services.thread_pool
@@ -107,14 +110,17 @@ def _ensure_party(sb, table: str, name: str, gst: str = None, number: str = None
     return None
 
 
-def _auto_save_rate(sb, branch_id, city_id, consignor_name, rate_value):
-    """Save/update rate for this branch+city+consignor combination."""
+def _auto_save_rate(sb, branch_id, city_id, consignor_name, rate_value, consignor_id=None):
+    """
+    Save/update rate for this branch+city+consignor combination.
+    The write itself is coalesced through the rate write-behind queue,
+    so repeated saves of the same rate cost no extra round trips.
+    """
     if not branch_id or not city_id or not rate_value or float(rate_value) <= 0:
         return
 
-    # Find consignor ID
-    consignor_id = None
-    if consignor_name:
+    # Find consignor ID (callers that just ran _ensure_party pass it in)
+    if not consignor_id and consignor_name:
         resp = (
             sb.table("consignors")
             .select("id")
@@ -128,32 +134,7 @@ def _auto_save_rate(sb, branch_id, city_id, consignor_name, rate_value):
     if not consignor_id:
         return
 
-    # Check existing rate
-    existing = (
-        sb.table("rates")
-        .select("id, rate")
-        .eq("branch_id", branch_id)
-        .eq("city_id", city_id)
-        .eq("consignor_id", consignor_id)
-        .limit(1)
-        .execute()
-    )
-
-    if existing.data:
-        if float(existing.data[0]["rate"]) != float(rate_value):
-            sb.table("rates").update({"rate": float(rate_value)}).eq(
-                "id", existing.data[0]["id"]
-            ).execute()
-    else:
-        sb.table("rates").insert(
-            {
-                "branch_id": branch_id,
-                "city_id": city_id,
-                "consignor_id": consignor_id,
-                "rate": float(rate_value),
-                "is_default": False,
-            }
-        ).execute()
+    enqueue_rate(branch_id, city_id, consignor_id, rate_value)
 
 
 def save_bilty(data: dict) -> dict:
@@ -362,6 +343,10 @@ def save_bilty(data: dict) -> dict:
             }
 
         saved_bilty = result.data[0]
+        note_bilty_saved(saved_bilty, is_new=not bilty_id)
+        if bilty_id:
+            # An edited GR may already be on a challan — its counters and print are stale
+            note_bilties_edited(sb, [saved_bilty.get("gr_no")])
 
         # === SAFETY CHECK & ADVANCE current_number (server-owned, blocking) ===
         # The backend is the SOLE authority on current_number.
@@ -445,11 +430,11 @@ def save_bilty(data: dict) -> dict:
                 try:
                     _sb = get_supabase()
                     # Auto-create consignor/consignee if new
-                    _ensure_party(_sb, "consignors", consignor_name, data.get("consignor_gst"), data.get("consignor_number"))
+                    consignor_id = _ensure_party(_sb, "consignors", consignor_name, data.get("consignor_gst"), data.get("consignor_number"))
                     _ensure_party(_sb, "consignees", consignee_name, data.get("consignee_gst"), data.get("consignee_number"))
                     # Auto-save rate
                     if saving_option == "SAVE" and data.get("rate"):
-                        _auto_save_rate(_sb, branch_id, to_city_id, consignor_name, data.get("rate"))
+                        _auto_save_rate(_sb, branch_id, to_city_id, consignor_name, data.get("rate"), consignor_id)
                     return  # success — exit retry loop
                 except OSError as e:
                     if attempt == 0:
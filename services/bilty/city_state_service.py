@@ -5,6 +5,7 @@ state_code / state_name directly onto the cities row for query convenience.
 """
 from datetime import datetime, timezone
 from services.supabase_client import get_supabase
+from services.batch_update import batch_update_rows
 
 
 def _now():
@@ -55,7 +56,8 @@ def bulk_assign_state_to_cities(updates: list, user_id: str = None) -> dict:
         { "city_id": "<uuid>", "state_id": "<uuid>" },
         ...
     ]
-    Resolves each unique state once, then updates each city row.
+    Resolves each unique state once, then updates all city rows in batches
+    (services.batch_update — same path as master-data bulk_update).
     """
     if not updates or not isinstance(updates, list):
         return {"status": "error", "message": "updates must be a non-empty array", "status_code": 400}
@@ -72,7 +74,7 @@ def bulk_assign_state_to_cities(updates: list, user_id: str = None) -> dict:
         state_resp = sb.table("states").select("id, state_code, state_name").in_("id", unique_state_ids).execute()
         state_map = {s["id"]: s for s in (state_resp.data or [])}
 
-        success, failed = 0, []
+        failed, items = [], []
 
         for item in updates:
             city_id = item.get("city_id")
@@ -90,23 +92,23 @@ def bulk_assign_state_to_cities(updates: list, user_id: str = None) -> dict:
                 failed.append({"city_id": city_id, "error": f"State not found: {state_id}"})
                 continue
 
-            payload = {
+            row = {
+                "id": city_id,
                 "state_id": state_id,
                 "state_code": state["state_code"],
                 "state_name": state["state_name"],
                 "updated_at": now,
             }
             if user_id:
-                payload["updated_by"] = user_id
-
-            try:
-                resp = sb.table("cities").update(payload).eq("id", city_id).execute()
-                if resp.data:
-                    success += 1
-                else:
-                    failed.append({"city_id": city_id, "error": "City not found"})
-            except Exception as e:
-                failed.append({"city_id": city_id, "error": str(e)})
+                row["updated_by"] = user_id
+            items.append(row)
+
+        # Same batched path as master-data bulk_update
+        updated, update_failed = batch_update_rows(sb, "cities", "id", items)
+        for f in update_failed:
+            err = f.get("error")
+            failed.append({"city_id": f.get("id"), "error": "City not found" if err == "Record not found" else err})
+        success = len(updated)
 
         return {
             "status": "success",
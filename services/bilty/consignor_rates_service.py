@@ -2,11 +2,15 @@
 Consignor Rates Service
 Fetches consignor-specific rates from consignor_bilty_profile
 and default rates from the rates table.
-Uses parallel queries for speed.
+Served from the in-memory rate table (services.bilty.rate_table),
+so repeated bilty-form lookups make no DB calls.
 """
 from concurrent.futures import as_completed
-from services.supabase_client import get_supabase
 from services.thread_pool import shared_pool
+from services.bilty.rate_table import (
+    get_branch_rate_table, get_consignor_profile_table, lookup_profile,
+    prefetch_consignor_profiles, lookup_rate,
+)
 
 
 def get_consignor_rates(consignor_id: str) -> dict:
@@ -15,31 +19,9 @@ def get_consignor_rates(consignor_id: str) -> dict:
     Returns destination-wise rate, labour, DD charges, etc.
     """
     try:
-        sb = get_supabase()
-
-        data = (
-            sb.table("consignor_bilty_profile")
-            .select(
-                "id, consignor_id, destination_station_id, city_code, city_name, "
-                "transport_name, transport_gst, rate, rate_unit, minimum_weight_kg, "
-                "labour_rate, labour_unit, dd_charge_per_kg, dd_charge_per_nag, "
-                "receiving_slip_charge, bilty_charge, is_no_charge, "
-                "effective_from, effective_to, is_active, "
-                "dd_print_charge_per_kg, dd_print_charge_per_nag, "
-                "is_toll_tax_applicable, toll_tax_amount, freight_minimum_amount"
-            )
-            .eq("consignor_id", consignor_id)
-            .eq("is_active", True)
-            .order("city_name")
-            .execute()
-        ).data or []
-
-        # Build lookup by destination city for quick frontend access
-        by_city = {}
-        for r in data:
-            cid = r.get("destination_station_id")
-            if cid:
-                by_city.setdefault(cid, []).append(r)
+        table = get_consignor_profile_table(consignor_id)
+        data = table["rows"]
+        by_city = table["by_city"]
 
         return {
             "status": "success",
@@ -63,18 +45,12 @@ def get_default_rates(branch_id: str) -> dict:
     These are city-wise base rates used when no consignor profile exists.
     """
     try:
-        sb = get_supabase()
-
-        data = (
-            sb.table("rates")
-            .select("id, branch_id, city_id, rate, is_default")
-            .eq("branch_id", branch_id)
-            .eq("is_default", True)
-            .execute()
-        ).data or []
-
-        # Build lookup by city_id
-        by_city = {r["city_id"]: r["rate"] for r in data}
+        table = get_branch_rate_table(branch_id)
+        data = [
+            {k: r.get(k) for k in ("id", "branch_id", "city_id", "rate", "is_default")}
+            for r in table["default_rows"]
+        ]
+        by_city = table["default_by_city"]
 
         return {
             "status": "success",
@@ -95,6 +71,43 @@ def get_default_rates(branch_id: str) -> dict:
 DD_MINIMUM = 150.0
 
 
+def _dd_breakdown(profile: dict | None, weight, no_of_pkg) -> dict:
+    """DD charge for one bilty from its profile row (None → minimum)."""
+    if not profile:
+        return {
+            "dd_charge": DD_MINIMUM,
+            "raw_calculated": 0.0,
+            "basis": "minimum_no_profile",
+            "per_kg_rate": 0.0,
+            "per_nag_rate": 0.0,
+            "profile_id": None,
+        }
+
+    per_kg = float(profile.get("dd_charge_per_kg") or 0)
+    per_nag = float(profile.get("dd_charge_per_nag") or 0)
+
+    if per_kg > 0:
+        raw = per_kg * float(weight or 0)
+        basis = "per_kg"
+    elif per_nag > 0:
+        raw = per_nag * int(no_of_pkg or 0)
+        basis = "per_nag"
+    else:
+        raw = 0.0
+        basis = "minimum"
+
+    dd_charge = max(raw, DD_MINIMUM)
+
+    return {
+        "dd_charge": round(dd_charge, 2),
+        "raw_calculated": round(raw, 2),
+        "basis": basis,
+        "per_kg_rate": per_kg,
+        "per_nag_rate": per_nag,
+        "profile_id": profile["id"],
+    }
+
+
 def calculate_dd_charge(
     consignor_id: str,
     destination_city_id: str,
@@ -114,58 +127,8 @@ def calculate_dd_charge(
     frontend can display the breakdown.
     """
     try:
-        sb = get_supabase()
-
-        rows = (
-            sb.table("consignor_bilty_profile")
-            .select("id, dd_charge_per_kg, dd_charge_per_nag")
-            .eq("consignor_id", consignor_id)
-            .eq("destination_station_id", destination_city_id)
-            .eq("is_active", True)
-            .limit(1)
-            .execute()
-        ).data
-
-        if not rows:
-            return {
-                "status": "success",
-                "data": {
-                    "dd_charge": DD_MINIMUM,
-                    "raw_calculated": 0.0,
-                    "basis": "minimum_no_profile",
-                    "per_kg_rate": 0.0,
-                    "per_nag_rate": 0.0,
-                    "profile_id": None,
-                },
-            }
-
-        profile = rows[0]
-        per_kg = float(profile.get("dd_charge_per_kg") or 0)
-        per_nag = float(profile.get("dd_charge_per_nag") or 0)
-
-        if per_kg > 0:
-            raw = per_kg * float(weight)
-            basis = "per_kg"
-        elif per_nag > 0:
-            raw = per_nag * int(no_of_pkg)
-            basis = "per_nag"
-        else:
-            raw = 0.0
-            basis = "minimum"
-
-        dd_charge = max(raw, DD_MINIMUM)
-
-        return {
-            "status": "success",
-            "data": {
-                "dd_charge": round(dd_charge, 2),
-                "raw_calculated": round(raw, 2),
-                "basis": basis,
-                "per_kg_rate": per_kg,
-                "per_nag_rate": per_nag,
-                "profile_id": profile["id"],
-            },
-        }
+        profile = lookup_profile(consignor_id, destination_city_id)
+        return {"status": "success", "data": _dd_breakdown(profile, weight, no_of_pkg)}
 
     except Exception as e:
         return {
@@ -177,7 +140,8 @@ def calculate_dd_charge(
 
 def get_all_rates(consignor_id: str, branch_id: str) -> dict:
     """
-    Fetch BOTH consignor-specific rates AND default branch rates in parallel.
+    Fetch BOTH consignor-specific rates AND default branch rates in parallel
+    (only matters on a cold rate table; warm lookups are pure dict hits).
     Frontend can fall back to default when no consignor profile exists for a city.
     """
     try:
@@ -210,3 +174,181 @@ def get_all_rates(consignor_id: str, branch_id: str) -> dict:
             "message": f"Failed to fetch rates: {str(e)}",
             "status_code": 500,
         }
+
+
+MAX_BATCH_ROWS = 5000
+
+# lookup_rate source → row "source"
+_FALLBACK_SOURCES = {"consignor_rate": "consignor_rate", "default_rate": "default"}
+
+
+def _unit_amount(rate: float, unit: str, weight: float, packages: int) -> float:
+    if unit == "PER_NAG":
+        return rate * packages
+    if unit == "PER_BILTY":
+        return rate
+    return rate * weight
+
+
+def _is_door_delivery(row: dict) -> bool:
+    """is_dd wins when sent; otherwise delivery_type 'door' (godown / unset → no DD)."""
+    if row.get("is_dd") is not None:
+        return bool(row["is_dd"])
+    return str(row.get("delivery_type") or "").strip().lower().startswith("door")
+
+
+def _price_row(
+    profile: dict | None,
+    fallback_rate,
+    fallback_source: str | None,
+    weight: float,
+    packages: int,
+    door_delivery: bool,
+) -> dict:
+    """
+    Freight / labour / bill / toll / DD breakdown for one row.
+    DD is charged only for door delivery; a no-charge profile prices to zero.
+    """
+    if profile:
+        rate = float(profile.get("rate") or 0)
+        rate_unit = profile.get("rate_unit") or "PER_KG"
+        min_wt = float(profile.get("minimum_weight_kg") or 0)
+        labour_rate = float(profile.get("labour_rate") or 0)
+        # Frontend default: labour = labour_rate × no_of_packages
+        labour_unit = profile.get("labour_unit") or "PER_NAG"
+        min_freight = float(profile.get("freight_minimum_amount") or 0)
+        bill_charge = float(profile.get("bilty_charge") or 0)
+        toll = float(profile.get("toll_tax_amount") or 0) if profile.get("is_toll_tax_applicable") else 0.0
+        source = "consignor_profile"
+    else:
+        rate = float(fallback_rate or 0)
+        rate_unit, min_wt, labour_rate, labour_unit = "PER_KG", 0.0, 0.0, "PER_NAG"
+        min_freight = bill_charge = toll = 0.0
+        source = fallback_source or "none"
+
+    charged_wt = max(weight, min_wt) if rate_unit == "PER_KG" else weight
+    freight_raw = _unit_amount(rate, rate_unit, charged_wt, packages)
+    min_applied = min_freight > 0 and freight_raw < min_freight
+    freight = min_freight if min_applied else freight_raw
+    labour = _unit_amount(labour_rate, labour_unit, weight, packages)
+    if door_delivery:
+        dd = _dd_breakdown(profile, weight, packages)
+    else:
+        dd = {"dd_charge": 0.0, "basis": "not_door_delivery"}
+
+    no_charge = bool(profile.get("is_no_charge")) if profile else False
+    if no_charge:
+        freight = labour = bill_charge = toll = 0.0
+        min_applied = False
+        dd = {"dd_charge": 0.0, "basis": "no_charge"}
+
+    total = freight + labour + bill_charge + toll + dd["dd_charge"]
+    return {
+        "source": source,
+        "profile_id": profile["id"] if profile else None,
+        "rate": rate,
+        "rate_unit": rate_unit,
+        "charged_weight": round(charged_wt, 3),
+        "freight_raw": round(freight_raw, 2),
+        "freight_amount": round(freight, 2),
+        "is_minimum_applied": min_applied,
+        "labour_rate": labour_rate,
+        "labour_unit": labour_unit,
+        "labour_charge": round(labour, 2),
+        "bill_charge": round(bill_charge, 2),
+        "toll_charge": round(toll, 2),
+        "dd_charge": dd["dd_charge"],
+        "dd_basis": dd["basis"],
+        "is_door_delivery": door_delivery,
+        "is_no_charge": no_charge,
+        "total": round(total, 2),
+    }
+
+
+def calculate_charges_batch(rows: list, branch_id: str = None) -> dict:
+    """
+    Price many bilties in one call (re-pricing a challan / a consignor's month).
+
+    rows = [
+        { "consignor_id": "uuid", "city_id": "uuid", "weight": 120, "packages": 4,
+          "delivery_type": "door" | "godown", "ref": "<optional echo, e.g. gr_no>" },
+        ...
+    ]
+    Bilty-shaped keys (to_city_id / destination_city_id, wt, no_of_pkg, gr_no)
+    are accepted too so a bilty list can be posted as-is.  DD is added only
+    for door delivery (is_dd, else delivery_type "door").
+
+    All consignor profiles are loaded with ONE set query (then served from the
+    rate table); rows without a profile fall back to the branch rate table
+    when branch_id is given — the consignor's own rate for the city first,
+    then the branch default.  Returns per-row breakdowns plus column totals.
+    """
+    if not rows or not isinstance(rows, list):
+        return {"status": "error", "message": "rows must be a non-empty array", "status_code": 400}
+    if len(rows) > MAX_BATCH_ROWS:
+        return {
+            "status": "error",
+            "message": f"Too many rows: {len(rows)} (max {MAX_BATCH_ROWS})",
+            "status_code": 400,
+        }
+
+    try:
+        prefetch_consignor_profiles(r.get("consignor_id") for r in rows if isinstance(r, dict))
+
+        results = []
+        failed = 0
+        totals = {k: 0.0 for k in (
+            "freight_amount", "labour_charge", "bill_charge", "toll_charge", "dd_charge", "total",
+        )}
+        for idx, r in enumerate(rows):
+            if not isinstance(r, dict):
+                results.append({"index": idx, "error": "row must be an object"})
+                failed += 1
+                continue
+            ref = r.get("ref", r.get("gr_no"))
+            consignor_id = r.get("consignor_id")
+            city_id = r.get("city_id") or r.get("to_city_id") or r.get("destination_city_id")
+            if not consignor_id or not city_id:
+                results.append({"index": idx, "ref": ref, "error": "consignor_id and city_id are required"})
+                failed += 1
+                continue
+            try:
+                weight = float(r.get("weight", r.get("wt")) or 0)
+                packages = int(r.get("packages", r.get("no_of_pkg")) or 0)
+            except (TypeError, ValueError):
+                results.append({"index": idx, "ref": ref, "error": "weight/packages must be numeric"})
+                failed += 1
+                continue
+
+            profile = lookup_profile(consignor_id, city_id)
+            fallback_rate, fallback_source = None, None
+            if not profile and branch_id:
+                fallback_rate, fallback_source = lookup_rate(branch_id, city_id, consignor_id)
+            priced = _price_row(
+                profile, fallback_rate, _FALLBACK_SOURCES.get(fallback_source),
+                weight, packages, _is_door_delivery(r),
+            )
+            for k in totals:
+                totals[k] += priced[k]
+            results.append({
+                "index": idx, "ref": ref,
+                "consignor_id": consignor_id, "city_id": city_id,
+                "weight": weight, "packages": packages,
+                **priced,
+            })
+
+        return {
+            "status": "success",
+            "data": {
+                "rows": results,
+                "count": len(results),
+                "failed_count": failed,
+                "totals": {k: round(v, 2) for k, v in totals.items()},
+            },
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to calculate charges: {str(e)}",
+            "status_code": 500,
+        }
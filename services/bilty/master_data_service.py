@@ -5,12 +5,16 @@ for: cities, transports, consignors, consignees, rates
 """
 from datetime import datetime, timezone
 from services.supabase_client import get_supabase
+from services.batch_update import MISSING, batch_update_rows, decode_cursor, encode_cursor, escape_like, is_column_missing, try_optional
+from services.name_cache import resolve_names
+from services.bilty.rate_table import invalidate_branch_rates
 
 PAGE_SIZE = 40  # default rows per page
 
 
 # ── Table config ──────────────────────────────────────────────
-# Maps entity name → { table, columns (for select), search_cols, order, pk }
+# Maps entity name → { table, columns (for select), search_cols, order,
+#   prefix_key (computed lower(order col), migration 018), pk }
 
 TABLE_CONFIG = {
     "cities": {
@@ -18,6 +22,7 @@ TABLE_CONFIG = {
         "columns": "id, city_code, city_name, state_id, state_code, state_name, created_by, updated_by, created_at, updated_at",
         "search_cols": ["city_code", "city_name", "state_name"],
         "order": "city_name",
+        "prefix_key": "cities_name_key",
         "pk": "id",
     },
     "states": {
@@ -25,6 +30,7 @@ TABLE_CONFIG = {
         "columns": "id, state_code, state_name, created_by, updated_by, created_at, updated_at",
         "search_cols": ["state_code", "state_name"],
         "order": "state_name",
+        "prefix_key": "states_name_key",
         "pk": "id",
     },
     "transports": {
@@ -32,6 +38,7 @@ TABLE_CONFIG = {
         "columns": "id, transport_name, city_id, city_name, address, gst_number, mob_number, branch_owner_name, website, transport_admin_id, is_prior, created_by, updated_by, created_at, updated_at",
         "search_cols": ["transport_name", "city_name", "gst_number"],
         "order": "transport_name",
+        "prefix_key": "transports_name_key",
         "pk": "id",
     },
     "transport_admin": {
@@ -39,6 +46,7 @@ TABLE_CONFIG = {
         "columns": "transport_id, transport_name, gstin, hub_mobile_number, owner_name, website, address, sample_ref_image, sample_challan_image, created_by, updated_by, created_at, updated_at",
         "search_cols": ["transport_name", "gstin", "owner_name"],
         "order": "transport_name",
+        "prefix_key": "transport_admin_name_key",
         "pk": "transport_id",
     },
     "consignors": {
@@ -46,6 +54,7 @@ TABLE_CONFIG = {
         "columns": "id, company_name, company_add, number, gst_num, adhar, pan, created_by, updated_by, created_at, updated_at",
         "search_cols": ["company_name", "gst_num", "number"],
         "order": "company_name",
+        "prefix_key": "consignors_name_key",
         "pk": "id",
     },
     "consignees": {
@@ -53,6 +62,7 @@ TABLE_CONFIG = {
         "columns": "id, company_name, company_add, number, gst_num, adhar, pan, created_by, updated_by, created_at, updated_at",
         "search_cols": ["company_name", "gst_num", "number"],
         "order": "company_name",
+        "prefix_key": "consignees_name_key",
         "pk": "id",
     },
     "rates": {
@@ -82,9 +92,7 @@ def _resolve_user_names(rows: list) -> list:
     if not user_ids:
         return rows
     try:
-        sb = get_supabase()
-        resp = sb.table("users").select("id, name").in_("id", list(user_ids)).execute()
-        name_map = {u["id"]: u["name"] or u["id"] for u in (resp.data or [])}
+        name_map = {k: v or k for k, v in resolve_names("users", user_ids).items()}
     except Exception:
         return rows
     for r in rows:
@@ -99,25 +107,78 @@ def _now():
     return datetime.now(timezone.utc).isoformat()
 
 
+def _invalidate_caches(entity: str):
+    """Drop in-memory lookup tables that mirror this entity after a write."""
+    if entity == "rates":
+        invalidate_branch_rates()
+
+
 # ── LIST (paginated) ──────────────────────────────────────────
+# Two paging modes:
+#   • offset  — page / page_size (original behaviour)
+#   • keyset  — pass cursor ("" for the first page); rows are ordered by
+#               (order col, pk) and the next page starts after next_cursor,
+#               so page 500 costs the same as page 1.
+# count_mode: exact (default) | estimated | planned | none
+#   estimated/planned use Postgres stats instead of a full COUNT(*).
+# search_mode: contains (default, ilike %q% across search_cols, trigram-
+#   indexed, see migrations/003_master_data_list_indexes.sql) |
+#   prefix — case-insensitive q% on the name (order) column only, via the
+#   prefix_key computed column and its lower(col) text_pattern_ops index
+#   (migrations/018_master_data_prefix_search.sql)
+
+COUNT_MODES = {"exact", "estimated", "planned", "none"}
+SEARCH_MODES = {"contains", "prefix"}
+
+# None = not tried yet, False = prefix_key columns missing on this database
+_prefix_key_available = {"value": None}
+
+
+def _pg_value(val) -> str:
+    """Quote a value for use inside a PostgREST or=(...) filter."""
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        return str(val)
+    text = str(val).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
 
 def list_records(entity: str, page: int = 1, page_size: int = PAGE_SIZE,
-                 search: str = None, filters: dict = None) -> dict:
+                 search: str = None, filters: dict = None, cursor: str = None,
+                 count_mode: str = "exact", search_mode: str = "contains") -> dict:
     if entity not in VALID_ENTITIES:
         return {"status": "error", "message": f"Invalid entity: {entity}", "status_code": 400}
+    if count_mode not in COUNT_MODES:
+        return {"status": "error", "message": f"Invalid count_mode: {count_mode}", "status_code": 400}
+    if search_mode not in SEARCH_MODES:
+        return {"status": "error", "message": f"Invalid search_mode: {search_mode}", "status_code": 400}
 
     try:
         cfg = TABLE_CONFIG[entity]
+        order_col, pk = cfg["order"], cfg["pk"]
         sb = get_supabase()
 
-        query = sb.table(cfg["table"]).select(cfg["columns"], count="exact")
+        if count_mode == "none":
+            query = sb.table(cfg["table"]).select(cfg["columns"])
+        else:
+            query = sb.table(cfg["table"]).select(cfg["columns"], count=count_mode)
 
         # Apply search — ilike on searchable columns
+        use_prefix_key = False
         if search and cfg["search_cols"]:
-            # Supabase doesn't have multi-column OR via chaining,
-            # so we use .or_() with ilike on each search col
-            or_parts = ",".join(f"{col}.ilike.%{search}%" for col in cfg["search_cols"])
-            query = query.or_(or_parts)
+            if search_mode == "prefix":
+                # Single anchored predicate on the name column; the search
+                # text is matched literally, only the trailing % is a wildcard
+                prefix = escape_like(search)
+                if cfg.get("prefix_key") and _prefix_key_available["value"] is not False:
+                    use_prefix_key = True
+                    query = query.like(cfg["prefix_key"], f"{prefix.lower()}%")
+                else:
+                    query = query.ilike(order_col, f"{prefix}%")
+            else:
+                # Supabase doesn't have multi-column OR via chaining,
+                # so we use .or_() with ilike on each search col
+                or_parts = ",".join(f"{col}.ilike.%{search}%" for col in cfg["search_cols"])
+                query = query.or_(or_parts)
 
         # Apply exact-match filters (e.g. branch_id, city_id, consignor_id)
         if filters:
@@ -125,24 +186,74 @@ def list_records(entity: str, page: int = 1, page_size: int = PAGE_SIZE,
                 if val is not None:
                     query = query.eq(col, val)
 
-        # Pagination
-        offset = (page - 1) * page_size
-        query = query.order(cfg["order"]).range(offset, offset + page_size - 1)
-
-        resp = query.execute()
-        rows = _resolve_user_names(resp.data or [])
-        total = resp.count if resp.count is not None else len(rows)
-
-        return {
-            "status": "success",
-            "data": {
-                "rows": rows,
-                "page": page,
-                "page_size": page_size,
-                "total": total,
-                "has_more": (offset + page_size) < total,
-            },
+        keyset = cursor is not None
+        if keyset:
+            if cursor:
+                try:
+                    after_val, after_pk = decode_cursor(cursor)
+                except Exception:
+                    return {"status": "error", "message": "Invalid cursor", "status_code": 400}
+                if after_val is None:
+                    # NULL sort values come last (ASC NULLS LAST): only the
+                    # remaining NULL rows follow
+                    query = query.is_(order_col, "null").gt(pk, after_pk)
+                else:
+                    v, k = _pg_value(after_val), _pg_value(after_pk)
+                    query = query.or_(
+                        f"{order_col}.gt.{v},{order_col}.is.null,"
+                        f"and({order_col}.eq.{v},{pk}.gt.{k})"
+                    )
+            offset = None
+            # Fetch one extra row to know whether another page exists
+            query = query.order(order_col).order(pk).limit(page_size + 1)
+        else:
+            offset = (page - 1) * page_size
+            if count_mode == "none":
+                query = query.order(order_col).order(pk).range(offset, offset + page_size)
+            else:
+                query = query.order(order_col).order(pk).range(offset, offset + page_size - 1)
+
+        if use_prefix_key:
+            resp = try_optional(
+                _prefix_key_available, query.execute,
+                "Master-data prefix keys not installed (migration 018) — using ilike on the name column",
+                missing=is_column_missing,
+            )
+            if resp is MISSING:
+                return list_records(entity, page, page_size, search, filters, cursor, count_mode, search_mode)
+        else:
+            resp = query.execute()
+        rows = resp.data or []
+        total = resp.count
+
+        if keyset or count_mode == "none":
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+        else:
+            has_more = (offset + page_size) < (total if total is not None else len(rows))
+
+        next_cursor = None
+        if keyset and has_more and rows:
+            last = rows[-1]
+            next_cursor = encode_cursor(last.get(order_col), last.get(pk))
+
+        rows = _resolve_user_names(rows)
+        if total is None and count_mode != "none":
+            total = len(rows)
+
+        data = {
+            "rows": rows,
+            "page_size": page_size,
+            "total": total,
+            "total_is_estimate": count_mode in ("estimated", "planned"),
+            "has_more": has_more,
         }
+        if keyset:
+            data["next_cursor"] = next_cursor
+        else:
+            data["page"] = page
+
+        return {"status": "success", "data": data}
     except Exception as e:
         return {"status": "error", "message": str(e), "status_code": 500}
 
@@ -187,6 +298,7 @@ def create_record(entity: str, data: dict, user_id: str = None) -> dict:
         data.pop("id", None)
 
         resp = sb.table(cfg["table"]).insert(data).execute()
+        _invalidate_caches(entity)
         return {"status": "success", "data": resp.data[0] if resp.data else None, "message": f"{entity[:-1].title()} created"}
     except Exception as e:
         msg = str(e)
@@ -216,6 +328,7 @@ def update_record(entity: str, record_id: str, data: dict, user_id: str = None)
         resp = sb.table(cfg["table"]).update(data).eq(pk, record_id).execute()
         if not resp.data:
             return {"status": "error", "message": "Record not found", "status_code": 404}
+        _invalidate_caches(entity)
         return {"status": "success", "data": resp.data[0], "message": f"{entity[:-1].title()} updated"}
     except Exception as e:
         return {"status": "error", "message": str(e), "status_code": 500}
@@ -233,6 +346,7 @@ def delete_record(entity: str, record_id: str) -> dict:
         resp = sb.table(cfg["table"]).delete().eq(pk, record_id).execute()
         if not resp.data:
             return {"status": "error", "message": "Record not found", "status_code": 404}
+        _invalidate_caches(entity)
         return {"status": "success", "message": f"{entity[:-1].title()} deleted"}
     except Exception as e:
         return {"status": "error", "message": str(e), "status_code": 500}
@@ -244,6 +358,7 @@ def bulk_update(entity: str, updates: list, user_id: str = None) -> dict:
     """
     updates = [ { "id": "uuid", "field1": "val1", ... }, ... ]
     Each item MUST have an 'id'.
+    Sent as chunked batches via services.batch_update, not one request per item.
     """
     if entity not in VALID_ENTITIES:
         return {"status": "error", "message": f"Invalid entity: {entity}", "status_code": 400}
@@ -255,24 +370,28 @@ def bulk_update(entity: str, updates: list, user_id: str = None) -> dict:
         sb = get_supabase()
         now = _now()
 
-        success = 0
         failed = []
+        items = []
         pk = cfg["pk"]
         for item in updates:
             rid = item.get(pk) or item.get("id")
             if not rid:
                 failed.append({"error": f"Missing {pk}", "item": item})
                 continue
-            payload = {k: v for k, v in item.items() if k not in (pk, "id")}
-            payload["updated_at"] = now
+            row = {k: v for k, v in item.items() if k not in (pk, "id")}
+            row["updated_at"] = now
             if user_id:
-                payload["updated_by"] = user_id
-            try:
-                sb.table(cfg["table"]).update(payload).eq(pk, rid).execute()
-                success += 1
-            except Exception as e:
-                failed.append({"id": rid, "error": str(e)})
+                row["updated_by"] = user_id
+            row[pk] = rid
+            items.append(row)
+
+        # One RPC per 500 rows (or one request per distinct payload as fallback)
+        updated, update_failed = batch_update_rows(sb, cfg["table"], pk, items)
+        failed.extend(update_failed)
+        success = len(updated)
 
+        if success:
+            _invalidate_caches(entity)
         return {
             "status": "success",
             "message": f"Bulk update: {success} updated, {len(failed)} failed",
@@ -306,6 +425,7 @@ def bulk_create(entity: str, records: list, user_id: str = None) -> dict:
                 rec["updated_by"] = user_id
 
         resp = sb.table(cfg["table"]).insert(records).execute()
+        _invalidate_caches(entity)
         return {
             "status": "success",
             "message": f"{len(resp.data)} {entity} created",
@@ -329,6 +449,8 @@ def bulk_delete(entity: str, ids: list) -> dict:
         sb = get_supabase()
         resp = sb.table(cfg["table"]).delete().in_(pk, ids).execute()
         deleted = len(resp.data) if resp.data else 0
+        if deleted:
+            _invalidate_caches(entity)
         return {
             "status": "success",
             "message": f"{deleted} {entity} deleted",
@@ -7,6 +7,7 @@ Supports both individual and bulk payment updates
 from datetime import datetime, timezone
 from typing import Optional, Dict, List
 from services.supabase_client import get_supabase
+from services.challan.transit_service import note_bilties_edited
 import json
 
 
@@ -169,6 +170,9 @@ def save_bilty_payment(bilty_id: str, payment_data: dict) -> dict:
                 "status_code": 500
             }
 
+        # payment_mode decides the challan's to-pay / paid split
+        note_bilties_edited(sb, [update_resp.data[0].get("gr_no")])
+
         return {
             "status": "success",
             "bilty_id": bilty_id,
@@ -282,6 +286,9 @@ def save_station_bilty_payment(gr_no: str, payment_data: dict) -> dict:
                 "status_code": 500
             }
 
+        # payment_status decides the challan's to-pay / paid split
+        note_bilties_edited(sb, [gr_no])
+
         return {
             "status": "success",
             "gr_no": gr_no,
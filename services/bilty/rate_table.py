@@ -0,0 +1,331 @@
+"""
+Precompiled Rate Table
+Per-branch in-memory index of the `rates` table and per-consignor index of
+`consignor_bilty_profile`, so the bilty form's rate / DD lookups are O(1)
+dict hits instead of a Supabase round trip per interaction.
+
+  branch table   : (city_id, consignor_id) → rate row,  city_id → default rate
+  consignor table: destination_station_id  → [active profile rows]
+
+Both are built lazily on first use and invalidated:
+  • rates      — after every rate write-behind flush (_auto_save_rate) and on
+                 any master-data write to the `rates` entity
+  • profiles   — profiles are edited outside this service
+Invalidation only reaches the current worker, so every cached table also
+carries a version — (row count, max updated_at) of its source rows — and is
+re-checked against the database at most every VERSION_CHECK_S with one
+single-row query.  updated_at is stamped by trigger on every insert / update
+(migrations/022_rate_tables_updated_at.sql), so writes made by another
+worker or outside the backend are picked up within that window; the TTLs
+remain as a safety net.  Without the migration only writers that set
+updated_at themselves are detected before the TTL.
+A generation counter stops a build that raced with an invalidation from
+being stored.  Each index is a size-bounded LRU.
+"""
+import threading
+import time
+from collections import OrderedDict
+from services.supabase_client import get_supabase
+
+RATE_TABLE_TTL_S = 600       # safety net for writes made outside this process
+PROFILE_TTL_S = 300
+VERSION_CHECK_S = 10         # cross-worker staleness window
+RATE_TABLE_MAX = 200         # branches kept
+PROFILE_TABLE_MAX = 5000     # consignors kept
+FETCH_PAGE_SIZE = 1000       # supabase max rows per request
+
+RATE_COLUMNS = "id, branch_id, city_id, consignor_id, rate, is_default, updated_at"
+PROFILE_COLUMNS = (
+    "id, consignor_id, destination_station_id, city_code, city_name, "
+    "transport_name, transport_gst, rate, rate_unit, minimum_weight_kg, "
+    "labour_rate, labour_unit, dd_charge_per_kg, dd_charge_per_nag, "
+    "receiving_slip_charge, bilty_charge, is_no_charge, "
+    "effective_from, effective_to, is_active, "
+    "dd_print_charge_per_kg, dd_print_charge_per_nag, "
+    "is_toll_tax_applicable, toll_tax_amount, freight_minimum_amount, updated_at"
+)
+
+_lock = threading.Lock()
+_branch_tables: OrderedDict = OrderedDict()    # branch_id → table dict
+_profile_tables: OrderedDict = OrderedDict()   # consignor_id → table dict
+_gen = {"rates": 0, "profiles": 0}
+_stats = {
+    "rate_hits": 0, "rate_builds": 0,
+    "profile_hits": 0, "profile_builds": 0,
+    "invalidations": 0, "version_checks": 0, "stale_rebuilds": 0,
+    "evictions": 0,
+}
+
+
+def _fetch_all(query_fn) -> list:
+    """Paginate through all supabase rows for a query."""
+    all_rows = []
+    page = 0
+    while True:
+        res = query_fn(page * FETCH_PAGE_SIZE, (page + 1) * FETCH_PAGE_SIZE - 1)
+        rows = res.data or []
+        all_rows.extend(rows)
+        if len(rows) < FETCH_PAGE_SIZE:
+            break
+        page += 1
+    return all_rows
+
+
+def _put(tables: OrderedDict, key, entry: dict, limit: int):
+    """Store entry as most recently used and evict the oldest past limit (caller holds _lock)."""
+    tables[key] = entry
+    tables.move_to_end(key)
+    while len(tables) > limit:
+        tables.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def _fresh(entry: dict, ttl: float) -> bool:
+    return entry is not None and (time.monotonic() - entry["built_at"]) < ttl
+
+
+def _checked(entry: dict) -> bool:
+    """True while the entry's version was confirmed within VERSION_CHECK_S."""
+    return (time.monotonic() - entry["checked_at"]) < VERSION_CHECK_S
+
+
+def _version(rows: list) -> str:
+    """(row count, latest updated_at) — changes on insert, delete and edit."""
+    stamps = [r["updated_at"] for r in rows if r.get("updated_at")]
+    return f"{len(rows)}:{max(stamps) if stamps else ''}"
+
+
+def _db_version(query) -> str:
+    """Same version as _version, read from the database with one row."""
+    res = query.order("updated_at", desc=True, nullsfirst=False).limit(1).execute()
+    latest = (res.data or [{}])[0].get("updated_at")
+    return f"{res.count or 0}:{latest or ''}"
+
+
+def _confirm(entry: dict, current_version: str) -> bool:
+    """Mark entry checked if it still matches the database version."""
+    with _lock:
+        _stats["version_checks"] += 1
+        if entry["version"] != current_version:
+            _stats["stale_rebuilds"] += 1
+            return False
+        entry["checked_at"] = time.monotonic()
+        return True
+
+
+# ── Branch rate table ─────────────────────────────────────────
+
+def _build_branch_table(branch_id: str) -> dict:
+    sb = get_supabase()
+    rows = _fetch_all(
+        lambda lo, hi: sb.table("rates")
+        .select(RATE_COLUMNS)
+        .eq("branch_id", branch_id)
+        .order("id")
+        .range(lo, hi)
+        .execute()
+    )
+    by_key = {}
+    default_rows = []
+    default_by_city = {}
+    for r in rows:
+        if r.get("is_default"):
+            default_rows.append(r)
+            default_by_city[r["city_id"]] = r["rate"]
+        if r.get("consignor_id"):
+            by_key[(r["city_id"], r["consignor_id"])] = r
+    now = time.monotonic()
+    return {
+        "rows": rows,
+        "by_key": by_key,
+        "default_rows": default_rows,
+        "default_by_city": default_by_city,
+        "version": _version(rows),
+        "built_at": now,
+        "checked_at": now,
+    }
+
+
+def get_branch_rate_table(branch_id: str) -> dict:
+    """Return the (lazily built) rate table for a branch."""
+    with _lock:
+        entry = _branch_tables.get(branch_id)
+        if not _fresh(entry, RATE_TABLE_TTL_S):
+            entry = None
+        elif _checked(entry):
+            _branch_tables.move_to_end(branch_id)
+            _stats["rate_hits"] += 1
+            return entry
+        gen = _gen["rates"]
+
+    if entry is not None:
+        current = _db_version(
+            get_supabase().table("rates").select("updated_at", count="exact").eq("branch_id", branch_id)
+        )
+        if _confirm(entry, current):
+            with _lock:
+                _stats["rate_hits"] += 1
+            return entry
+
+    entry = _build_branch_table(branch_id)
+    with _lock:
+        _stats["rate_builds"] += 1
+        if _gen["rates"] == gen:
+            _put(_branch_tables, branch_id, entry, RATE_TABLE_MAX)
+    return entry
+
+
+def lookup_rate(branch_id: str, city_id: str, consignor_id: str = None):
+    """
+    Rate for branch+city(+consignor): consignor rate first, then the
+    branch default for the city. Returns (rate, source) or (None, None).
+    """
+    table = get_branch_rate_table(branch_id)
+    if consignor_id:
+        row = table["by_key"].get((city_id, consignor_id))
+        if row:
+            return float(row["rate"]), "consignor_rate"
+    default = table["default_by_city"].get(city_id)
+    if default is not None:
+        return float(default), "default_rate"
+    return None, None
+
+
+def invalidate_branch_rates(branch_ids=None):
+    """Drop cached rate tables for the given branches (None → all)."""
+    with _lock:
+        _gen["rates"] += 1
+        _stats["invalidations"] += 1
+        if branch_ids is None:
+            _branch_tables.clear()
+        else:
+            for b in branch_ids:
+                _branch_tables.pop(b, None)
+
+
+# ── Consignor profile table ───────────────────────────────────
+
+def _build_profile_table(consignor_id: str) -> dict:
+    sb = get_supabase()
+    rows = (
+        sb.table("consignor_bilty_profile")
+        .select(PROFILE_COLUMNS)
+        .eq("consignor_id", consignor_id)
+        .eq("is_active", True)
+        .order("city_name")
+        .execute()
+    ).data or []
+    return _profile_entry(rows, time.monotonic())
+
+
+def _profile_entry(rows: list, now: float) -> dict:
+    by_city = {}
+    for r in rows:
+        cid = r.get("destination_station_id")
+        if cid:
+            by_city.setdefault(cid, []).append(r)
+    return {"rows": rows, "by_city": by_city, "version": _version(rows), "built_at": now, "checked_at": now}
+
+
+def get_consignor_profile_table(consignor_id: str) -> dict:
+    """Return the (lazily built) active profile table for a consignor."""
+    with _lock:
+        entry = _profile_tables.get(consignor_id)
+        if not _fresh(entry, PROFILE_TTL_S):
+            entry = None
+        elif _checked(entry):
+            _profile_tables.move_to_end(consignor_id)
+            _stats["profile_hits"] += 1
+            return entry
+        gen = _gen["profiles"]
+
+    if entry is not None:
+        current = _db_version(
+            get_supabase().table("consignor_bilty_profile")
+            .select("updated_at", count="exact")
+            .eq("consignor_id", consignor_id)
+            .eq("is_active", True)
+        )
+        if _confirm(entry, current):
+            with _lock:
+                _stats["profile_hits"] += 1
+            return entry
+
+    entry = _build_profile_table(consignor_id)
+    with _lock:
+        _stats["profile_builds"] += 1
+        if _gen["profiles"] == gen:
+            _put(_profile_tables, consignor_id, entry, PROFILE_TABLE_MAX)
+    return entry
+
+
+def prefetch_consignor_profiles(consignor_ids) -> None:
+    """
+    Build profile tables for every uncached consignor with ONE set query.
+    Cached tables due a version check are rebuilt by the same query, which
+    is cheaper than one version probe per consignor.
+    """
+    with _lock:
+        missing = []
+        for c in set(consignor_ids):
+            entry = _profile_tables.get(c)
+            if c and not (_fresh(entry, PROFILE_TTL_S) and _checked(entry)):
+                missing.append(c)
+        gen = _gen["profiles"]
+    if not missing:
+        return
+
+    sb = get_supabase()
+    rows = []
+    for i in range(0, len(missing), 200):
+        chunk = missing[i:i + 200]
+        rows.extend(_fetch_all(
+            lambda lo, hi: sb.table("consignor_bilty_profile")
+            .select(PROFILE_COLUMNS)
+            .in_("consignor_id", chunk)
+            .eq("is_active", True)
+            .order("city_name")
+            .order("id")
+            .range(lo, hi)
+            .execute()
+        ))
+
+    by_consignor = {c: [] for c in missing}
+    for r in rows:
+        by_consignor[r["consignor_id"]].append(r)
+    now = time.monotonic()
+    tables = {c: _profile_entry(c_rows, now) for c, c_rows in by_consignor.items()}
+
+    with _lock:
+        _stats["profile_builds"] += len(tables)
+        if _gen["profiles"] == gen:
+            for c, entry in tables.items():
+                _put(_profile_tables, c, entry, PROFILE_TABLE_MAX)
+
+
+def lookup_profile(consignor_id: str, destination_city_id: str) -> dict | None:
+    """First active profile row for consignor + destination, or None."""
+    rows = get_consignor_profile_table(consignor_id)["by_city"].get(destination_city_id)
+    return rows[0] if rows else None
+
+
+def invalidate_consignor_profiles(consignor_ids=None):
+    """Drop cached profile tables for the given consignors (None → all)."""
+    with _lock:
+        _gen["profiles"] += 1
+        _stats["invalidations"] += 1
+        if consignor_ids is None:
+            _profile_tables.clear()
+        else:
+            for c in consignor_ids:
+                _profile_tables.pop(c, None)
+
+
+def get_rate_table_stats() -> dict:
+    """Snapshot of cache sizes and counters for the metrics endpoint."""
+    with _lock:
+        return {
+            **_stats,
+            "branches_cached": len(_branch_tables),
+            "consignors_cached": len(_profile_tables),
+        }
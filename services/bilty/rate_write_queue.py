@@ -0,0 +1,156 @@
+"""
+Rate Write-Behind Queue
+Coalesces the per-bilty "remember this rate" writes into batched upserts.
+
+Every bilty save used to run its own ilike lookup + select + update/insert
+against `rates`.  Most saves repeat the same (branch, city, consignor, rate),
+so instead each save drops its rate into an in-process dict keyed by
+(branch_id, city_id, consignor_id).  A single background flusher waits a
+short window, swaps the dict out and writes everything as ONE upsert
+(on_conflict = branch_id, city_id, consignor_id — see
+migrations/002_rates_unique_key.sql).
+
+The queue is bounded: when it is full, new keys are dropped (and counted)
+rather than letting memory grow while the DB is unreachable.
+Counters are exposed through get_rate_queue_stats() → GET /api/metrics.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from services.supabase_client import get_supabase
+from services.bilty.rate_table import invalidate_branch_rates
+
+RATE_FLUSH_WINDOW_S = 2.0    # coalescing window before a flush
+RATE_QUEUE_MAX = 1000        # max distinct pending keys
+RATE_UPSERT_CHUNK = 500      # rows per upsert request
+
+_lock = threading.Lock()
+_wake = threading.Event()
+_pending: dict = {}          # (branch_id, city_id, consignor_id) → rate
+_flusher: threading.Thread = None
+
+_stats = {
+    "enqueued": 0,
+    "coalesced": 0,
+    "dropped": 0,
+    "flushes": 0,
+    "rows_written": 0,
+    "flush_errors": 0,
+    "last_flush_at": None,
+    "last_flush_ms": None,
+    "last_error_at": None,   # the error text itself goes to the log only
+}
+
+
+def _ensure_flusher():
+    """Start the daemon flusher thread on first use (lock must be held)."""
+    global _flusher
+    if _flusher is None or not _flusher.is_alive():
+        _flusher = threading.Thread(target=_flusher_loop, name="rate-write-queue", daemon=True)
+        _flusher.start()
+
+
+def _flusher_loop():
+    while True:
+        _wake.wait()
+        time.sleep(RATE_FLUSH_WINDOW_S)
+        _wake.clear()
+        flush_rate_queue()
+
+
+def enqueue_rate(branch_id: str, city_id: str, consignor_id: str, rate_value) -> bool:
+    """
+    Queue a rate upsert for branch+city+consignor.
+    Later writes for the same key inside the window replace earlier ones.
+    Returns False if the value was invalid or the queue was full.
+    """
+    if not branch_id or not city_id or not consignor_id:
+        return False
+    try:
+        rate = float(rate_value)
+    except (TypeError, ValueError):
+        return False
+    if rate <= 0:
+        return False
+
+    key = (branch_id, city_id, consignor_id)
+    with _lock:
+        if key in _pending:
+            _stats["coalesced"] += 1
+        elif len(_pending) >= RATE_QUEUE_MAX:
+            _stats["dropped"] += 1
+            return False
+        _pending[key] = rate
+        _stats["enqueued"] += 1
+        _ensure_flusher()
+    _wake.set()
+    return True
+
+
+def flush_rate_queue() -> int:
+    """
+    Write all pending rates as batched upserts. Returns rows written.
+    On failure the batch is put back (without overwriting newer values)
+    so the next window retries it.
+    """
+    with _lock:
+        if not _pending:
+            return 0
+        batch = dict(_pending)
+        _pending.clear()
+
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [
+        {
+            "branch_id": b,
+            "city_id": c,
+            "consignor_id": con,
+            "rate": rate,
+            "updated_at": now,
+        }
+        for (b, c, con), rate in batch.items()
+    ]
+
+    written = 0
+    try:
+        sb = get_supabase()
+        for i in range(0, len(rows), RATE_UPSERT_CHUNK):
+            chunk = rows[i:i + RATE_UPSERT_CHUNK]
+            sb.table("rates").upsert(
+                chunk, on_conflict="branch_id,city_id,consignor_id"
+            ).execute()
+            written += len(chunk)
+    except Exception as e:
+        unwritten = rows[written:]
+        with _lock:
+            _stats["flush_errors"] += 1
+            _stats["last_error_at"] = now
+            for r in unwritten:
+                key = (r["branch_id"], r["city_id"], r["consignor_id"])
+                if key not in _pending and len(_pending) < RATE_QUEUE_MAX:
+                    _pending[key] = r["rate"]
+        print(f"Rate queue flush error ({len(unwritten)} rows requeued): {e}")
+        if unwritten:
+            _wake.set()
+
+    with _lock:
+        _stats["flushes"] += 1
+        _stats["rows_written"] += written
+        _stats["last_flush_at"] = now
+        _stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    if written:
+        invalidate_branch_rates({r["branch_id"] for r in rows[:written]})
+    return written
+
+
+def get_rate_queue_stats() -> dict:
+    """Snapshot of queue depth and counters for the metrics endpoint."""
+    with _lock:
+        return {
+            **_stats,
+            "pending": len(_pending),
+            "capacity": RATE_QUEUE_MAX,
+            "flush_window_s": RATE_FLUSH_WINDOW_S,
+        }
@@ -7,6 +7,7 @@ Uses ThreadPoolExecutor for true parallel DB queries.
 from concurrent.futures import as_completed
 from services.supabase_client import get_supabase
 from services.thread_pool import shared_pool
+from services.bilty.rate_table import get_branch_rate_table
 
 
 def get_reference_data(branch_id: str, user_id: str) -> dict:
@@ -58,12 +59,8 @@ def get_reference_data(branch_id: str, user_id: str) -> dict:
             ).data or []
 
         def fetch_rates():
-            return (
-                sb.table("rates")
-                .select("id, branch_id, city_id, consignor_id, rate, is_default")
-                .eq("branch_id", branch_id)
-                .execute()
-            ).data or []
+            # Served from the in-memory per-branch rate table
+            return get_branch_rate_table(branch_id)["rows"]
 
         def fetch_bill_books():
             return (
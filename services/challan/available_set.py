@@ -0,0 +1,251 @@
+"""
+Available-for-Transit Set
+Per-branch in-memory set of bilties that are NOT in any transit, holding the
+columns the transit screen displays, so GET /api/challan/transit/available
+for a branch is served from memory instead of a query per page view.
+
+  branch_id → { gr_no → available row }   (same shape as the RPC rows)
+
+Built from `get_available_bilties_after` (keyset pages per source, migration
+019; `get_available_bilties_page` when that is missing) and kept current
+incrementally:
+  • save_bilty                → note_bilty_saved        (new / edited bilty)
+  • add_to_transit            → note_added_to_transit   (GRs leave the set)
+  • remove_from_transit,
+    bulk_remove_from_transit,
+    delete_challan            → note_removed_from_transit (GRs come back)
+Writes made by other workers or outside this backend are picked up by
+reconciliation: an entry older than AVAILABLE_RECONCILE_S is rebuilt from
+the RPC on its next read.  A generation counter stops a build that raced
+with an incremental update from being stored.
+"""
+import threading
+import time
+from services.supabase_client import get_supabase
+from services.batch_update import MISSING, try_optional
+
+AVAILABLE_RECONCILE_S = 60
+BUILD_PAGE_SIZE = 1000
+FETCH_CHUNK = 500
+
+AVAILABLE_BILTY_COLS = (
+    "id, gr_no, branch_id, bilty_date, delivery_type, "
+    "consignor_name, consignor_gst, consignor_number, "
+    "consignee_name, consignee_gst, consignee_number, "
+    "transport_name, transport_gst, transport_number, transport_id, "
+    "payment_mode, no_of_pkg, wt, rate, freight_amount, "
+    "labour_charge, bill_charge, toll_charge, dd_charge, other_charge, pf_charge, total, "
+    "from_city_id, to_city_id, e_way_bill, pvt_marks, remark, "
+    "saving_option, is_active"
+)
+AVAILABLE_STATION_COLS = (
+    "id, gr_no, station, consignor, consignee, contents, "
+    "no_of_packets, weight, payment_status, amount, pvt_marks, "
+    "delivery_type, staff_id, branch_id, e_way_bill, "
+    "transport_id, transport_name, transport_gst, city_id, "
+    "created_at, updated_at"
+)
+_BILTY_KEYS = [c.strip() for c in AVAILABLE_BILTY_COLS.split(",")]
+
+_lock = threading.Lock()
+_sets: dict = {}             # branch_id → {"rows": {gr: row}, "order": [gr] | None, "built_at": t}
+_gen = {"value": 0}
+_rpc_available = {"value": None}
+_keyset_rpc_available = {"value": None}
+_stats = {"hits": 0, "builds": 0, "saved": 0, "added": 0, "removed": 0, "invalidations": 0}
+
+
+def _is_listed(bilty: dict) -> bool:
+    return bool(bilty.get("is_active")) and bilty.get("consignor_name") != "CANCEL BILTY"
+
+
+def _bilty_row(bilty: dict) -> dict:
+    row = {k: bilty.get(k) for k in _BILTY_KEYS}
+    row["source_table"] = "bilty"
+    row["bilty_type"] = "reg"
+    return row
+
+
+def _build_keyset(sb, branch_id: str) -> dict:
+    """Rows per source in gr_no order, each page starting after the last GR."""
+    rows = {}
+    for source in ("bilty", "station"):
+        after = None
+        while True:
+            page = sb.rpc("get_available_bilties_after", {
+                "p_branch_id": branch_id,
+                "p_source": source,
+                "p_after_gr": after,
+                "p_limit": BUILD_PAGE_SIZE,
+            }).execute().data or []
+            for r in page:
+                rows[r["gr_no"]] = r
+            if len(page) < BUILD_PAGE_SIZE:
+                break
+            after = page[-1]["gr_no"]
+    return rows
+
+
+def _build(branch_id: str) -> dict:
+    sb = get_supabase()
+    rows = try_optional(
+        _keyset_rpc_available, lambda: _build_keyset(sb, branch_id),
+        "get_available_bilties_after RPC not installed — paging get_available_bilties_page",
+    )
+    if rows is not MISSING:
+        return {"rows": rows, "order": None, "built_at": time.monotonic()}
+
+    rows = {}
+    offset = 0
+    while True:
+        resp = sb.rpc("get_available_bilties_page", {
+            "p_branch_id": branch_id,
+            "p_limit": BUILD_PAGE_SIZE,
+            "p_offset": offset,
+        }).execute()
+        page = (resp.data or {}).get("rows") or []
+        for r in page:
+            rows[r["gr_no"]] = r
+        if len(page) < BUILD_PAGE_SIZE:
+            break
+        offset += BUILD_PAGE_SIZE
+    return {"rows": rows, "order": None, "built_at": time.monotonic()}
+
+
+def _load_available_rows(sb, gr_nos: list) -> list:
+    """Available rows for GRs that just left transit (bilty preferred over station)."""
+    found = {}
+    for i in range(0, len(gr_nos), FETCH_CHUNK):
+        chunk = gr_nos[i:i + FETCH_CHUNK]
+        resp = sb.table("bilty").select(AVAILABLE_BILTY_COLS).in_("gr_no", chunk).execute()
+        for b in resp.data or []:
+            found[b["gr_no"]] = _bilty_row(b) if _is_listed(b) else None
+
+    station_grs = [g for g in gr_nos if g not in found]
+    for i in range(0, len(station_grs), FETCH_CHUNK):
+        chunk = station_grs[i:i + FETCH_CHUNK]
+        resp = sb.table("station_bilty_summary").select(AVAILABLE_STATION_COLS).in_("gr_no", chunk).execute()
+        for s in resp.data or []:
+            s["source_table"] = "station_bilty_summary"
+            s["bilty_type"] = "mnl"
+            found[s["gr_no"]] = s
+    return [r for r in found.values() if r]
+
+
+def get_available_rows(branch_id: str) -> list | None:
+    """
+    All available rows for a branch, ordered like the RPC (regular bilties
+    first, then station, each by gr_no).  None when the page RPC is not
+    installed — the caller then uses its own query path.
+    """
+    if not branch_id or _rpc_available["value"] is False:
+        return None
+
+    with _lock:
+        entry = _sets.get(branch_id)
+        if entry and (time.monotonic() - entry["built_at"]) < AVAILABLE_RECONCILE_S:
+            _stats["hits"] += 1
+            if entry["order"] is None:
+                entry["order"] = sorted(
+                    entry["rows"], key=lambda g: (entry["rows"][g]["source_table"], g)
+                )
+            return [entry["rows"][g] for g in entry["order"]]
+        gen = _gen["value"]
+
+    entry = try_optional(
+        _rpc_available, lambda: _build(branch_id),
+        "get_available_bilties_page RPC not installed — available set cache disabled",
+    )
+    if entry is MISSING:
+        return None
+
+    entry["order"] = sorted(entry["rows"], key=lambda g: (entry["rows"][g]["source_table"], g))
+    with _lock:
+        _stats["builds"] += 1
+        if _gen["value"] == gen:
+            _sets[branch_id] = entry
+    return [entry["rows"][g] for g in entry["order"]]
+
+
+def note_bilty_saved(bilty: dict, is_new: bool):
+    """A bilty was inserted or edited — add it, refresh it or drop it (cancelled)."""
+    gr = bilty.get("gr_no")
+    if not gr:
+        return
+    row = _bilty_row(bilty)
+    with _lock:
+        _gen["value"] += 1
+        _stats["saved"] += 1
+        for branch_id, entry in _sets.items():
+            rows = entry["rows"]
+            if branch_id != bilty.get("branch_id") or not _is_listed(bilty):
+                if rows.pop(gr, None) is not None:
+                    entry["order"] = None
+            elif is_new or gr in rows:
+                if gr not in rows:
+                    entry["order"] = None
+                rows[gr] = row
+
+
+def note_added_to_transit(gr_nos):
+    """GRs were put on a challan — they are no longer available anywhere."""
+    gr_nos = [g for g in gr_nos if g]
+    if not gr_nos:
+        return
+    with _lock:
+        _gen["value"] += 1
+        _stats["added"] += len(gr_nos)
+        for entry in _sets.values():
+            hit = False
+            for g in gr_nos:
+                hit = entry["rows"].pop(g, None) is not None or hit
+            if hit:
+                entry["order"] = None
+
+
+def note_removed_from_transit(sb, gr_nos):
+    """GRs were taken off a challan — load their rows and put them back."""
+    gr_nos = list({g for g in gr_nos if g})
+    if not gr_nos:
+        return
+    with _lock:
+        _gen["value"] += 1
+        if not _sets:
+            return
+    try:
+        rows = _load_available_rows(sb, gr_nos)
+    except Exception as e:
+        print(f"Available set: reload after transit removal failed, dropping sets: {e}")
+        invalidate_available()
+        return
+    with _lock:
+        _gen["value"] += 1
+        _stats["removed"] += len(gr_nos)
+        for r in rows:
+            entry = _sets.get(r.get("branch_id"))
+            if entry is not None:
+                entry["rows"][r["gr_no"]] = r
+                entry["order"] = None
+
+
+def invalidate_available(branch_ids=None):
+    """Drop cached sets for the given branches (None → all)."""
+    with _lock:
+        _gen["value"] += 1
+        _stats["invalidations"] += 1
+        if branch_ids is None:
+            _sets.clear()
+        else:
+            for b in branch_ids:
+                _sets.pop(b, None)
+
+
+def get_available_set_stats() -> dict:
+    """Snapshot of set sizes and counters for the metrics endpoint."""
+    with _lock:
+        return {
+            **_stats,
+            "branches_cached": len(_sets),
+            "rows_cached": sum(len(e["rows"]) for e in _sets.values()),
+            "reconcile_s": AVAILABLE_RECONCILE_S,
+        }
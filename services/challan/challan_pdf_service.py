@@ -0,0 +1,222 @@
+"""
+Challan / Loading-Sheet PDF Service
+Server-side rendering of the challan print and the loading sheet from
+get_challan + get_transit_bilties (+ cached stats for the totals line).
+
+Output is cached per (challan_id, kind) together with a content version:
+  version = hash(challan.updated_at, transit row count, latest transit updated_at)
+add / remove bump challan_details.updated_at, delivery updates bump
+transit_details.updated_at, and editing a bilty / station row that is on a
+challan (save_bilty, payment saves → transit_service.note_bilties_edited)
+touches its transit row's updated_at.  So any change to what the sheet
+prints yields a new version — the stale entry is simply replaced — even
+when it was made by another worker.
+
+A repeat print costs two tiny queries (header + version probe) and streams
+the cached bytes.  A fresh render loads every transit row of the challan
+and streams the PDF as it is written.  Documents above PDF_CACHE_ITEM_MAX
+are streamed without being cached, and the cache is an LRU capped at
+PDF_CACHE_MAX_BYTES.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from services.supabase_client import get_supabase
+from services.name_cache import resolve_names
+from services.pdf_writer import render_table_pdf
+from services.challan.challan_service import get_challan
+from services.challan.challan_stats_service import get_challan_stats
+from services.challan.transit_service import get_transit_bilties
+
+PDF_CACHE_MAX_BYTES = 32 * 1024 * 1024
+PDF_CACHE_ITEM_MAX = 4 * 1024 * 1024
+STREAM_CHUNK = 64 * 1024
+
+PDF_KINDS = ("challan", "loading")
+
+CHALLAN_COLUMNS = [
+    ("S.No", "sno", 30, "right"),
+    ("GR No", "gr_no", 70, "left"),
+    ("Date", "date", 58, "left"),
+    ("Consignor", "consignor_name", 120, "left"),
+    ("Consignee", "consignee_name", 120, "left"),
+    ("Destination", "city", 80, "left"),
+    ("Pkgs", "no_of_pkg", 34, "right"),
+    ("Wt", "wt", 46, "right"),
+    ("Payment", "payment_mode", 56, "left"),
+    ("Amount", "total", 60, "right"),
+    ("E-Way Bill", "e_way_bill", 78, "left"),
+    ("Pvt Marks", "pvt_marks", 34, "left"),
+]
+LOADING_COLUMNS = [
+    ("S.No", "sno", 30, "right"),
+    ("GR No", "gr_no", 75, "left"),
+    ("Consignor", "consignor_name", 130, "left"),
+    ("Consignee", "consignee_name", 130, "left"),
+    ("Destination", "city", 90, "left"),
+    ("Contents", "contain", 90, "left"),
+    ("Pvt Marks", "pvt_marks", 70, "left"),
+    ("Pkgs", "no_of_pkg", 40, "right"),
+    ("Wt", "wt", 50, "right"),
+    ("Loaded", "loaded", 80, "left"),
+]
+
+_lock = threading.Lock()
+_cache: OrderedDict = OrderedDict()   # (challan_id, kind) → {"version", "body"}
+_cache_bytes = {"value": 0}
+_stats = {"hits": 0, "renders": 0, "uncached_renders": 0, "evictions": 0}
+
+
+def _content_version(sb, challan: dict) -> str:
+    resp = sb.table("transit_details").select("updated_at", count="exact").eq(
+        "challan_no", challan["challan_no"]
+    ).order("updated_at", desc=True).limit(1).execute()
+    latest = (resp.data or [{}])[0].get("updated_at")
+    raw = f"{challan.get('updated_at')}|{resp.count}|{latest}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _iter_bytes(body: bytes):
+    for i in range(0, len(body), STREAM_CHUNK):
+        yield body[i:i + STREAM_CHUNK]
+
+
+def _store(key, version: str, body: bytes):
+    with _lock:
+        old = _cache.pop(key, None)
+        if old:
+            _cache_bytes["value"] -= len(old["body"])
+        _cache[key] = {"version": version, "body": body}
+        _cache_bytes["value"] += len(body)
+        while _cache_bytes["value"] > PDF_CACHE_MAX_BYTES and _cache:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes["value"] -= len(evicted["body"])
+            _stats["evictions"] += 1
+
+
+def _tee_into_cache(key, version: str, chunks):
+    """Stream chunks to the client while collecting them for the cache."""
+    parts, size = [], 0
+    for chunk in chunks:
+        yield chunk
+        if parts is not None:
+            parts.append(chunk)
+            size += len(chunk)
+            if size > PDF_CACHE_ITEM_MAX:
+                parts = None
+    if parts is None:
+        with _lock:
+            _stats["uncached_renders"] += 1
+        return
+    _store(key, version, b"".join(parts))
+
+
+def _fmt_num(v, digits: int = 2) -> str:
+    if v in (None, ""):
+        return ""
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return str(v)
+    return str(int(f)) if f.is_integer() else f"{f:.{digits}f}"
+
+
+def _render(challan: dict, rows: list, stats: dict, kind: str):
+    city_names = resolve_names("cities", {r.get("to_city_id") for r in rows})
+    branch_name = resolve_names("branches", [challan.get("branch_id")]).get(challan.get("branch_id"))
+
+    def table_rows():
+        for i, r in enumerate(rows, 1):
+            yield {
+                **r,
+                "sno": i,
+                "date": (r.get("bilty_date") or "")[:10],
+                "city": city_names.get(r.get("to_city_id")) or "",
+                "no_of_pkg": _fmt_num(r.get("no_of_pkg"), 0),
+                "wt": _fmt_num(r.get("wt")),
+                "total": _fmt_num(r.get("total")),
+                "loaded": "[   ]",
+            }
+
+    title = ("CHALLAN " if kind == "challan" else "LOADING SHEET ") + (challan.get("challan_no") or "")
+    header = [
+        f"Branch: {branch_name or ''}    Date: {(challan.get('date') or '')[:10]}",
+        f"Truck: {challan.get('truck_number') or ''}    Driver: {challan.get('driver_name') or ''}"
+        f"    Owner: {challan.get('owner_name') or ''}",
+        f"Dispatched: {'Yes' if challan.get('is_dispatched') else 'No'}"
+        f"    Remarks: {challan.get('remarks') or ''}",
+    ]
+    footer = [
+        f"Bilties: {stats.get('total', len(rows))}    Packages: {_fmt_num(stats.get('total_packages'), 0)}"
+        f"    Weight: {_fmt_num(stats.get('total_weight'))}    E-Way Bills: {stats.get('ewb_count', 0)}",
+    ]
+    if kind == "challan":
+        footer.append(
+            f"To-Pay: {_fmt_num(stats.get('topay_amount'))}    Paid: {_fmt_num(stats.get('paid_amount'))}"
+        )
+
+    columns = CHALLAN_COLUMNS if kind == "challan" else LOADING_COLUMNS
+    return render_table_pdf(title, header, columns, table_rows(), footer, landscape=True)
+
+
+def get_challan_pdf(challan_id: str, kind: str = "challan") -> dict:
+    """
+    Challan (kind="challan") or loading sheet (kind="loading") PDF.
+    On success data.chunks is an iterator of bytes for a streaming response.
+    """
+    if kind not in PDF_KINDS:
+        return {"status": "error", "message": f"Invalid kind: {kind}. Valid: {list(PDF_KINDS)}", "status_code": 400}
+    try:
+        sb = get_supabase()
+        resp = sb.table("challan_details").select("id, challan_no, updated_at").eq("id", challan_id).execute()
+        head = (resp.data or [None])[0]
+        if not head:
+            return {"status": "error", "message": "Challan not found", "status_code": 404}
+
+        challan_no = head["challan_no"]
+        version = _content_version(sb, head)
+        key = (challan_id, kind)
+        filename = f"{kind}_{challan_no}.pdf"
+
+        with _lock:
+            entry = _cache.get(key)
+            if entry and entry["version"] == version:
+                _cache.move_to_end(key)
+                _stats["hits"] += 1
+                body = entry["body"]
+            else:
+                body = None
+        if body is not None:
+            return {"status": "success", "data": {
+                "filename": filename, "version": version, "cached": True, "chunks": _iter_bytes(body),
+            }}
+
+        challan_res = get_challan(challan_id)
+        if challan_res.get("status") != "success":
+            return challan_res
+        transit_res = get_transit_bilties(challan_no)
+        if transit_res.get("status") != "success":
+            return transit_res
+        stats_res = get_challan_stats(challan_no)
+        stats = stats_res.get("data") if stats_res.get("status") == "success" else {}
+
+        with _lock:
+            _stats["renders"] += 1
+        chunks = _render(challan_res["data"], transit_res["data"]["rows"], stats or {}, kind)
+        return {"status": "success", "data": {
+            "filename": filename, "version": version, "cached": False,
+            "chunks": _tee_into_cache(key, version, chunks),
+        }}
+    except Exception as e:
+        return {"status": "error", "message": str(e), "status_code": 500}
+
+
+def get_challan_pdf_stats() -> dict:
+    """Snapshot of cache size and counters for the metrics endpoint."""
+    with _lock:
+        return {
+            **_stats,
+            "entries": len(_cache),
+            "bytes": _cache_bytes["value"],
+            "max_bytes": PDF_CACHE_MAX_BYTES,
+        }
@@ -3,8 +3,15 @@ Challan Service
 Create challans, list, dispatch, hub receipt.
 Auto-generates challan numbers from challan_books.
 """
+from concurrent.futures import as_completed
 from datetime import datetime, timezone
 from services.supabase_client import get_supabase
+from services.thread_pool import shared_pool
+from services.name_cache import resolve_names
+from services.challan.available_set import note_removed_from_transit
+from services.challan.challan_stats_service import drop_challan_stats, get_challan_stats
+from services.challan.challan_book_service import COLS as BOOK_COLS
+from services.challan.transit_service import get_transit_bilties
 
 CHALLAN_COLS = (
     "id, challan_no, branch_id, truck_id, owner_id, driver_id, "
@@ -50,21 +57,15 @@ def _resolve_names(rows: list) -> list:
         if r.get("created_by") and isinstance(r["created_by"], str) and len(r["created_by"]) > 20:
             user_ids.add(r["created_by"])
 
-    sb = get_supabase()
     truck_map = {}
     staff_map = {}
     user_map = {}
 
+    # Served from the shared name cache — no DB round trip once warm
     try:
-        if truck_ids:
-            resp = sb.table("trucks").select("id, truck_number").in_("id", list(truck_ids)).execute()
-            truck_map = {t["id"]: t["truck_number"] for t in (resp.data or [])}
-        if staff_ids:
-            resp = sb.table("staff").select("id, name").in_("id", list(staff_ids)).execute()
-            staff_map = {s["id"]: s["name"] or s["id"] for s in (resp.data or [])}
-        if user_ids:
-            resp = sb.table("users").select("id, name").in_("id", list(user_ids)).execute()
-            user_map = {u["id"]: u["name"] or u["id"] for u in (resp.data or [])}
+        truck_map = resolve_names("trucks", truck_ids)
+        staff_map = {k: v or k for k, v in resolve_names("staff", staff_ids).items()}
+        user_map = {k: v or k for k, v in resolve_names("users", user_ids).items()}
     except Exception:
         pass
 
@@ -125,6 +126,74 @@ def get_challan(challan_id: str) -> dict:
         return {"status": "error", "message": str(e), "status_code": 500}
 
 
+# ── WORKSPACE (header + transit + stats + books in one call) ──
+
+def _active_books_for_branch(branch_id: str) -> dict:
+    try:
+        sb = get_supabase()
+        resp = sb.table("challan_books").select(BOOK_COLS).eq(
+            "branch_1", branch_id
+        ).eq("is_active", True).eq("is_completed", False).order("created_at", desc=True).execute()
+        return {"status": "success", "data": resp.data or []}
+    except Exception as e:
+        return {"status": "error", "message": str(e), "status_code": 500}
+
+
+def get_challan_workspace(challan_id: str) -> dict:
+    """
+    Everything the challan screen needs when a challan is opened:
+    header (name-resolved), transit rows with bilty/station details,
+    cached stats and challan books — replaces the separate get, transit,
+    stats and init calls.  After the header read the rest run in parallel.
+    """
+    try:
+        sb = get_supabase()
+        resp = sb.table("challan_details").select(CHALLAN_COLS).eq("id", challan_id).execute()
+        header = (resp.data or [None])[0]
+        if not header:
+            return {"status": "error", "message": "Challan not found", "status_code": 404}
+
+        challan_no = header["challan_no"]
+        results = {}
+        futures = {
+            shared_pool.submit(_resolve_names, [header]): "header",
+            shared_pool.submit(get_transit_bilties, challan_no): "transit",
+            shared_pool.submit(get_challan_stats, challan_no): "stats",
+            shared_pool.submit(_active_books_for_branch, header.get("branch_id")): "books",
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+        for key in ("transit", "stats", "books"):
+            if results[key].get("status") != "success":
+                return results[key]
+
+        transit_rows = results["transit"]["data"]["rows"]
+        books = results["books"]["data"]
+
+        # Book the challan's bilties were loaded from (first transit row)
+        book = None
+        book_id = next((r["challan_book_id"] for r in transit_rows if r.get("challan_book_id")), None)
+        if book_id:
+            book = next((b for b in books if b["id"] == book_id), None)
+            if book is None:
+                b_resp = sb.table("challan_books").select(BOOK_COLS).eq("id", book_id).execute()
+                book = (b_resp.data or [None])[0]
+
+        return {
+            "status": "success",
+            "data": {
+                "challan": header,
+                "transit_bilties": transit_rows,
+                "stats": results["stats"]["data"],
+                "challan_book": book,
+                "challan_books": books,
+            },
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e), "status_code": 500}
+
+
 # ── CREATE CHALLAN ────────────────────────────────────────────
 
 def create_challan(data: dict) -> dict:
@@ -328,7 +397,9 @@ def delete_challan(challan_id: str) -> dict:
         challan_resp = sb.table("challan_details").select("challan_no").eq("id", challan_id).single().execute()
         challan_no = challan_resp.data.get("challan_no") if challan_resp.data else None
         if challan_no:
-            sb.table("transit_details").delete().eq("challan_no", challan_no).execute()
+            del_resp = sb.table("transit_details").delete().eq("challan_no", challan_no).execute()
+            note_removed_from_transit(sb, [r["gr_no"] for r in (del_resp.data or [])])
+            drop_challan_stats(sb, challan_no)
 
         resp = sb.table("challan_details").update({
             "is_active": False,
@@ -0,0 +1,293 @@
+"""
+Challan Stats Counters
+One `challan_stats` row per challan (migrations/006_challan_stats.sql) holds
+bilty count, packages, weight, e-way bill count, to-pay / paid totals and
+delivery-stage counts, so opening a challan reads one row instead of every
+transit row plus every bilty / station row behind it.
+
+Kept current incrementally by transit_service:
+  • add_to_transit / remove_from_transit / bulk_remove_from_transit
+        → apply_transit_delta(+1 / -1) for the inserted / deleted rows
+  • bulk_update_delivery_status → apply_stage_delta for flags that flipped
+Edits to a bilty / station row already on a challan (save_bilty, payment
+saves) change weight, packages, e-way bill or the to-pay / paid split, so
+transit_service.note_bilties_edited drops the challan's row and it is
+rebuilt on its next read — later deltas then subtract the values that row
+was built from.
+Deltas go through the `bump_challan_stats` RPC (atomic col = col + x) and
+only touch rows that already exist.  A challan without a row is built in
+full on its next read; if a delta cannot be applied the row is dropped so
+the next read rebuilds it.  POST .../stats/{challan_no}/rebuild repairs a
+row on demand.
+
+The read-time build first claims the row with a building = true
+placeholder (migrations/021_challan_stats_build_claim.sql) and stores its
+result only while that placeholder is untouched, so a delta or drop that
+lands during the compute is never overwritten by the stale result.
+"""
+from datetime import datetime, timezone
+from services.supabase_client import get_supabase
+from services.batch_update import MISSING, is_column_missing, try_optional
+
+FETCH_PAGE_SIZE = 1000
+IN_CHUNK = 500
+BUILD_CLAIM_S = 60         # a placeholder older than this belongs to a dead build
+
+# None = not tried yet, False = challan_stats.building missing on this database
+_claim_available = {"value": None}
+
+# stats key → transit_details flag column
+STAGE_FLAGS = {
+    "out_from_branch1": "is_out_of_delivery_from_branch1",
+    "delivered_at_branch2": "is_delivered_at_branch2",
+    "out_from_branch2": "is_out_of_delivery_from_branch2",
+    "delivered_at_destination": "is_delivered_at_destination",
+    "door_delivery": "out_for_door_delivery",
+}
+STATS_KEYS = (
+    "total", "regular", "station", "total_weight", "total_packages",
+    "ewb_count", "topay_amount", "paid_amount", *STAGE_FLAGS,
+)
+_MONEY_KEYS = ("total_weight", "topay_amount", "paid_amount")
+_TOPAY_MODES = ("TO-PAY", "TO-PAY/DD")
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _empty() -> dict:
+    return {k: 0 for k in STATS_KEYS}
+
+
+def _rounded(stats: dict) -> dict:
+    out = {k: stats.get(k) or 0 for k in STATS_KEYS}
+    for k in _MONEY_KEYS:
+        out[k] = round(float(out[k]), 2)
+    return out
+
+
+def _aggregate(sb, transit_rows: list) -> dict:
+    """Stats contribution of transit rows (needs gr_no, bilty_id and stage flags)."""
+    agg = _empty()
+    bilty_ids = [r["bilty_id"] for r in transit_rows if r.get("bilty_id")]
+    station_grs = [r["gr_no"] for r in transit_rows if not r.get("bilty_id")]
+    agg["total"] = len(transit_rows)
+    agg["regular"] = len(bilty_ids)
+    agg["station"] = len(station_grs)
+    for r in transit_rows:
+        for key, flag in STAGE_FLAGS.items():
+            if r.get(flag):
+                agg[key] += 1
+
+    for i in range(0, len(bilty_ids), IN_CHUNK):
+        b_resp = sb.table("bilty").select(
+            "id, wt, no_of_pkg, e_way_bill, payment_mode, total"
+        ).in_("id", bilty_ids[i:i + IN_CHUNK]).execute()
+        for b in (b_resp.data or []):
+            agg["total_weight"] += float(b.get("wt") or 0)
+            agg["total_packages"] += int(b.get("no_of_pkg") or 0)
+            if b.get("e_way_bill"):
+                agg["ewb_count"] += 1
+            if (b.get("payment_mode") or "").upper() in _TOPAY_MODES:
+                agg["topay_amount"] += float(b.get("total") or 0)
+            else:
+                agg["paid_amount"] += float(b.get("total") or 0)
+
+    for i in range(0, len(station_grs), IN_CHUNK):
+        s_resp = sb.table("station_bilty_summary").select(
+            "gr_no, weight, no_of_packets, e_way_bill, payment_status, amount"
+        ).in_("gr_no", station_grs[i:i + IN_CHUNK]).execute()
+        for s in (s_resp.data or []):
+            agg["total_weight"] += float(s.get("weight") or 0)
+            agg["total_packages"] += int(s.get("no_of_packets") or 0)
+            if s.get("e_way_bill"):
+                agg["ewb_count"] += 1
+            if (s.get("payment_status") or "").upper() in _TOPAY_MODES:
+                agg["topay_amount"] += float(s.get("amount") or 0)
+            else:
+                agg["paid_amount"] += float(s.get("amount") or 0)
+    return agg
+
+
+def _compute(sb, challan_no: str) -> dict:
+    cols = "id, gr_no, bilty_id, " + ", ".join(STAGE_FLAGS.values())
+    rows = []
+    page = 0
+    while True:
+        lo = page * FETCH_PAGE_SIZE
+        resp = sb.table("transit_details").select(cols).eq(
+            "challan_no", challan_no
+        ).order("id").range(lo, lo + FETCH_PAGE_SIZE - 1).execute()
+        batch = resp.data or []
+        rows.extend(batch)
+        if len(batch) < FETCH_PAGE_SIZE:
+            break
+        page += 1
+    return _rounded(_aggregate(sb, rows))
+
+
+def _store(sb, challan_no: str, stats: dict):
+    """Overwrite the row (rebuild)."""
+    row = {"challan_no": challan_no, **stats, "updated_at": _now()}
+    done = try_optional(
+        _claim_available,
+        lambda: sb.table("challan_stats").upsert({**row, "building": False}, on_conflict="challan_no").execute(),
+        "challan_stats.building not installed (migration 021) — lazy builds use ON CONFLICT DO NOTHING",
+        missing=is_column_missing,
+    )
+    if done is MISSING:
+        sb.table("challan_stats").upsert(row, on_conflict="challan_no").execute()
+
+
+def _claim(sb, challan_no: str, claim_ts: str):
+    """Insert the building placeholder; rows inserted, or MISSING without migration 021."""
+    return try_optional(
+        _claim_available,
+        lambda: sb.table("challan_stats").upsert(
+            {"challan_no": challan_no, "building": True, "updated_at": claim_ts},
+            on_conflict="challan_no", ignore_duplicates=True,
+        ).execute().data,
+        "challan_stats.building not installed (migration 021) — lazy builds use ON CONFLICT DO NOTHING",
+        missing=is_column_missing,
+    )
+
+
+def _store_claimed(sb, challan_no: str, stats: dict, claimed, claim_ts: str):
+    if claimed is MISSING:
+        sb.table("challan_stats").upsert(
+            {"challan_no": challan_no, **stats, "updated_at": _now()},
+            on_conflict="challan_no", ignore_duplicates=True,
+        ).execute()
+        return
+    if not claimed:
+        return          # another read or a rebuild holds the row
+    resp = (
+        sb.table("challan_stats")
+        .update({**stats, "building": False, "updated_at": _now()})
+        .eq("challan_no", challan_no)
+        .eq("building", True)
+        .eq("updated_at", claim_ts)
+        .execute()
+    )
+    if not resp.data:
+        # A delta moved the placeholder's updated_at (or a drop removed it)
+        sb.table("challan_stats").delete().eq("challan_no", challan_no).eq("building", True).execute()
+
+
+def _build_lazily(sb, challan_no: str) -> dict:
+    """
+    Compute a challan that has no row yet and store it, unless a delta or
+    drop touched the claim placeholder meanwhile (then the next read builds
+    it again).  Store failures are logged; the computed stats are returned.
+    """
+    claim_ts = _now()
+    try:
+        claimed = _claim(sb, challan_no, claim_ts)
+    except Exception as e:
+        print(f"challan_stats claim failed for {challan_no}: {e}")
+        claimed = None
+    try:
+        stats = _compute(sb, challan_no)
+    except Exception:
+        if claimed and claimed is not MISSING:
+            sb.table("challan_stats").delete().eq("challan_no", challan_no).eq("building", True).execute()
+        raise
+    try:
+        _store_claimed(sb, challan_no, stats, claimed, claim_ts)
+    except Exception as e:
+        print(f"challan_stats store failed for {challan_no}: {e}")
+    return stats
+
+
+def _release_dead_claim(sb, row: dict):
+    """Drop a placeholder whose build has not finished within BUILD_CLAIM_S."""
+    try:
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(row["updated_at"])
+    except (KeyError, TypeError, ValueError):
+        return
+    if age.total_seconds() > BUILD_CLAIM_S:
+        sb.table("challan_stats").delete().eq("challan_no", row["challan_no"]).eq(
+            "building", True
+        ).eq("updated_at", row["updated_at"]).execute()
+
+
+# ── READ / REBUILD ────────────────────────────────────────────
+
+def get_challan_stats(challan_no: str) -> dict:
+    """Get stats for a challan: counts, weight, ewb count, payment breakdown, stage counts."""
+    try:
+        sb = get_supabase()
+        try:
+            resp = sb.table("challan_stats").select("*").eq("challan_no", challan_no).execute()
+            row = (resp.data or [None])[0]
+        except Exception as e:
+            print(f"challan_stats read failed, computing directly: {e}")
+            return {"status": "success", "data": _compute(sb, challan_no)}
+
+        if row and not row.get("building"):
+            return {"status": "success", "data": _rounded(row)}
+
+        if row:
+            # Another read is building it — answer from a direct compute
+            try:
+                _release_dead_claim(sb, row)
+            except Exception as e:
+                print(f"challan_stats claim release failed for {challan_no}: {e}")
+            return {"status": "success", "data": _compute(sb, challan_no)}
+
+        return {"status": "success", "data": _build_lazily(sb, challan_no)}
+    except Exception as e:
+        return {"status": "error", "message": str(e), "status_code": 500}
+
+
+def rebuild_challan_stats(challan_no: str) -> dict:
+    """Recompute a challan's counters from transit_details and overwrite the row."""
+    try:
+        sb = get_supabase()
+        stats = _compute(sb, challan_no)
+        _store(sb, challan_no, stats)
+        return {"status": "success", "message": f"Stats rebuilt for challan {challan_no}", "data": stats}
+    except Exception as e:
+        return {"status": "error", "message": str(e), "status_code": 500}
+
+
+# ── INCREMENTAL MAINTENANCE (called by transit_service) ──────
+
+def drop_challan_stats(sb, challan_no: str):
+    """Forget a challan's counters; the next read rebuilds them."""
+    try:
+        sb.table("challan_stats").delete().eq("challan_no", challan_no).execute()
+    except Exception as e:
+        print(f"challan_stats drop failed for {challan_no}: {e}")
+
+
+def _bump(sb, challan_no: str, delta: dict):
+    delta = {k: v for k, v in delta.items() if v}
+    if not delta:
+        return
+    try:
+        sb.rpc("bump_challan_stats", {"p_challan_no": challan_no, "p_delta": delta}).execute()
+    except Exception as e:
+        print(f"challan_stats bump failed for {challan_no}, dropping row: {e}")
+        drop_challan_stats(sb, challan_no)
+
+
+def apply_transit_delta(sb, challan_no: str, transit_rows: list, sign: int):
+    """Add (sign=+1) or subtract (sign=-1) the contribution of transit rows."""
+    if not transit_rows:
+        return
+    try:
+        agg = _aggregate(sb, transit_rows)
+    except Exception as e:
+        print(f"challan_stats delta failed for {challan_no}, dropping row: {e}")
+        drop_challan_stats(sb, challan_no)
+        return
+    _bump(sb, challan_no, {k: sign * v for k, v in agg.items()})
+
+
+def apply_stage_delta(sb, stage_counts: dict):
+    """stage_counts = {challan_no: {stage_key: n}} for flags that flipped to True."""
+    for challan_no, counts in stage_counts.items():
+        _bump(sb, challan_no, counts)
+
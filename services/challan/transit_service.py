@@ -8,6 +8,14 @@ Manages bilty ↔ challan assignments (transit_details).
 """
 from datetime import datetime, timezone
 from services.supabase_client import get_supabase
+from services.batch_update import MISSING, group_by_payload, optional_rpc, update_grouped
+from services.challan.challan_stats_service import (
+    STAGE_FLAGS, apply_stage_delta, apply_transit_delta, drop_challan_stats,
+)
+from services.challan.available_set import (
+    AVAILABLE_BILTY_COLS, AVAILABLE_STATION_COLS, get_available_rows,
+    note_added_to_transit, note_removed_from_transit,
+)
 
 TRANSIT_COLS = (
     "id, challan_no, gr_no, bilty_id, challan_book_id, "
@@ -30,124 +38,169 @@ def _now():
 
 # ── AVAILABLE BILTIES (via Supabase RPC) ──────────────────────
 
+# None = not tried yet, False = get_available_bilties_page missing on this DB
+_page_rpc_available = {"value": None}
+
+
 def get_available_bilties(page: int = 1, page_size: int = PAGE_SIZE,
                           search: str = None, payment_mode: str = None,
                           city_id: str = None, source: str = None,
                           branch_id: str = None) -> dict:
     """
     Get bilties NOT assigned to any active transit.
-    Uses Supabase RPC `get_available_gr_numbers` for the heavy NOT-EXISTS
-    check, then fetches full details only for the current page of results.
+    Branch-scoped requests are served from the in-memory available set
+    (services/challan/available_set.py).  Otherwise uses Supabase RPC
+    `get_available_bilties_page`, which applies every filter and the page
+    window in SQL (migrations/005_available_bilties_page.sql), so a page
+    costs one query however large the pending backlog is.
+    Falls back to the older full scan when that RPC is not installed.
     """
+    page = max(1, page)
+    page_size = max(1, page_size)
     try:
+        cached = get_available_rows(branch_id)
+        if cached is not None:
+            rows = _filter_available(cached, search, payment_mode, city_id, source)
+            return _page_available(rows, page, page_size)
+
         sb = get_supabase()
 
-        # 1. Call RPC — single DB query does the NOT-EXISTS join
-        all_available = sb.rpc("get_available_gr_numbers", {
-            "p_limit": 100000,
-            "p_offset": 0,
-        }).execute()
-        rows = all_available.data or []
-
-        # 2. Apply source filter
-        if source == "bilty":
-            rows = [r for r in rows if r["source_table"] == "bilty"]
-        elif source == "station":
-            rows = [r for r in rows if r["source_table"] == "station_bilty_summary"]
-
-        # Build GR→source map for later
-        gr_source = {r["gr_no"]: r["source_table"] for r in rows}
-        bilty_grs = [gr for gr, src in gr_source.items() if src == "bilty"]
-        station_grs = [gr for gr, src in gr_source.items() if src == "station_bilty_summary"]
-
-        # 3. Fetch full details for bilty GRs
-        bilty_detail_map = {}
-        if bilty_grs:
-            for i in range(0, len(bilty_grs), 500):
-                chunk = bilty_grs[i:i + 500]
-                bq = sb.table("bilty").select(
-                    "id, gr_no, branch_id, bilty_date, delivery_type, "
-                    "consignor_name, consignor_gst, consignor_number, "
-                    "consignee_name, consignee_gst, consignee_number, "
-                    "transport_name, transport_gst, transport_number, transport_id, "
-                    "payment_mode, no_of_pkg, wt, rate, freight_amount, "
-                    "labour_charge, bill_charge, toll_charge, dd_charge, other_charge, pf_charge, total, "
-                    "from_city_id, to_city_id, e_way_bill, pvt_marks, remark, "
-                    "saving_option, is_active"
-                ).in_("gr_no", chunk).eq("is_active", True).execute()
-                for b in (bq.data or []):
-                    if b.get("consignor_name") != "CANCEL BILTY":
-                        b["source_table"] = "bilty"
-                        b["bilty_type"] = "reg"
-                        bilty_detail_map[b["gr_no"]] = b
-
-        # 4. Fetch full details for station GRs
-        station_detail_map = {}
-        if station_grs:
-            for i in range(0, len(station_grs), 500):
-                chunk = station_grs[i:i + 500]
-                sq = sb.table("station_bilty_summary").select(
-                    "id, gr_no, station, consignor, consignee, contents, "
-                    "no_of_packets, weight, payment_status, amount, pvt_marks, "
-                    "delivery_type, staff_id, branch_id, e_way_bill, "
-                    "transport_id, transport_name, transport_gst, city_id, "
-                    "created_at, updated_at"
-                ).in_("gr_no", chunk).execute()
-                for s in (sq.data or []):
-                    s["source_table"] = "station_bilty_summary"
-                    s["bilty_type"] = "mnl"
-                    station_detail_map[s["gr_no"]] = s
-
-        # 5. Merge: build final list preserving RPC order (sorted by gr_no)
-        merged = []
-        for r in rows:
-            gr = r["gr_no"]
-            detail = bilty_detail_map.get(gr) or station_detail_map.get(gr)
-            if detail:
-                merged.append(detail)
-
-        # 6. Apply client-side filters (branch, search, payment, city)
-        if branch_id:
-            merged = [r for r in merged if r.get("branch_id") == branch_id]
-        if search:
-            s_lower = search.lower()
-            merged = [r for r in merged if (
-                s_lower in (r.get("gr_no") or "").lower()
-                or s_lower in (r.get("consignor_name") or r.get("consignor") or "").lower()
-                or s_lower in (r.get("consignee_name") or r.get("consignee") or "").lower()
-                or s_lower in (r.get("transport_name") or "").lower()
-            )]
-        if payment_mode:
-            merged = [r for r in merged if
-                      r.get("payment_mode") == payment_mode or r.get("payment_status") == payment_mode]
-        if city_id:
-            merged = [r for r in merged if
-                      r.get("to_city_id") == city_id or r.get("city_id") == city_id]
-
-        total = len(merged)
-        regular_count = sum(1 for r in merged if r.get("source_table") == "bilty")
-        station_count = total - regular_count
-
-        # 7. Paginate
         offset = (page - 1) * page_size
-        page_rows = merged[offset: offset + page_size]
+        result = optional_rpc(sb, _page_rpc_available, "get_available_bilties_page", {
+            "p_branch_id": branch_id or None,
+            "p_search": search or None,
+            "p_payment_mode": payment_mode or None,
+            "p_city_id": city_id or None,
+            "p_source": source if source in ("bilty", "station") else None,
+            "p_limit": page_size,
+            "p_offset": offset,
+        }, "falling back to full scan")
+        if result is not MISSING:
+            result = result or {}
+            total = result.get("total") or 0
+            return {
+                "status": "success",
+                "data": {
+                    "rows": result.get("rows") or [],
+                    "page": page,
+                    "page_size": page_size,
+                    "total": total,
+                    "has_more": (offset + page_size) < total,
+                    "regular_count": result.get("regular_count") or 0,
+                    "station_count": result.get("station_count") or 0,
+                },
+            }
 
-        return {
-            "status": "success",
-            "data": {
-                "rows": page_rows,
-                "page": page,
-                "page_size": page_size,
-                "total": total,
-                "has_more": (offset + page_size) < total,
-                "regular_count": regular_count,
-                "station_count": station_count,
-            },
-        }
+        return _scan_available_bilties(sb, page, page_size, search, payment_mode,
+                                       city_id, source, branch_id)
     except Exception as e:
         return {"status": "error", "message": str(e), "status_code": 500}
 
 
+def _scan_available_bilties(sb, page, page_size, search, payment_mode,
+                            city_id, source, branch_id) -> dict:
+    """
+    Fallback: `get_available_gr_numbers` for the NOT-EXISTS check, full
+    details for every available GR, then filters + paging in Python.
+    """
+    # 1. Call RPC — single DB query does the NOT-EXISTS join
+    all_available = sb.rpc("get_available_gr_numbers", {
+        "p_limit": 100000,
+        "p_offset": 0,
+    }).execute()
+    rows = all_available.data or []
+
+    # 2. Apply source filter
+    if source == "bilty":
+        rows = [r for r in rows if r["source_table"] == "bilty"]
+    elif source == "station":
+        rows = [r for r in rows if r["source_table"] == "station_bilty_summary"]
+
+    # Build GR→source map for later
+    gr_source = {r["gr_no"]: r["source_table"] for r in rows}
+    bilty_grs = [gr for gr, src in gr_source.items() if src == "bilty"]
+    station_grs = [gr for gr, src in gr_source.items() if src == "station_bilty_summary"]
+
+    # 3. Fetch full details for bilty GRs
+    bilty_detail_map = {}
+    if bilty_grs:
+        for i in range(0, len(bilty_grs), 500):
+            chunk = bilty_grs[i:i + 500]
+            bq = sb.table("bilty").select(AVAILABLE_BILTY_COLS).in_("gr_no", chunk).eq("is_active", True).execute()
+            for b in (bq.data or []):
+                if b.get("consignor_name") != "CANCEL BILTY":
+                    b["source_table"] = "bilty"
+                    b["bilty_type"] = "reg"
+                    bilty_detail_map[b["gr_no"]] = b
+
+    # 4. Fetch full details for station GRs
+    station_detail_map = {}
+    if station_grs:
+        for i in range(0, len(station_grs), 500):
+            chunk = station_grs[i:i + 500]
+            sq = sb.table("station_bilty_summary").select(AVAILABLE_STATION_COLS).in_("gr_no", chunk).execute()
+            for s in (sq.data or []):
+                s["source_table"] = "station_bilty_summary"
+                s["bilty_type"] = "mnl"
+                station_detail_map[s["gr_no"]] = s
+
+    # 5. Merge: build final list preserving RPC order (sorted by gr_no)
+    merged = []
+    for r in rows:
+        gr = r["gr_no"]
+        detail = bilty_detail_map.get(gr) or station_detail_map.get(gr)
+        if detail:
+            merged.append(detail)
+
+    # 6. Apply client-side filters (branch, search, payment, city) + paginate
+    if branch_id:
+        merged = [r for r in merged if r.get("branch_id") == branch_id]
+    merged = _filter_available(merged, search, payment_mode, city_id)
+    return _page_available(merged, page, page_size)
+
+
+def _filter_available(rows: list, search: str = None, payment_mode: str = None,
+                      city_id: str = None, source: str = None) -> list:
+    """Apply the available-bilties filters to merged bilty/station rows."""
+    if source == "bilty":
+        rows = [r for r in rows if r.get("source_table") == "bilty"]
+    elif source == "station":
+        rows = [r for r in rows if r.get("source_table") == "station_bilty_summary"]
+    if search:
+        s_lower = search.lower()
+        rows = [r for r in rows if (
+            s_lower in (r.get("gr_no") or "").lower()
+            or s_lower in (r.get("consignor_name") or r.get("consignor") or "").lower()
+            or s_lower in (r.get("consignee_name") or r.get("consignee") or "").lower()
+            or s_lower in (r.get("transport_name") or "").lower()
+        )]
+    if payment_mode:
+        rows = [r for r in rows if
+                r.get("payment_mode") == payment_mode or r.get("payment_status") == payment_mode]
+    if city_id:
+        rows = [r for r in rows if
+                r.get("to_city_id") == city_id or r.get("city_id") == city_id]
+    return rows
+
+
+def _page_available(rows: list, page: int, page_size: int) -> dict:
+    total = len(rows)
+    regular_count = sum(1 for r in rows if r.get("source_table") == "bilty")
+    offset = (page - 1) * page_size
+    return {
+        "status": "success",
+        "data": {
+            "rows": rows[offset: offset + page_size],
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "has_more": (offset + page_size) < total,
+            "regular_count": regular_count,
+            "station_count": total - regular_count,
+        },
+    }
+
+
 # ── TRANSIT BILTIES (for a challan) ──────────────────────────
 
 def get_transit_bilties(challan_no: str, page: int = 1,
@@ -345,6 +398,8 @@ def add_to_transit(data: dict) -> dict:
         # 6. Insert transit rows
         resp = sb.table("transit_details").insert(to_insert).execute()
         added_count = len(resp.data) if resp.data else 0
+        note_added_to_transit(r["gr_no"] for r in (resp.data or []))
+        apply_transit_delta(sb, challan_no, resp.data or [], 1)
 
         # 7. Update challan bilty count
         current_count = challan.get("total_bilty_count") or 0
@@ -377,7 +432,7 @@ def remove_from_transit(transit_id: str, challan_id: str = None) -> dict:
         sb = get_supabase()
 
         # Get transit record
-        t_resp = sb.table("transit_details").select("id, challan_no").eq("id", transit_id).single().execute()
+        t_resp = sb.table("transit_details").select("id, challan_no, gr_no").eq("id", transit_id).single().execute()
         if not t_resp.data:
             return {"status": "error", "message": "Transit record not found", "status_code": 404}
 
@@ -392,7 +447,9 @@ def remove_from_transit(transit_id: str, challan_id: str = None) -> dict:
             return {"status": "error", "message": "Cannot remove bilty from a dispatched challan", "status_code": 400}
 
         # Delete transit row
-        sb.table("transit_details").delete().eq("id", transit_id).execute()
+        del_resp = sb.table("transit_details").delete().eq("id", transit_id).execute()
+        note_removed_from_transit(sb, [t_resp.data["gr_no"]])
+        apply_transit_delta(sb, challan_no, del_resp.data or [], -1)
 
         # Update challan count
         if c_resp.data:
@@ -436,6 +493,12 @@ def bulk_remove_from_transit(transit_ids: list, challan_id: str = None) -> dict:
         # Delete all transit rows
         del_resp = sb.table("transit_details").delete().in_("id", transit_ids).execute()
         removed = len(del_resp.data) if del_resp.data else 0
+        note_removed_from_transit(sb, [r["gr_no"] for r in (del_resp.data or [])])
+        removed_by_challan = {}
+        for r in (del_resp.data or []):
+            removed_by_challan.setdefault(r["challan_no"], []).append(r)
+        for c_no, c_rows in removed_by_challan.items():
+            apply_transit_delta(sb, c_no, c_rows, -1)
 
         # Update challan count
         if c_resp.data:
@@ -482,8 +545,9 @@ def bulk_update_delivery_status(updates: list, user_id: str = None) -> dict:
     try:
         sb = get_supabase()
         now = _now()
-        success = 0
         failed = []
+        items = []
+        stage_of = {}
 
         for item in updates:
             tid = item.get("id")
@@ -516,11 +580,36 @@ def bulk_update_delivery_status(updates: list, user_id: str = None) -> dict:
             if item.get("remarks"):
                 payload["remarks"] = item["remarks"]
 
-            try:
-                sb.table("transit_details").update(payload).eq("id", tid).execute()
-                success += 1
-            except Exception as e:
-                failed.append({"id": tid, "error": str(e)})
+            items.append({"id": tid, **payload})
+            stage_of[tid] = stage
+
+        # Current flags + challan_no, so stage counters only move for
+        # flags that actually flip False → True.
+        before = {}
+        check_ids = list(stage_of)
+        flag_cols = ", ".join(STAGE_FLAGS.values())
+        for i in range(0, len(check_ids), 200):
+            resp = sb.table("transit_details").select(
+                f"id, challan_no, {flag_cols}"
+            ).in_("id", check_ids[i:i + 200]).execute()
+            before.update({r["id"]: r for r in (resp.data or [])})
+
+        # Items sharing a stage (and extras) share a payload — one
+        # update().in_("id", ...) per group instead of one per item.
+        success = 0
+        stage_counts = {}
+        for payload, ids in group_by_payload(items, "id").values():
+            updated, group_failed = update_grouped(sb, "transit_details", "id", payload, ids)
+            success += len(updated)
+            failed.extend(group_failed)
+            for tid in updated:
+                prev = before.get(tid)
+                stage = stage_of[tid]
+                if prev and not prev.get(STAGE_FLAGS[stage]):
+                    counts = stage_counts.setdefault(prev["challan_no"], {})
+                    counts[stage] = counts.get(stage, 0) + 1
+                    prev[STAGE_FLAGS[stage]] = True
+        apply_stage_delta(sb, stage_counts)
 
         return {
             "status": "success",
@@ -531,71 +620,28 @@ def bulk_update_delivery_status(updates: list, user_id: str = None) -> dict:
         return {"status": "error", "message": str(e), "status_code": 500}
 
 
-# ── CHALLAN STATS ─────────────────────────────────────────────
+# ── BILTY EDITED WHILE IN TRANSIT ─────────────────────────────
 
-def get_challan_stats(challan_no: str) -> dict:
-    """Get stats for a challan: counts, weight, ewb count, payment breakdown."""
+def note_bilties_edited(sb, gr_nos):
+    """
+    Bilty / station rows were edited.  Touch their transit rows' updated_at
+    (the challan PDF content version, seen by every worker) and drop the
+    stats of the challans carrying them (rebuilt on the next read).
+    One UPDATE … RETURNING both finds and touches the transit rows.
+    """
+    gr_nos = list({g for g in gr_nos if g})
+    if not gr_nos:
+        return
     try:
-        sb = get_supabase()
-        t_resp = sb.table("transit_details").select("gr_no, bilty_id").eq("challan_no", challan_no).execute()
-        rows = t_resp.data or []
-
-        if not rows:
-            return {"status": "success", "data": {
-                "total": 0, "regular": 0, "station": 0,
-                "total_weight": 0, "total_packages": 0, "ewb_count": 0,
-                "topay_amount": 0, "paid_amount": 0,
-            }}
-
-        bilty_ids = [r["bilty_id"] for r in rows if r.get("bilty_id")]
-        station_grs = [r["gr_no"] for r in rows if not r.get("bilty_id")]
-
-        total_weight = 0
-        total_packages = 0
-        ewb_count = 0
-        topay_amount = 0
-        paid_amount = 0
-
-        if bilty_ids:
-            b_resp = sb.table("bilty").select(
-                "id, wt, no_of_pkg, e_way_bill, payment_mode, total"
-            ).in_("id", bilty_ids).execute()
-            for b in (b_resp.data or []):
-                total_weight += float(b.get("wt") or 0)
-                total_packages += int(b.get("no_of_pkg") or 0)
-                if b.get("e_way_bill"):
-                    ewb_count += 1
-                if b.get("payment_mode", "").upper() in ("TO-PAY", "TO-PAY/DD"):
-                    topay_amount += float(b.get("total") or 0)
-                else:
-                    paid_amount += float(b.get("total") or 0)
-
-        if station_grs:
-            s_resp = sb.table("station_bilty_summary").select(
-                "gr_no, weight, no_of_packets, e_way_bill, payment_status, amount"
-            ).in_("gr_no", station_grs).execute()
-            for s in (s_resp.data or []):
-                total_weight += float(s.get("weight") or 0)
-                total_packages += int(s.get("no_of_packets") or 0)
-                if s.get("e_way_bill"):
-                    ewb_count += 1
-                if s.get("payment_status", "").upper() in ("TO-PAY", "TO-PAY/DD"):
-                    topay_amount += float(s.get("amount") or 0)
-                else:
-                    paid_amount += float(s.get("amount") or 0)
-
-        return {
-            "status": "success",
-            "data": {
-                "total": len(rows),
-                "regular": len(bilty_ids),
-                "station": len(station_grs),
-                "total_weight": round(total_weight, 2),
-                "total_packages": total_packages,
-                "ewb_count": ewb_count,
-                "topay_amount": round(topay_amount, 2),
-                "paid_amount": round(paid_amount, 2),
-            },
-        }
+        challans = set()
+        now = _now()
+        for i in range(0, len(gr_nos), 500):
+            resp = sb.table("transit_details").update({"updated_at": now}).in_(
+                "gr_no", gr_nos[i:i + 500]
+            ).execute()
+            challans.update(r["challan_no"] for r in (resp.data or []) if r.get("challan_no"))
     except Exception as e:
-        return {"status": "error", "message": str(e), "status_code": 500}
+        print(f"Transit refresh after bilty edit failed for {gr_nos[:5]}: {e}")
+        return
+    for challan_no in challans:
+        drop_challan_stats(sb, challan_no)
@@ -2,9 +2,16 @@
 Truck Trip Service
 Manages truck_trips — one record per physical truck movement.
 One trip can carry multiple challan numbers.
+
+Trip creation and challan linking go through the create_trip_with_challans /
+link_challans_to_trip RPCs (migrations/007_truck_trip_link_rpc.sql) so the
+trip insert and every link update commit or roll back together.  Without
+those functions the older multi-step path is used.
 """
 from datetime import datetime, timezone
 from services.supabase_client import get_supabase
+from services.name_cache import resolve_names, prime_names
+from services.batch_update import MISSING, optional_rpc
 
 TRIP_COLS = (
     "id, trip_no, truck_id, driver_id, owner_id, branch_id, "
@@ -21,6 +28,9 @@ CHALLAN_COLS = (
 
 PAGE_SIZE = 40
 
+# None = not tried yet, False = trip RPCs missing on this database
+_rpc_available = {"value": None}
+
 
 def _now():
     return datetime.now(timezone.utc).isoformat()
@@ -29,24 +39,18 @@ def _now():
 def _resolve_names(rows: list) -> list:
     if not rows:
         return rows
-    sb = get_supabase()
     truck_ids = {r["truck_id"] for r in rows if r.get("truck_id")}
     staff_ids = {r.get("driver_id") for r in rows} | {r.get("owner_id") for r in rows}
     staff_ids.discard(None)
     user_ids = {r.get("created_by") for r in rows} | {r.get("received_by") for r in rows}
     user_ids.discard(None)
 
+    # Served from the shared name cache — no DB round trip once warm
     truck_map = staff_map = user_map = {}
     try:
-        if truck_ids:
-            res = sb.table("trucks").select("id, truck_number").in_("id", list(truck_ids)).execute()
-            truck_map = {t["id"]: t["truck_number"] for t in (res.data or [])}
-        if staff_ids:
-            res = sb.table("staff").select("id, name").in_("id", list(staff_ids)).execute()
-            staff_map = {s["id"]: s["name"] for s in (res.data or [])}
-        if user_ids:
-            res = sb.table("users").select("id, name").in_("id", list(user_ids)).execute()
-            user_map = {u["id"]: u["name"] for u in (res.data or [])}
+        truck_map = resolve_names("trucks", truck_ids)
+        staff_map = resolve_names("staff", staff_ids)
+        user_map = resolve_names("users", user_ids)
     except Exception:
         pass
 
@@ -149,6 +153,31 @@ def create_trip(data: dict) -> dict:
             return {"status": "error",
                     "message": f"Missing fields: {', '.join(missing)}", "status_code": 400}
 
+        challan_ids = data.get("challan_ids") or []
+        fields = {
+            "truck_id":   data["truck_id"],
+            "driver_id":  data.get("driver_id"),
+            "owner_id":   data.get("owner_id"),
+            "branch_id":  data.get("branch_id"),
+            "remarks":    data.get("remarks"),
+            "created_by": data["created_by"],
+        }
+
+        # One transaction: trip_no allocation + insert + challan links
+        out = optional_rpc(sb, _rpc_available, "create_trip_with_challans", {
+            "p_trip": fields,
+            "p_challan_ids": challan_ids,
+        }, "falling back to multi-step create")
+        if out is not MISSING:
+            out = out or {}
+            trip = out.get("trip") or {}
+            _resolve_names([trip])
+            result = {"status": "success", "data": trip,
+                      "message": f"Trip {trip.get('trip_no')} created"}
+            if out.get("link"):
+                result["link_summary"] = _link_summary(out["link"])
+            return result
+
         # Generate trip_no: TR-YYYYMMDD-seq
         today = datetime.now(timezone.utc).strftime("%Y%m%d")
         prefix = f"TR-{today}-"
@@ -170,13 +199,8 @@ def create_trip(data: dict) -> dict:
 
         record = {
             "trip_no":    trip_no,
-            "truck_id":   data["truck_id"],
-            "driver_id":  data.get("driver_id"),
-            "owner_id":   data.get("owner_id"),
-            "branch_id":  data.get("branch_id"),
+            **fields,
             "status":     "pending",
-            "remarks":    data.get("remarks"),
-            "created_by": data["created_by"],
             "is_active":  True,
             "total_challan_count": 0,
         }
@@ -189,16 +213,19 @@ def create_trip(data: dict) -> dict:
         trip_id = trip["id"]
 
         # Link provided challans
-        challan_ids = data.get("challan_ids") or []
+        link_result = None
         if challan_ids:
-            result = _link_challans(sb, trip_id, challan_ids)
-            if result.get("status") == "error":
-                return result
-            trip["total_challan_count"] = result["linked_count"]
+            link_result = _link_challans(sb, trip_id, challan_ids)
+            if link_result.get("status") == "error":
+                return link_result
+            trip["total_challan_count"] = link_result["linked_count"]
 
         _resolve_names([trip])
-        return {"status": "success", "data": trip,
-                "message": f"Trip {trip_no} created"}
+        result = {"status": "success", "data": trip,
+                  "message": f"Trip {trip_no} created"}
+        if link_result:
+            result["link_summary"] = _link_summary(link_result)
+        return result
     except Exception as e:
         return {"status": "error", "message": str(e), "status_code": 500}
 
@@ -218,14 +245,32 @@ def link_challans(trip_id: str, challan_ids: list, user_id: str = None) -> dict:
         if trip.get("status") == "received":
             return {"status": "error", "message": "Cannot add challans to a received trip", "status_code": 400}
 
+        if challan_ids:
+            link = optional_rpc(sb, _rpc_available, "link_challans_to_trip", {
+                "p_trip_id": trip_id,
+                "p_challan_ids": challan_ids,
+            }, "falling back to multi-step link")
+            if link is not MISSING:
+                link = link or {}
+                return {"status": "success", "linked_count": link.get("linked_count", 0),
+                        **_link_summary(link)}
+
         result = _link_challans(sb, trip_id, challan_ids)
         return result
     except Exception as e:
         return {"status": "error", "message": str(e), "status_code": 500}
 
 
+def _link_summary(link: dict) -> dict:
+    return {
+        "newly_linked":             link.get("newly_linked", []),
+        "already_in_another_trip":  link.get("already_in_another_trip", []),
+        "not_found":                link.get("not_found", []),
+    }
+
+
 def _link_challans(sb, trip_id: str, challan_ids: list) -> dict:
-    """Internal: link challans to trip, update count."""
+    """Internal (no RPC): link challans to trip with one in_() update, update count."""
     if not challan_ids:
         return {"status": "success", "linked_count": 0, "already_linked": []}
 
@@ -241,15 +286,19 @@ def _link_challans(sb, trip_id: str, challan_ids: list) -> dict:
     already = []
     not_found = list(set(challan_ids) - {c["id"] for c in challans})
 
+    to_link = []
     for c in challans:
         if not c.get("is_active"):
             continue
         if c.get("truck_trip_id") and c["truck_trip_id"] != trip_id:
             already.append({"challan_no": c["challan_no"], "existing_trip_id": c["truck_trip_id"]})
             continue
-        sb.table("challan_details").update({"truck_trip_id": trip_id}).eq("id", c["id"]).execute()
+        to_link.append(c["id"])
         linked.append(c["challan_no"])
 
+    if to_link:
+        sb.table("challan_details").update({"truck_trip_id": trip_id}).in_("id", to_link).execute()
+
     # Update count on trip
     count_res = (
         sb.table("challan_details")
@@ -410,21 +459,10 @@ def create_trip_with_challans(data: dict) -> dict:
     if result.get("status") != "success":
         return result
 
-    trip_id = result["data"]["id"]
-    challan_ids = data.get("challan_ids") or []
-
-    link_result = None
-    if challan_ids:
-        link_result = _link_challans(get_supabase(), trip_id, challan_ids)
-
     # Return full trip with challans
-    full = get_trip(trip_id)
-    if link_result:
-        full["link_summary"] = {
-            "newly_linked":             link_result.get("newly_linked", []),
-            "already_in_another_trip":  link_result.get("already_in_another_trip", []),
-            "not_found":                link_result.get("not_found", []),
-        }
+    full = get_trip(result["data"]["id"])
+    if result.get("link_summary"):
+        full["link_summary"] = result["link_summary"]
     return full
 
 
@@ -473,6 +511,8 @@ def get_trip_init(branch_id: str = None) -> dict:
         challans_resp = challan_q.execute()
 
         staff = staff_resp.data or []
+        prime_names("trucks", {t["id"]: t["truck_number"] for t in (trucks_resp.data or [])})
+        prime_names("staff", {m["id"]: m["name"] for m in staff})
         drivers = [s for s in staff if "driver" in s.get("post", "").lower()]
         owners  = [s for s in staff if s.get("post", "").lower() not in ("driver",)]
 
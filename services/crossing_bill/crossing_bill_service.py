@@ -21,6 +21,12 @@ Flow:
 
   5. GET  /api/crossing-bill           - list all bills (filterable)
   6. GET  /api/crossing-bill/{bill_id} - get one bill with pohonch snapshot
+
+  7. GET  /api/crossing-bill/outstanding?transport_gstin=&as_of=
+     → per-transport balances (crossing_bill_ledger) + aging of open bills
+
+  8. POST /api/crossing-bill/bulk-recalculate
+     → refresh every open bill of a transport / date range from live pohonch
 """
 from __future__ import annotations
 
@@ -29,8 +35,20 @@ from datetime import datetime, timezone
 from typing import Optional
 
 from services.supabase_client import get_supabase
+from services.batch_update import MISSING, batch_update_rows, is_column_missing, is_table_missing, optional_rpc, try_optional
+from services.jobs import start_job
+from services.sequence import next_seq
 
 PAGE_SIZE = 1000
+GSTIN_LEN = 15
+
+AGING_BUCKETS = (("0_30", 30), ("31_60", 60), ("61_90", 90), ("90_plus", None))
+
+# None = not tried yet, False = RPC missing on this database
+_txn_rpc_available = {"value": None}
+_outstanding_rpc_available = {"value": None}
+_unbilled_table_available = {"value": None}
+_unbilled_key_available = {"value": None}
 
 BILL_COLS = (
     "id, bill_no, transport_id, transport_gstin, transport_name, "
@@ -54,9 +72,8 @@ def _safe_float(v) -> float:
         return 0.0
 
 
-def _make_bill_no(sb) -> str:
-    """Auto-generate bill_no as CB-YYYYMM-XXXX."""
-    prefix = "CB-" + datetime.now(timezone.utc).strftime("%Y%m") + "-"
+def _last_bill_seq(sb, prefix: str) -> int:
+    """Highest seq already used under a CB-YYYYMM- prefix (0 when none)."""
     res = (
         sb.table("crossing_bill")
         .select("bill_no")
@@ -71,24 +88,74 @@ def _make_bill_no(sb) -> str:
             last_seq = int(res.data[0]["bill_no"].split("-")[-1])
         except (ValueError, IndexError):
             last_seq = 0
-    return f"{prefix}{str(last_seq + 1).zfill(4)}"
+    return last_seq
+
+
+def _make_bill_no(sb) -> str:
+    """Auto-generate bill_no as CB-YYYYMM-XXXX."""
+    prefix = "CB-" + datetime.now(timezone.utc).strftime("%Y%m") + "-"
+    seq = next_seq(sb, f"crossing_bill:{prefix}", lambda s: _last_bill_seq(s, prefix))
+    return f"{prefix}{str(seq).zfill(4)}"
 
 
 # ── 1. GET eligible unbilled pohonch ─────────────────────────────────────────
 
+def _unbilled_totals(sb, gstin: str) -> dict | None:
+    """Preview totals from pohonch_unbilled_totals (migration 016); None when not installed."""
+    data = try_optional(
+        _unbilled_table_available,
+        lambda: sb.table("pohonch_unbilled_totals").select(
+            "total_pohonch, total_bilties, total_kaat, total_pf, total_dd, total_amount"
+        ).eq("transport_key", gstin).execute().data,
+        "pohonch_unbilled_totals table not installed — summing unbilled pohonch",
+        missing=is_table_missing,
+    )
+    if data is MISSING:
+        return None
+    row = (data or [None])[0] or {}
+    return {
+        "total_pohonch":  int(row.get("total_pohonch") or 0),
+        "total_bilties":  int(row.get("total_bilties") or 0),
+        "total_kaat":     round(_safe_float(row.get("total_kaat")), 2),
+        "total_pf":       round(_safe_float(row.get("total_pf")), 2),
+        "total_dd":       round(_safe_float(row.get("total_dd")), 2),
+        "total_amount":   round(_safe_float(row.get("total_amount")), 2),
+    }
+
+
 def get_unbilled_pohonch(
     transport_gstin: str = None,
     transport_name: str = None,
     transport_id: str = None,
     from_date: str = None,
     to_date: str = None,
+    include_rows: bool = True,
 ) -> dict:
     """
     Return active pohonch not yet linked to any crossing bill.
     Filter by transport (gstin or name or transport_admin id) and optional date range.
+
+    The rows come from the idx_pohonch_unbilled partial index (only the
+    unbilled set, however long the transport's history).  For a full GSTIN
+    without a date range, preview_totals is one read of the trigger-maintained
+    pohonch_unbilled_totals row; include_rows=False then returns just that.
+    Both match the GSTIN as upper(btrim(transport_gstin)): the rows through
+    the pohonch_gstin_key computed column (migration 023).  Without it the
+    rows match the raw column and preview_totals is summed from them.
     """
     try:
         sb = get_supabase()
+        gstin = transport_gstin.strip().upper() if transport_gstin else ""
+        full_gstin = len(gstin) == GSTIN_LEN
+
+        preview = None
+        use_gstin_key = full_gstin and _unbilled_key_available["value"] is not False
+
+        if use_gstin_key and not from_date and not to_date:
+            preview = _unbilled_totals(sb, gstin)
+            if preview is not None and not include_rows:
+                return {"status": "success", "data": {"pohonch": [], "preview_totals": preview}}
+
         q = (
             sb.table("pohonch")
             .select(
@@ -101,7 +168,11 @@ def get_unbilled_pohonch(
             .is_("crossing_bill_id", "null")
         )
 
-        if transport_gstin:
+        if use_gstin_key:
+            q = q.eq("pohonch_gstin_key", gstin)
+        elif full_gstin:
+            q = q.eq("transport_gstin", gstin)
+        elif transport_gstin:
             q = q.ilike("transport_gstin", f"%{transport_gstin.strip()}%")
         elif transport_name:
             q = q.ilike("transport_name", f"%{transport_name.strip()}%")
@@ -117,22 +188,34 @@ def get_unbilled_pohonch(
             q = q.lt("created_at", end)
 
         q = q.order("created_at")
-        resp = q.execute()
+        if use_gstin_key:
+            resp = try_optional(
+                _unbilled_key_available, q.execute,
+                "pohonch_gstin_key not installed (migration 023) — matching the raw transport_gstin",
+                missing=is_column_missing,
+            )
+            if resp is MISSING:
+                return get_unbilled_pohonch(
+                    transport_gstin, transport_name, transport_id, from_date, to_date, include_rows
+                )
+        else:
+            resp = q.execute()
         rows = resp.data or []
 
         # Aggregate preview totals
-        preview = {
-            "total_pohonch":  len(rows),
-            "total_bilties":  sum(r.get("total_bilties", 0) for r in rows),
-            "total_kaat":     round(sum(_safe_float(r.get("total_kaat")) for r in rows), 2),
-            "total_pf":       round(sum(_safe_float(r.get("total_pf"))   for r in rows), 2),
-            "total_dd":       round(sum(_safe_float(r.get("total_dd"))   for r in rows), 2),
-            "total_amount":   round(sum(_safe_float(r.get("total_amount")) for r in rows), 2),
-        }
+        if preview is None:
+            preview = {
+                "total_pohonch":  len(rows),
+                "total_bilties":  sum(r.get("total_bilties", 0) for r in rows),
+                "total_kaat":     round(sum(_safe_float(r.get("total_kaat")) for r in rows), 2),
+                "total_pf":       round(sum(_safe_float(r.get("total_pf"))   for r in rows), 2),
+                "total_dd":       round(sum(_safe_float(r.get("total_dd"))   for r in rows), 2),
+                "total_amount":   round(sum(_safe_float(r.get("total_amount")) for r in rows), 2),
+            }
 
         return {
             "status": "success",
-            "data": {"pohonch": rows, "preview_totals": preview},
+            "data": {"pohonch": rows if include_rows else [], "preview_totals": preview},
         }
     except Exception as e:
         return {"status": "error", "message": str(e), "status_code": 500}
@@ -299,20 +382,6 @@ def add_transaction(bill_id: str, txn: dict) -> dict:
     try:
         sb = get_supabase()
 
-        bill_resp = (
-            sb.table("crossing_bill")
-            .select("id, status, transactions, total_kaat, total_pf, "
-                    "total_paid_kaat, total_paid_to_transport")
-            .eq("id", bill_id)
-            .single()
-            .execute()
-        )
-        bill = bill_resp.data
-        if not bill:
-            return {"status": "error", "message": "Bill not found", "status_code": 404}
-        if bill["status"] == "cancelled":
-            return {"status": "error", "message": "Cannot add transaction to a cancelled bill", "status_code": 400}
-
         amount = _safe_float(txn.get("amount"))
         if amount <= 0:
             return {"status": "error", "message": "amount must be > 0", "status_code": 400}
@@ -334,22 +403,47 @@ def add_transaction(bill_id: str, txn: dict) -> dict:
             "recorded_at": _now(),
         }
 
+        # Atomic append + increment (migrations/014_crossing_bill_ledger.sql)
+        recorded = optional_rpc(sb, _txn_rpc_available, "add_crossing_bill_transaction", {
+            "p_bill_id":    bill_id,
+            "p_txn":        new_txn,
+            "p_updated_by": txn.get("recorded_by"),
+        }, "rewriting transactions")
+        if recorded is not MISSING and recorded:
+            return {"status": "success", "message": "Transaction recorded", "data": recorded}
+        # NULL → bill missing or cancelled; the read below says which
+
+        bill_resp = (
+            sb.table("crossing_bill")
+            .select("id, status, transactions, total_kaat, total_pf, "
+                    "total_paid_kaat, total_paid_to_transport")
+            .eq("id", bill_id)
+            .single()
+            .execute()
+        )
+        bill = bill_resp.data
+        if not bill:
+            return {"status": "error", "message": "Bill not found", "status_code": 404}
+        if bill["status"] == "cancelled":
+            return {"status": "error", "message": "Cannot add transaction to a cancelled bill", "status_code": 400}
+
         existing_txns = bill.get("transactions") or []
         existing_txns.append(new_txn)
 
-        # Recalculate running totals
-        paid_kaat     = round(sum(_safe_float(t["amount"]) for t in existing_txns if t["type"] == "received_from_transport"), 2)
-        paid_to_trans = round(sum(_safe_float(t["amount"]) for t in existing_txns if t["type"] == "paid_to_transport"), 2)
+        # Running totals — add this payment to the stored sums
+        paid_kaat     = _safe_float(bill.get("total_paid_kaat"))
+        paid_to_trans = _safe_float(bill.get("total_paid_to_transport"))
+        if txn_type == "received_from_transport":
+            paid_kaat = round(paid_kaat + amount, 2)
+        else:
+            paid_to_trans = round(paid_to_trans + amount, 2)
 
         # Auto-update status
         total_kaat = _safe_float(bill.get("total_kaat"))
         total_pf   = _safe_float(bill.get("total_pf"))
-        new_status = bill["status"]
-        if new_status not in ("draft", "sent"):
-            new_status = bill["status"]
         if paid_kaat >= total_kaat and paid_to_trans >= total_pf:
             new_status = "paid"
-        elif paid_kaat > 0 or paid_to_trans > 0:
+        else:
             new_status = "partial_paid"
 
         resp = (
@@ -507,6 +601,64 @@ def remove_pohonch_from_bill(bill_id: str, pohonch_number: str, updated_by: str
         return {"status": "error", "message": str(e), "status_code": 500}
 
 
+# ── Snapshot helpers (recalculate / bulk recalculate) ───────────────────────
+
+SNAPSHOT_COLS = (
+    "id, pohonch_number, transport_name, transport_gstin, "
+    "total_bilties, total_kaat, total_pf, total_dd, total_amount, "
+    "total_weight, total_packages, is_signed, challan_metadata"
+)
+POHONCH_IN_CHUNK = 200
+
+
+def _fetch_live_pohonch(sb, pohonch_ids: list) -> dict:
+    """{pohonch_id: row} for the snapshot columns, POHONCH_IN_CHUNK ids per query."""
+    ids = list(dict.fromkeys(i for i in pohonch_ids if i))
+    live_map = {}
+    for i in range(0, len(ids), POHONCH_IN_CHUNK):
+        resp = sb.table("pohonch").select(SNAPSHOT_COLS).in_("id", ids[i:i + POHONCH_IN_CHUNK]).execute()
+        live_map.update({r["id"]: r for r in (resp.data or [])})
+    return live_map
+
+
+def _refresh_snapshot(old_pohonch_data: list, live_map: dict) -> tuple[list, dict]:
+    """Rebuild a bill's pohonch_data from live rows; returns (entries, bill totals)."""
+    new_pohonch_data = []
+    for old_entry in old_pohonch_data:
+        pid = old_entry.get("pohonch_id")
+        live = live_map.get(pid)
+        if not live:
+            # pohonch deleted — keep old snapshot as-is
+            new_pohonch_data.append(old_entry)
+            continue
+        new_pohonch_data.append({
+            "pohonch_id":      pid,
+            "pohonch_number":  live.get("pohonch_number", old_entry.get("pohonch_number")),
+            "transport_name":  live.get("transport_name", ""),
+            "transport_gstin": live.get("transport_gstin", ""),
+            "total_bilties":   live.get("total_bilties", 0),
+            "total_kaat":      _safe_float(live.get("total_kaat")),
+            "total_pf":        _safe_float(live.get("total_pf")),
+            "total_dd":        _safe_float(live.get("total_dd")),
+            "total_amount":    _safe_float(live.get("total_amount")),
+            "total_weight":    _safe_float(live.get("total_weight")),
+            "total_packages":  _safe_float(live.get("total_packages")),
+            "is_signed":       bool(live.get("is_signed")),
+            "challan_nos":     live.get("challan_metadata") or [],
+        })
+
+    # Recompute bill-level totals from refreshed snapshot
+    totals = {
+        "total_pohonch": len(new_pohonch_data),
+        "total_bilties": sum(int(p.get("total_bilties") or 0) for p in new_pohonch_data),
+        "total_kaat":    round(sum(_safe_float(p.get("total_kaat"))   for p in new_pohonch_data), 2),
+        "total_pf":      round(sum(_safe_float(p.get("total_pf"))     for p in new_pohonch_data), 2),
+        "total_dd":      round(sum(_safe_float(p.get("total_dd"))     for p in new_pohonch_data), 2),
+        "total_amount":  round(sum(_safe_float(p.get("total_amount")) for p in new_pohonch_data), 2),
+    }
+    return new_pohonch_data, totals
+
+
 # ── 8. RECALCULATE BILL ──────────────────────────────────────────────────────
 
 def recalculate_crossing_bill(bill_id: str, updated_by: str = None) -> dict:
@@ -533,51 +685,12 @@ def recalculate_crossing_bill(bill_id: str, updated_by: str = None) -> dict:
         pohonch_ids = [p["pohonch_id"] for p in old_pohonch_data if p.get("pohonch_id")]
 
         # Re-fetch live pohonch rows
-        live_rows_resp = (
-            sb.table("pohonch")
-            .select(
-                "id, pohonch_number, transport_name, transport_gstin, "
-                "total_bilties, total_kaat, total_pf, total_dd, total_amount, "
-                "total_weight, total_packages, is_signed, challan_metadata"
-            )
-            .in_("id", pohonch_ids)
-            .execute()
-        )
-        live_map = {r["id"]: r for r in (live_rows_resp.data or [])}
-
-        new_pohonch_data = []
-        for old_entry in old_pohonch_data:
-            pid = old_entry.get("pohonch_id")
-            live = live_map.get(pid)
-            if not live:
-                # pohonch deleted — keep old snapshot as-is
-                new_pohonch_data.append(old_entry)
-                continue
-            new_pohonch_data.append({
-                "pohonch_id":      pid,
-                "pohonch_number":  live.get("pohonch_number", old_entry.get("pohonch_number")),
-                "transport_name":  live.get("transport_name", ""),
-                "transport_gstin": live.get("transport_gstin", ""),
-                "total_bilties":   live.get("total_bilties", 0),
-                "total_kaat":      _safe_float(live.get("total_kaat")),
-                "total_pf":        _safe_float(live.get("total_pf")),
-                "total_dd":        _safe_float(live.get("total_dd")),
-                "total_amount":    _safe_float(live.get("total_amount")),
-                "total_weight":    _safe_float(live.get("total_weight")),
-                "total_packages":  _safe_float(live.get("total_packages")),
-                "is_signed":       bool(live.get("is_signed")),
-                "challan_nos":     live.get("challan_metadata") or [],
-            })
+        live_map = _fetch_live_pohonch(sb, pohonch_ids)
 
-        # Recompute bill-level totals from refreshed snapshot
-        new_total_kaat    = round(sum(_safe_float(p.get("total_kaat"))   for p in new_pohonch_data), 2)
-        new_total_pf      = round(sum(_safe_float(p.get("total_pf"))     for p in new_pohonch_data), 2)
-        new_total_dd      = round(sum(_safe_float(p.get("total_dd"))     for p in new_pohonch_data), 2)
-        new_total_amount  = round(sum(_safe_float(p.get("total_amount")) for p in new_pohonch_data), 2)
-        new_total_bilties = sum(int(p.get("total_bilties") or 0) for p in new_pohonch_data)
-
-        paid_kaat     = _safe_float(bill.get("total_paid_kaat"))
-        paid_to_trans = _safe_float(bill.get("total_paid_to_transport"))
+        new_pohonch_data, new_totals = _refresh_snapshot(old_pohonch_data, live_map)
+        new_total_kaat   = new_totals["total_kaat"]
+        new_total_pf     = new_totals["total_pf"]
+        new_total_amount = new_totals["total_amount"]
 
         old_totals = {
             "total_kaat":   _safe_float(bill.get("total_kaat")),
@@ -588,12 +701,7 @@ def recalculate_crossing_bill(bill_id: str, updated_by: str = None) -> dict:
         # balance_on_us and balance_on_transport are generated columns — DB computes them
         sb.table("crossing_bill").update({
             "pohonch_data":  new_pohonch_data,
-            "total_pohonch": len(new_pohonch_data),
-            "total_bilties": new_total_bilties,
-            "total_kaat":    new_total_kaat,
-            "total_pf":      new_total_pf,
-            "total_dd":      new_total_dd,
-            "total_amount":  new_total_amount,
+            **new_totals,
             "updated_by":    updated_by,
             "updated_at":    _now(),
         }).eq("id", bill_id).execute()
@@ -683,3 +791,323 @@ def delete_crossing_bill(bill_id: str) -> dict:
         }
     except Exception as e:
         return {"status": "error", "message": str(e), "status_code": 500}
+
+
+# ── 11. TRANSPORT OUTSTANDING + AGING ────────────────────────────────────────
+
+def _transport_key(gstin, name) -> str:
+    """Same grouping as crossing_bill_transport_key() in migration 014."""
+    g = (gstin or "").strip().upper()
+    return g or "name:" + (name or "").strip().upper()
+
+
+def _aging_bucket(days: int) -> str:
+    for bucket, limit in AGING_BUCKETS:
+        if limit is None or days <= limit:
+            return bucket
+    return AGING_BUCKETS[-1][0]
+
+
+def _outstanding_from_bills(sb, as_of, transport_gstin: str = None) -> list:
+    """Fallback for crossing_bill_outstanding: aggregate the live bills page by page."""
+    from datetime import date
+    wanted = transport_gstin.strip().upper() if transport_gstin else None
+    ledger: dict = {}
+    page = 0
+    while True:
+        lo = page * PAGE_SIZE
+        batch = (
+            sb.table("crossing_bill")
+            .select("id, transport_id, transport_gstin, transport_name, to_date, status, "
+                    "total_kaat, total_pf, total_paid_kaat, total_paid_to_transport")
+            .eq("is_active", True)
+            .neq("status", "cancelled")
+            .order("id")
+            .range(lo, lo + PAGE_SIZE - 1)
+            .execute()
+        ).data or []
+        for b in batch:
+            key = _transport_key(b.get("transport_gstin"), b.get("transport_name"))
+            if wanted and key != wanted:
+                continue
+            row = ledger.setdefault(key, {
+                "transport_key": key,
+                "transport_id": None,
+                "transport_gstin": (b.get("transport_gstin") or "").strip().upper() or None,
+                "transport_name": b.get("transport_name"),
+                "bills": 0, "open_bills": 0,
+                "total_kaat": 0.0, "total_pf": 0.0,
+                "total_paid_kaat": 0.0, "total_paid_to_transport": 0.0,
+                "oldest_open_to_date": None,
+                "aging": {bucket: 0.0 for bucket, _ in AGING_BUCKETS},
+            })
+            row["transport_id"] = b.get("transport_id") or row["transport_id"]
+            row["bills"] += 1
+            for k in ("total_kaat", "total_pf", "total_paid_kaat", "total_paid_to_transport"):
+                row[k] += _safe_float(b.get(k))
+            if b.get("status") == "paid":
+                continue
+            row["open_bills"] += 1
+            to_date = (b.get("to_date") or "")[:10]
+            net = (_safe_float(b.get("total_kaat")) - _safe_float(b.get("total_paid_kaat"))) - (
+                _safe_float(b.get("total_pf")) - _safe_float(b.get("total_paid_to_transport"))
+            )
+            if to_date:
+                days = (as_of - date.fromisoformat(to_date)).days
+                row["aging"][_aging_bucket(days)] += net
+                if not row["oldest_open_to_date"] or to_date < row["oldest_open_to_date"]:
+                    row["oldest_open_to_date"] = to_date
+        if len(batch) < PAGE_SIZE:
+            break
+        page += 1
+
+    rows = []
+    for row in ledger.values():
+        for k in ("total_kaat", "total_pf", "total_paid_kaat", "total_paid_to_transport"):
+            row[k] = round(row[k], 2)
+        row["balance_on_us"] = round(row["total_pf"] - row["total_paid_to_transport"], 2)
+        row["balance_on_transport"] = round(row["total_kaat"] - row["total_paid_kaat"], 2)
+        row["net_receivable"] = round(row["balance_on_transport"] - row["balance_on_us"], 2)
+        row["aging"] = {k: round(v, 2) for k, v in row["aging"].items()}
+        rows.append(row)
+    rows.sort(key=lambda r: (-r["net_receivable"], r["transport_key"]))
+    return rows
+
+
+def get_transport_outstanding(transport_gstin: str = None, as_of: str = None) -> dict:
+    """
+    Outstanding balances per transport across all live (non-cancelled) bills.
+
+    Each row: bills, open_bills, total_kaat, total_pf, paid totals,
+    balance_on_us (pf still owed to the transport), balance_on_transport
+    (kaat still to collect), net_receivable, oldest_open_to_date and
+    aging — net receivable of the open bills by days since bill to_date
+    (0_30, 31_60, 61_90, 90_plus).
+    """
+    try:
+        from datetime import date
+        try:
+            as_of_date = date.fromisoformat(as_of[:10]) if as_of else datetime.now(timezone.utc).date()
+        except ValueError:
+            return {"status": "error", "message": "as_of must be YYYY-MM-DD", "status_code": 400}
+
+        sb = get_supabase()
+        rows = optional_rpc(sb, _outstanding_rpc_available, "crossing_bill_outstanding", {
+            "p_as_of":           str(as_of_date),
+            "p_transport_gstin": transport_gstin.strip() if transport_gstin else None,
+        }, "aggregating bills", lambda: _outstanding_from_bills(sb, as_of_date, transport_gstin)) or []
+
+        totals = {
+            k: round(sum(_safe_float(r.get(k)) for r in rows), 2)
+            for k in ("balance_on_us", "balance_on_transport", "net_receivable")
+        }
+        return {
+            "status": "success",
+            "data": {
+                "as_of": str(as_of_date),
+                "rows": rows,
+                "transports": len(rows),
+                "totals": totals,
+            },
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e), "status_code": 500}
+
+
+# ── 12. BULK RECALCULATE OPEN BILLS ──────────────────────────────────────────
+
+OPEN_STATUSES = ("draft", "sent", "partial_paid")
+RECALC_WRITE_CHUNK = 100        # bills per bulk_update_rows call
+BULK_BACKGROUND_THRESHOLD = 200
+
+
+BILL_RECALC_COLS = (
+    "id, bill_no, status, pohonch_data, total_pohonch, total_bilties, "
+    "total_kaat, total_pf, total_dd, total_amount"
+)
+
+
+def _open_bills_query(sb, cols: str):
+    return (
+        sb.table("crossing_bill")
+        .select(cols)
+        .eq("is_active", True)
+        .in_("status", list(OPEN_STATUSES))
+    )
+
+
+def _select_open_bills(sb, bill_ids, transport_gstin, transport_id, from_date, to_date) -> list | None:
+    """Ids of open (draft / sent / partial_paid) bills matching the selector, or None when none given."""
+    if not (bill_ids or transport_gstin or transport_id or from_date or to_date):
+        return None
+    ids, page = [], 0
+    while True:
+        lo = page * PAGE_SIZE
+        q = _open_bills_query(sb, "id")
+        if bill_ids:
+            q = q.in_("id", bill_ids)
+        if transport_gstin:
+            q = q.eq("transport_gstin", transport_gstin)
+        if transport_id:
+            q = q.eq("transport_id", transport_id)
+        # bills whose period overlaps [from_date, to_date]
+        if from_date:
+            q = q.gte("to_date", from_date)
+        if to_date:
+            q = q.lte("from_date", to_date)
+        batch = q.order("created_at").order("id").range(lo, lo + PAGE_SIZE - 1).execute().data or []
+        ids.extend(b["id"] for b in batch)
+        if len(batch) < PAGE_SIZE:
+            return ids
+        page += 1
+
+
+def _run_bulk_bill_recalculate(report, bill_ids: list, updated_by: str = None, dry_run: bool = False) -> dict:
+    """
+    Refresh the bills RECALC_WRITE_CHUNK at a time.  Each chunk is re-read
+    (still active and open) right before it is refreshed and written, so a
+    pohonch removed, a payment added or a bill cancelled since the selection
+    is not overwritten with an older snapshot; bills no longer open are
+    reported as skipped.
+    """
+    sb = get_supabase()
+    now = _now()
+    results, failed, skipped = [], [], []
+    summary = {"kaat": 0.0, "pf": 0.0, "dd": 0.0, "amount": 0.0}
+
+    for i in range(0, len(bill_ids), RECALC_WRITE_CHUNK):
+        chunk_ids = bill_ids[i:i + RECALC_WRITE_CHUNK]
+        bills = _open_bills_query(sb, BILL_RECALC_COLS).in_("id", chunk_ids).execute().data or []
+        found = {b["id"] for b in bills}
+        skipped.extend(
+            {"id": bid, "reason": "Bill is no longer open (paid / cancelled / deleted since selection)"}
+            for bid in chunk_ids if bid not in found
+        )
+        live_map = _fetch_live_pohonch(
+            sb, [p.get("pohonch_id") for b in bills for p in (b.get("pohonch_data") or [])]
+        )
+
+        items = []
+        for bill in bills:
+            new_pohonch_data, new_totals = _refresh_snapshot(bill.get("pohonch_data") or [], live_map)
+            old_totals = {k: bill.get(k) for k in new_totals}
+            diff = {
+                k[len("total_"):]: round(new_totals[k] - _safe_float(old_totals[k]), 2)
+                for k in ("total_kaat", "total_pf", "total_dd", "total_amount")
+            }
+            changed = new_pohonch_data != (bill.get("pohonch_data") or []) or any(
+                _safe_float(old_totals[k]) != _safe_float(v) for k, v in new_totals.items()
+            )
+            if not changed:
+                continue
+            for k, v in diff.items():
+                summary[k] += v
+            results.append({
+                "bill_id":    bill["id"],
+                "bill_no":    bill.get("bill_no"),
+                "status":     bill.get("status"),
+                "old_totals": old_totals,
+                "new_totals": new_totals,
+                "diff":       diff,
+            })
+            items.append({
+                "id":           bill["id"],
+                "pohonch_data": new_pohonch_data,
+                **new_totals,
+                "updated_by":   updated_by,
+                "updated_at":   now,
+            })
+
+        if items and not dry_run:
+            _, chunk_failed = batch_update_rows(sb, "crossing_bill", "id", items)
+            retry = {f.get("id") for f in chunk_failed}
+            for item in items:
+                if item["id"] not in retry:
+                    continue
+                # e.g. bulk_update_rows without crossing_bill whitelisted (migration 015)
+                try:
+                    payload = {k: v for k, v in item.items() if k != "id"}
+                    sb.table("crossing_bill").update(payload).eq("id", item["id"]).execute()
+                except Exception as e:
+                    failed.append({"id": item["id"], "error": str(e)})
+        report(min(len(bill_ids), i + len(chunk_ids)))
+
+    failed_ids = {f["id"] for f in failed}
+    return {
+        "status":  "success",
+        "message": (f"{len(results)} of {len(bill_ids)} open bills would change" if dry_run
+                    else f"{len(results) - len(failed_ids)} of {len(bill_ids)} open bills recalculated"),
+        "dry_run": dry_run,
+        "summary": {
+            "bills":     len(bill_ids),
+            "changed":   len(results),
+            "unchanged": len(bill_ids) - len(results) - len(skipped),
+            "skipped":   len(skipped),
+            "failed":    len(failed_ids),
+            "diff":      {k: round(v, 2) for k, v in summary.items()},
+        },
+        "results": results,
+        "skipped": skipped,
+        "failed":  failed,
+    }
+
+
+def bulk_recalculate_crossing_bills(
+    bill_ids: list = None,
+    transport_gstin: str = None,
+    transport_id: str = None,
+    from_date: str = None,
+    to_date: str = None,
+    updated_by: str = None,
+    dry_run: bool = False,
+    background: bool = None,
+) -> dict:
+    """
+    Refresh every open (draft / sent / partial_paid) bill matching the
+    selector — bill_ids, transport (full 15-character gstin, matched exactly,
+    or transport_admin id) and/or a period overlapping [from_date, to_date] —
+    from live pohonch rows.
+
+    Bills are processed RECALC_WRITE_CHUNK at a time: the chunk is re-read,
+    its pohonch are read in one set query, totals recomputed in one pass and
+    only bills that changed are written.  Transactions and paid amounts are
+    preserved.  dry_run=True returns the diff without writing.
+
+    background: True / False, or None → background job when more than
+    BULK_BACKGROUND_THRESHOLD bills match; poll GET /api/jobs/{job_id}.
+    """
+    try:
+        # A write path: a partial GSTIN ("09") must not select other transports' bills
+        gstin = transport_gstin.strip().upper() if transport_gstin else None
+        if gstin and len(gstin) != GSTIN_LEN:
+            return {
+                "status": "error",
+                "message": f"transport_gstin must be the full {GSTIN_LEN}-character GSTIN",
+                "status_code": 400,
+            }
+        sb = get_supabase()
+        ids = _select_open_bills(sb, bill_ids, gstin, transport_id, from_date, to_date)
+        if ids is None:
+            return {
+                "status": "error",
+                "message": "Provide bill_ids, transport_gstin, transport_id or a from_date / to_date range",
+                "status_code": 400,
+            }
+        if not ids:
+            return {"status": "success", "message": "No open bills found matching criteria",
+                    "summary": {"bills": 0, "changed": 0}, "results": []}
+
+        if background or (background is None and len(ids) > BULK_BACKGROUND_THRESHOLD):
+            job = start_job("crossing_bill_recalculate", len(ids),
+                            _run_bulk_bill_recalculate, ids, updated_by, dry_run)
+            return {
+                "status":     "success",
+                "message":    f"Recalculating {len(ids)} bills in the background — poll GET /api/jobs/{job['id']}",
+                "background": True,
+                "job_id":     job["id"],
+                "data":       job,
+            }
+
+        return _run_bulk_bill_recalculate(lambda done: None, ids, updated_by, dry_run)
+    except Exception as e:
+        return {"status": "error", "message": str(e), "status_code": 500}
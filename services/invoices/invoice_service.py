@@ -8,7 +8,14 @@ Flow:
     body: { invoice header fields } + line_items: [{ item fields }]
     → auto-generates invoice_no, inserts header + line items, calculates totals
 
+  POST /api/invoice/bulk-create
+    body: { invoices: [ <create body>, ... ], defaults: { shared header fields } }
+    → one number block per series, one tax pass, batched inserts
+
   GET  /api/invoices?tenant_id=&status=&payment_status=&from_date=&to_date=
+    → page rows + summary (count, taxable / tax / total / paid / balance sums
+      over the whole filter); pass cursor for keyset paging on
+      (invoice_date DESC, id DESC)
   GET  /api/invoices/{invoice_id}       — header + line items
   PUT  /api/invoices/{invoice_id}       — update header fields
   POST /api/invoices/{invoice_id}/cancel
@@ -17,10 +24,14 @@ Flow:
 from __future__ import annotations
 
 import re
+import time
 from datetime import datetime, timezone
 from typing import Optional
 
 from services.supabase_client import get_supabase
+from services.batch_update import MISSING, decode_cursor, encode_cursor, optional_rpc
+from services.sequence import allocate_block, next_seq
+from services.thread_pool import shared_pool
 
 MASTER_COLS = (
     "id, invoice_no, invoice_series_id, invoice_type, invoice_date, due_date, "
@@ -52,6 +63,18 @@ LINE_COLS = (
     "created_at, updated_at"
 )
 
+BULK_MAX = 500                 # invoices per bulk-create call
+HEADER_INSERT_CHUNK = 100
+LINE_INSERT_CHUNK = 500
+
+SUMMARY_COLS = "taxable_amount, total_tax, total_amount, paid_amount, balance_amount"
+SUMMARY_AMOUNTS = ("taxable_amount", "total_tax", "total_amount", "paid_amount", "balance_amount")
+SUMMARY_SCAN_PAGE = 1000
+
+# None = not tried yet, False = RPC missing on this database
+_series_rpc_available = {"value": None}
+_summary_rpc_available = {"value": None}
+
 
 def _now() -> str:
     return datetime.now(timezone.utc).isoformat()
@@ -86,35 +109,45 @@ def _sanitize(body: dict) -> dict:
 
 # ── Auto invoice number ───────────────────────────────────────────────────────
 
-def _next_invoice_no(sb, tenant_id: str, series_id: Optional[str]) -> str:
+def _format_series_no(s: dict, num: int) -> str:
+    digits = s.get("digits") or 4
+    prefix = s.get("prefix") or "INV"
+    suffix = s.get("suffix") or ""
+    fy = s.get("financial_year") or ""
+    separator = "/" if fy else "-"
+    return f"{prefix}{separator}{fy}{separator}{str(num).zfill(digits)}{suffix}" if fy else f"{prefix}-{str(num).zfill(digits)}{suffix}"
+
+
+def _allocate_series(sb, series_id: str, count: int = 1) -> Optional[tuple[dict, int]]:
     """
-    Generate next invoice number.
-    Uses invoice_series if series_id given, otherwise falls back to
-    INV-YYYYMM-XXXX pattern.
+    Reserve `count` numbers from an invoice_series → (series, first_number),
+    or None when the series does not exist.  Uses the atomic
+    allocate_series_numbers RPC; falls back to read + bump.
     """
-    if series_id:
-        series_res = (
-            sb.table("invoice_series")
-            .select("prefix, suffix, financial_year, digits, current_number")
-            .eq("id", series_id)
-            .single()
-            .execute()
-        )
-        if series_res.data:
-            s = series_res.data
-            num = s["current_number"]
-            digits = s.get("digits", 4)
-            prefix = s.get("prefix") or "INV"
-            suffix = s.get("suffix") or ""
-            fy = s.get("financial_year") or ""
-            separator = "/" if fy else "-"
-            invoice_no = f"{prefix}{separator}{fy}{separator}{str(num).zfill(digits)}{suffix}" if fy else f"{prefix}-{str(num).zfill(digits)}{suffix}"
-            # bump current_number
-            sb.table("invoice_series").update({"current_number": num + 1}).eq("id", series_id).execute()
-            return invoice_no
+    data = optional_rpc(
+        sb, _series_rpc_available, "allocate_series_numbers",
+        {"p_series_id": series_id, "p_count": count}, "falling back to read + bump",
+    )
+    if data is not MISSING:
+        return (data, data["first_number"]) if data else None
 
-    # fallback: INV-YYYYMM-XXXX
-    prefix = "INV-" + datetime.now(timezone.utc).strftime("%Y%m") + "-"
+    series_res = (
+        sb.table("invoice_series")
+        .select("prefix, suffix, financial_year, digits, current_number")
+        .eq("id", series_id)
+        .execute()
+    )
+    if not series_res.data:
+        return None
+    s = series_res.data[0]
+    num = s["current_number"]
+    # bump current_number
+    sb.table("invoice_series").update({"current_number": num + count}).eq("id", series_id).execute()
+    return s, num
+
+
+def _last_invoice_seq(sb, prefix: str) -> int:
+    """Highest seq already used under an INV-YYYYMM- prefix (0 when none)."""
     res = (
         sb.table("invoice_master")
         .select("invoice_no")
@@ -129,11 +162,39 @@ def _next_invoice_no(sb, tenant_id: str, series_id: Optional[str]) -> str:
             last_seq = int(res.data[0]["invoice_no"].split("-")[-1])
         except (ValueError, IndexError):
             last_seq = 0
-    return f"{prefix}{str(last_seq + 1).zfill(4)}"
+    return last_seq
+
+
+def _next_invoice_no(sb, tenant_id: str, series_id: Optional[str]) -> str:
+    """
+    Generate next invoice number.
+    Uses invoice_series if series_id given, otherwise falls back to
+    INV-YYYYMM-XXXX pattern.  Both come from atomic counters.
+    """
+    if series_id:
+        allocated = _allocate_series(sb, series_id)
+        if allocated:
+            series, num = allocated
+            return _format_series_no(series, num)
+
+    # fallback: INV-YYYYMM-XXXX
+    prefix = "INV-" + datetime.now(timezone.utc).strftime("%Y%m") + "-"
+    seq = next_seq(sb, f"invoice:{prefix}", lambda s: _last_invoice_seq(s, prefix))
+    return f"{prefix}{str(seq).zfill(4)}"
 
 
 # ── Totals calculation ────────────────────────────────────────────────────────
 
+def _supply_type_hint(body: dict) -> str:
+    """INTER (IGST) for export / SEZ or differing state codes, else INTRA (CGST+SGST)."""
+    if body.get("supply_type") in ("EXPORT", "SEZ"):
+        return "INTER"
+    if body.get("buyer_state_code") and body.get("seller_state_code") \
+            and body["buyer_state_code"] != body["seller_state_code"]:
+        return "INTER"
+    return "INTRA"
+
+
 def _calc_line(item: dict) -> dict:
     """Compute all derived amounts for a single line item."""
     qty = _safe_float(item.get("quantity", 1))
@@ -227,10 +288,7 @@ def create_invoice(body: dict) -> dict:
         sb = get_supabase()
         now = _now()
 
-        supply_type_hint = "INTER" if body.get("supply_type") in ("EXPORT", "SEZ") else (
-            "INTER" if body.get("buyer_state_code") and body.get("seller_state_code")
-            and body["buyer_state_code"] != body["seller_state_code"] else "INTRA"
-        )
+        supply_type_hint = _supply_type_hint(body)
 
         # Calculate line items
         calc_lines = []
@@ -281,8 +339,243 @@ def create_invoice(body: dict) -> dict:
         return {"status": "error", "message": str(e), "status_code": 500}
 
 
+# ── BULK CREATE ───────────────────────────────────────────────────────────────
+
+def _allocate_invoice_numbers(sb, prepared: list) -> list[str]:
+    """
+    invoice_no for every prepared invoice: one block per invoice_series
+    (allocate_series_numbers) and one INV-YYYYMM- block for the rest.
+    Numbers follow the request order within each series.
+    """
+    numbers: list = [None] * len(prepared)
+    by_series: dict = {}
+    for n, (inv, _) in enumerate(prepared):
+        by_series.setdefault(inv.get("invoice_series_id"), []).append(n)
+
+    fallback = by_series.pop(None, [])
+    for series_id, idxs in by_series.items():
+        allocated = _allocate_series(sb, series_id, len(idxs))
+        if not allocated:
+            fallback.extend(idxs)
+            continue
+        series, first = allocated
+        for k, n in enumerate(idxs):
+            numbers[n] = _format_series_no(series, first + k)
+
+    if fallback:
+        prefix = "INV-" + datetime.now(timezone.utc).strftime("%Y%m") + "-"
+        first, _ = allocate_block(sb, f"invoice:{prefix}", len(fallback), lambda s: _last_invoice_seq(s, prefix))
+        for k, n in enumerate(sorted(fallback)):
+            numbers[n] = f"{prefix}{str(first + k).zfill(4)}"
+    return numbers
+
+
+def _insert_invoice_chunk(sb, headers: list[dict], lines_by_no: dict) -> list[dict]:
+    """
+    Insert one chunk of headers, then their lines LINE_INSERT_CHUNK at a time.
+    If a line insert fails the chunk's headers (and any lines) are removed
+    again and the error is raised.
+    """
+    master_res = sb.table("invoice_master").insert(headers, default_to_null=False).execute()
+    rows = master_res.data or []
+    id_by_no = {r["invoice_no"]: r["id"] for r in rows}
+
+    lines = []
+    for h in headers:
+        for line in lines_by_no[h["invoice_no"]]:
+            lines.append({**line, "invoice_id": id_by_no[h["invoice_no"]]})
+    try:
+        for i in range(0, len(lines), LINE_INSERT_CHUNK):
+            sb.table("invoices").insert(lines[i:i + LINE_INSERT_CHUNK], default_to_null=False).execute()
+    except Exception:
+        ids = list(id_by_no.values())
+        sb.table("invoices").delete().in_("invoice_id", ids).execute()
+        sb.table("invoice_master").delete().in_("id", ids).execute()
+        raise
+    return rows
+
+
+def bulk_create_invoices(body: dict) -> dict:
+    """
+    Create many invoices in one call (monthly billing runs).
+
+    body:
+      invoices  list — each item has the create_invoice shape (header fields
+                + line_items)
+      defaults  dict — header fields applied to every invoice that does not
+                set them (tenant_id, seller_*, created_by, invoice_series_id ...)
+
+    Every invoice is validated first; if any is invalid nothing is created.
+    Line taxes and totals for all invoices are computed in one pass over the
+    flattened lines, then headers + lines are inserted HEADER_INSERT_CHUNK
+    invoices at a time.  Each chunk reserves its invoice numbers (one block
+    per series) right before it is inserted.
+
+    A chunk that fails is rolled back and reported; other chunks stand.  The
+    numbers it reserved cannot be handed back (the counters are shared with
+    concurrent callers), so they are left unused: they are listed in `failed`
+    and in `voided_numbers`, and the series has a gap there that has to be
+    recorded as cancelled for GST.  (Only the INV-YYYYMM- scan fallback,
+    used when next_doc_seq is not installed, reissues them.)
+    """
+    try:
+        t0 = time.perf_counter()
+        invoices = body.get("invoices") or []
+        defaults = body.get("defaults") or {}
+        if not invoices:
+            return {"status": "error", "message": "invoices cannot be empty", "status_code": 400}
+        if len(invoices) > BULK_MAX:
+            return {"status": "error", "message": f"At most {BULK_MAX} invoices per call", "status_code": 400}
+
+        # ── 1. Validate ───────────────────────────────────────────────────────
+        required = ["tenant_id", "seller_name", "buyer_name", "created_by"]
+        prepared, errors = [], []
+        for idx, raw in enumerate(invoices):
+            inv = _sanitize({**defaults, **raw})
+            line_items = inv.pop("line_items", None) or []
+            missing = [f for f in required if not inv.get(f)]
+            if missing:
+                errors.append({"index": idx, "message": f"Missing required fields: {', '.join(missing)}"})
+            elif not line_items:
+                errors.append({"index": idx, "message": "line_items cannot be empty"})
+            else:
+                prepared.append((inv, line_items))
+        if errors:
+            return {
+                "status": "error",
+                "message": f"{len(errors)} invoice(s) invalid — nothing created",
+                "errors": errors,
+                "status_code": 400,
+            }
+
+        # ── 2. One pass over every line of every invoice ──────────────────────
+        lines_per_invoice: list[list] = [[] for _ in prepared]
+        for n, (inv, line_items) in enumerate(prepared):
+            supply_type = _supply_type_hint(inv)
+            for i, item in enumerate(line_items):
+                line = _calc_line({**item, "_supply_type": supply_type, "line_number": i + 1})
+                line.pop("id", None)
+                lines_per_invoice[n].append(line)
+        totals = [_aggregate_totals(lines) for lines in lines_per_invoice]
+        t_calc = time.perf_counter()
+
+        # ── 3. Reserve numbers + insert, one chunk at a time ──────────────────
+        sb = get_supabase()
+        now = _now()
+        created, failed, voided = [], [], []
+        for i in range(0, len(prepared), HEADER_INSERT_CHUNK):
+            chunk = prepared[i:i + HEADER_INSERT_CHUNK]
+            numbers = _allocate_invoice_numbers(sb, chunk)
+            headers, lines_by_no = [], {}
+            for k, (inv, _) in enumerate(chunk):
+                headers.append({
+                    **inv,
+                    **totals[i + k],
+                    "invoice_no": numbers[k],
+                    "paid_amount": 0,
+                    "payment_status": "UNPAID",
+                    "status": inv.get("status", "DRAFT"),
+                    "is_active": True,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+                lines_by_no[numbers[k]] = [
+                    {**line, "created_at": now, "updated_at": now} for line in lines_per_invoice[i + k]
+                ]
+            try:
+                rows = _insert_invoice_chunk(sb, headers, lines_by_no)
+            except Exception as e:
+                failed.extend(
+                    {"index": i + k, "invoice_no": h["invoice_no"], "number_voided": True, "error": str(e)}
+                    for k, h in enumerate(headers)
+                )
+                voided.extend(numbers)
+                continue
+            by_no = {r["invoice_no"]: r for r in rows}
+            for k, h in enumerate(headers):
+                row = by_no.get(h["invoice_no"], {})
+                created.append({
+                    "index": i + k,
+                    "id": row.get("id"),
+                    "invoice_no": h["invoice_no"],
+                    "buyer_name": h.get("buyer_name"),
+                    "total_amount": h["total_amount"],
+                })
+        t_end = time.perf_counter()
+
+        done = {c["index"] for c in created}
+        summary = {
+            "invoices": len(created),
+            "lines": sum(len(lines_per_invoice[n]) for n in done),
+            "taxable_amount": round(sum(totals[n]["taxable_amount"] for n in done), 2),
+            "total_tax": round(sum(totals[n]["total_tax"] for n in done), 2),
+            "total_amount": round(sum(totals[n]["total_amount"] for n in done), 2),
+        }
+        result = {
+            "status": "success" if created else "error",
+            "message": f"{len(created)} of {len(prepared)} invoices created",
+            "data": {
+                "created": created,
+                "failed": failed,
+                "voided_numbers": voided,
+                "summary": summary,
+                "timing": {
+                    "calc_seconds": round(t_calc - t0, 3),
+                    "write_seconds": round(t_end - t_calc, 3),
+                    "seconds": round(t_end - t0, 3),
+                },
+            },
+        }
+        if not created:
+            result["status_code"] = 500
+        return result
+    except Exception as e:
+        return {"status": "error", "message": str(e), "status_code": 500}
+
+
 # ── LIST ──────────────────────────────────────────────────────────────────────
 
+def _apply_list_filters(q, f: dict):
+    q = q.eq("is_active", True)
+    for col in ("tenant_id", "receiver_id", "status", "payment_status", "invoice_type", "gr_no"):
+        if f[col]:
+            q = q.eq(col, f[col])
+    if f["from_date"]:
+        q = q.gte("invoice_date", f["from_date"])
+    if f["to_date"]:
+        q = q.lte("invoice_date", f["to_date"])
+    if f["transport_name"]:
+        q = q.ilike("transport_name", f"%{f['transport_name']}%")
+    return q
+
+
+def _list_summary(sb, f: dict) -> dict:
+    return optional_rpc(
+        sb, _summary_rpc_available, "invoice_list_summary", {f"p_{k}": v for k, v in f.items()},
+        "summing list rows page by page", lambda: _scan_summary(sb, f),
+    )
+
+
+def _scan_summary(sb, f: dict) -> dict:
+    summary = {"count": 0, **{k: 0.0 for k in SUMMARY_AMOUNTS}}
+    page = 0
+    while True:
+        lo = page * SUMMARY_SCAN_PAGE
+        batch = _apply_list_filters(
+            sb.table("invoice_master").select(SUMMARY_COLS), f
+        ).order("id").range(lo, lo + SUMMARY_SCAN_PAGE - 1).execute().data or []
+        for r in batch:
+            summary["count"] += 1
+            for k in SUMMARY_AMOUNTS:
+                summary[k] += _safe_float(r.get(k))
+        if len(batch) < SUMMARY_SCAN_PAGE:
+            break
+        page += 1
+    for k in SUMMARY_AMOUNTS:
+        summary[k] = round(summary[k], 2)
+    return summary
+
+
 def list_invoices(
     tenant_id: Optional[str] = None,
     receiver_id: Optional[str] = None,
@@ -295,33 +588,91 @@ def list_invoices(
     transport_name: Optional[str] = None,
     page: int = 1,
     page_size: int = 50,
+    cursor: Optional[str] = None,
+    summary: bool = True,
 ) -> dict:
+    """
+    Page of active invoices, newest first (invoice_date DESC, id DESC).
+
+    cursor=None pages by offset (page / page_size); cursor="" starts keyset
+    paging and each response carries next_cursor for the following page.
+    With summary=True the first page (cursor="" / page=1) also holds the
+    count and the taxable / tax / total / paid / balance sums of every
+    invoice matching the filter, computed alongside the page query; clients
+    keep it while paging.  Later offset pages get their total from
+    count="exact".
+    """
     try:
         sb = get_supabase()
-        q = sb.table("invoice_master").select(MASTER_COLS).eq("is_active", True)
-
-        if tenant_id:
-            q = q.eq("tenant_id", tenant_id)
-        if receiver_id:
-            q = q.eq("receiver_id", receiver_id)
-        if status:
-            q = q.eq("status", status)
-        if payment_status:
-            q = q.eq("payment_status", payment_status)
-        if invoice_type:
-            q = q.eq("invoice_type", invoice_type)
-        if from_date:
-            q = q.gte("invoice_date", from_date)
-        if to_date:
-            q = q.lte("invoice_date", to_date)
-        if gr_no:
-            q = q.eq("gr_no", gr_no)
-        if transport_name:
-            q = q.ilike("transport_name", f"%{transport_name}%")
-
-        offset = (page - 1) * page_size
-        res = q.order("invoice_date", desc=True).range(offset, offset + page_size - 1).execute()
-        return {"status": "success", "data": res.data or [], "page": page, "page_size": page_size}
+        f = {
+            "tenant_id": tenant_id or None,
+            "receiver_id": receiver_id or None,
+            "status": status or None,
+            "payment_status": payment_status or None,
+            "invoice_type": invoice_type or None,
+            "from_date": from_date or None,
+            "to_date": to_date or None,
+            "gr_no": gr_no or None,
+            "transport_name": (transport_name or "").strip() or None,
+        }
+        keyset = cursor is not None
+        summary = summary and (cursor == "" if keyset else page == 1)
+        if keyset or summary:
+            # The summary's count replaces COUNT(*); keyset paging needs no total
+            q = sb.table("invoice_master").select(MASTER_COLS)
+        else:
+            q = sb.table("invoice_master").select(MASTER_COLS, count="exact")
+        q = _apply_list_filters(q, f)
+
+        if keyset:
+            if cursor:
+                try:
+                    after_date, after_id = decode_cursor(cursor)
+                except Exception:
+                    return {"status": "error", "message": "Invalid cursor", "status_code": 400}
+                q = q.or_(
+                    f'invoice_date.lt."{after_date}",'
+                    f'and(invoice_date.eq."{after_date}",id.lt."{after_id}")'
+                )
+            # One extra row tells whether another page exists
+            q = q.order("invoice_date", desc=True).order("id", desc=True).limit(page_size + 1)
+        else:
+            offset = (page - 1) * page_size
+            q = (
+                q.order("invoice_date", desc=True)
+                .order("id", desc=True)
+                .range(offset, offset + page_size - 1)
+            )
+
+        summary_future = shared_pool.submit(_list_summary, sb, f) if summary else None
+        res = q.execute()
+        totals = summary_future.result() if summary_future else None
+        rows = res.data or []
+
+        if keyset:
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            last = rows[-1] if rows else None
+            result = {
+                "status": "success",
+                "data": rows,
+                "page_size": page_size,
+                "has_more": has_more,
+                "next_cursor": encode_cursor(last["invoice_date"], last["id"]) if has_more and last else None,
+            }
+        else:
+            total = totals["count"] if totals else (res.count or 0)
+            result = {
+                "status": "success",
+                "data": rows,
+                "total": total,
+                "page": page,
+                "page_size": page_size,
+                "total_pages": (total + page_size - 1) // page_size if page_size else 1,
+            }
+        if totals is not None:
+            result["summary"] = totals
+        return result
     except Exception as e:
         return {"status": "error", "message": str(e), "status_code": 500}
 
@@ -428,10 +779,7 @@ def edit_invoice(invoice_id: str, body: dict) -> dict:
 
         now = _now()
 
-        supply_type_hint = "INTER" if body.get("supply_type") in ("EXPORT", "SEZ") else (
-            "INTER" if body.get("buyer_state_code") and body.get("seller_state_code")
-            and body["buyer_state_code"] != body["seller_state_code"] else "INTRA"
-        )
+        supply_type_hint = _supply_type_hint(body)
 
         calc_lines = []
         for i, item in enumerate(line_items):
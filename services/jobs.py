@@ -0,0 +1,156 @@
+"""
+Background Jobs
+Runs long bulk operations off the request thread and records progress.
+
+    job = start_job("pohonch_recalculate", total, fn, *args)   # fn(report, *args) -> result dict
+    get_job(job["id"])  →  {status, total, done, result | error, ...}
+
+Jobs run on thread_pool.job_pool.  State is written to the background_jobs
+table (migrations/010_background_jobs.sql) so a poll that lands on the other
+gunicorn worker still finds it; without the table it lives only in the
+worker that started the job.  report(done) persists progress at most once
+every PROGRESS_EVERY_S seconds.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from services.supabase_client import get_supabase
+from services.batch_update import MISSING, is_table_missing, try_optional
+from services.thread_pool import job_pool
+
+PROGRESS_EVERY_S = 1.0
+MEMORY_KEEP = 200          # jobs remembered in-process
+
+_lock = threading.Lock()
+_jobs: dict = {}
+
+# None = not tried yet, False = table missing on this database
+_table_available = {"value": None}
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _write(job: dict, insert: bool):
+    sb = get_supabase()
+    if insert:
+        sb.table("background_jobs").insert(job).execute()
+    else:
+        fields = {k: v for k, v in job.items() if k != "id"}
+        sb.table("background_jobs").update(fields).eq("id", job["id"]).execute()
+
+
+def _persist(job: dict, insert: bool = False):
+    try:
+        try_optional(
+            _table_available, lambda: _write(job, insert),
+            "background_jobs table not installed — job state kept in memory only",
+            missing=is_table_missing,
+        )
+    except Exception as e:
+        print(f"background_jobs write failed for {job['id']}: {e}")
+
+
+def _set(job_id: str, **fields) -> dict:
+    with _lock:
+        job = _jobs[job_id]
+        job.update(fields, updated_at=_now())
+        snap = dict(job)
+    _persist(snap)
+    return snap
+
+
+def _trim():
+    """Forget the oldest finished jobs once more than MEMORY_KEEP are held."""
+    finished = [jid for jid, j in _jobs.items() if j["status"] in ("done", "failed")]
+    for jid in finished[:max(0, len(_jobs) - MEMORY_KEEP)]:
+        del _jobs[jid]
+
+
+def _execute(job_id: str, fn, args):
+    _set(job_id, status="running", started_at=_now())
+    last = {"t": 0.0}
+
+    def report(done: int):
+        with _lock:
+            _jobs[job_id]["done"] = done
+        now = time.monotonic()
+        if now - last["t"] >= PROGRESS_EVERY_S:
+            last["t"] = now
+            _set(job_id, done=done)
+
+    try:
+        result = fn(report, *args)
+        if not isinstance(result, dict):
+            raise TypeError(f"job returned {type(result).__name__}, expected a result dict")
+        ok = result.get("status") == "success"
+    except Exception as e:
+        print(f"background job {job_id} failed: {e}")
+        _set(job_id, status="failed", error=str(e), finished_at=_now())
+        return
+    with _lock:
+        total, done = _jobs[job_id]["total"], _jobs[job_id]["done"]
+    _set(
+        job_id,
+        status="done" if ok else "failed",
+        done=total if ok else done,
+        result=result,
+        error=None if ok else result.get("message"),
+        finished_at=_now(),
+    )
+
+
+def start_job(kind: str, total: int, fn, *args) -> dict:
+    """Queue fn(report, *args) on the job pool; returns the job record."""
+    now = _now()
+    job = {
+        "id": str(uuid.uuid4()),
+        "kind": kind,
+        "status": "queued",
+        "total": total,
+        "done": 0,
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "started_at": None,
+        "finished_at": None,
+    }
+    with _lock:
+        _jobs[job["id"]] = job
+        _trim()
+        snap = dict(job)
+    _persist(snap, insert=True)
+    job_pool.submit(_execute, job["id"], fn, args)
+    return snap
+
+
+def get_job(job_id: str) -> dict:
+    """Current state of a background job (this worker first, then the table)."""
+    try:
+        uuid.UUID(str(job_id))
+    except ValueError:
+        return {"status": "error", "message": "Job not found", "status_code": 404}
+
+    with _lock:
+        job = _jobs.get(job_id)
+        snap = dict(job) if job else None
+
+    if snap is None:
+        try:
+            data = try_optional(
+                _table_available,
+                lambda: get_supabase().table("background_jobs").select("*").eq("id", job_id).execute().data,
+                "background_jobs table not installed — job state kept in memory only",
+                missing=is_table_missing,
+            )
+        except Exception as e:
+            return {"status": "error", "message": str(e), "status_code": 500}
+        if data is not MISSING:
+            snap = (data or [None])[0]
+
+    if not snap:
+        return {"status": "error", "message": "Job not found", "status_code": 404}
+    return {"status": "success", "data": snap}
@@ -12,14 +12,28 @@ Key rules:
 Bulk update filters by:
   transport_gstin + date range + destination city (partial, case-insensitive)
   Bilties are sourced from both `bilty` and `station_bilty_summary` tables.
+
+Bulk writes go through the bulk_update_bilty_kaat RPC in chunks
+(migrations/009_bulk_update_bilty_kaat.sql), with grouped update().in_()
+as the fallback.  dry_run=True returns the computed diff without writing.
 """
 
 from __future__ import annotations
-from datetime import date, timedelta
+import time
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional
 from services.supabase_client import get_supabase
+from services.batch_update import MISSING, batch_update_rows, group_by_payload, optional_rpc, try_optional, update_grouped
+from services.pohonch.pohonch_gr_index import pohonch_ids_for_grs
 
 PAGE_SIZE = 1000
+SYNC_CHUNK = 200
+KAAT_WRITE_CHUNK = 1000     # rows per bulk_update_bilty_kaat call
+
+# None = not tried yet, False = RPC missing on this database
+_kaat_rpc_available = {"value": None}
+_pf_rpc_available = {"value": None}
+_items_rpc_available = {"value": None}
 
 
 def _next_day(date_str: str) -> str:
@@ -43,24 +57,47 @@ def _sync_pohonch_metadata(sb, updates: list[dict]) -> int:
     `updates` is a list of dicts with keys:
         gr_no, kaat, pf, kaat_rate (optional), kaat_dd (optional)
 
+    Applied in SQL on pohonch_items by the patch_pohonch_items_by_gr RPC
+    (one call; bilty_metadata and totals rebuilt from the items).  Without
+    it, affected pohonch rows come from the gr_no index, so only those rows
+    are read and written back (one bulk_update_rows call).
+
     Returns number of pohonch rows touched.
     """
     if not updates:
         return 0
 
+    rows = [{
+        "gr_no": u["gr_no"],
+        "kaat": u.get("kaat"),
+        "pf": u.get("pf"),
+        "kaat_dd": u.get("kaat_dd"),
+        "kaat_rate": u.get("kaat_rate"),
+    } for u in updates]
+    touched = optional_rpc(
+        sb, _items_rpc_available, "patch_pohonch_items_by_gr", {"p_rows": rows},
+        "patching bilty_metadata directly",
+    )
+    if touched is not MISSING:
+        return int(touched or 0)
+
     # Build a lookup: gr_no → updated values
     update_map: dict[str, dict] = {}
     for u in updates:
         update_map[u["gr_no"]] = u
 
-    gr_nos = list(update_map.keys())
+    pohonch_ids = sorted({pid for ids in pohonch_ids_for_grs(sb, update_map).values() for pid in ids})
+    if not pohonch_ids:
+        return 0
 
-    # Fetch all pohonch rows that might contain any of these gr_nos.
-    # We check every pohonch row (pohonch table is small) for simplicity.
-    all_pohonch = sb.table("pohonch").select("id, pohonch_number, bilty_metadata").execute()
+    rows = []
+    for chunk in _chunks(pohonch_ids, SYNC_CHUNK):
+        res = sb.table("pohonch").select("id, bilty_metadata").in_("id", chunk).execute()
+        rows.extend(res.data or [])
 
-    touched = 0
-    for row in (all_pohonch.data or []):
+    now = datetime.now(timezone.utc).isoformat()
+    items = []
+    for row in rows:
         meta = row.get("bilty_metadata") or []
         changed = False
         new_meta = []
@@ -85,10 +122,208 @@ def _sync_pohonch_metadata(sb, updates: list[dict]) -> int:
                 new_meta.append(entry)
 
         if changed:
-            sb.table("pohonch").update({"bilty_metadata": new_meta}).eq("id", row["id"]).execute()
-            touched += 1
+            items.append({"id": row["id"], "bilty_metadata": new_meta, "updated_at": now})
+
+    _, failed = batch_update_rows(sb, "pohonch", "id", items)
+    # bulk_update_rows without 'pohonch' whitelisted (migration 008 not applied)
+    # reports every row as failed — write those one by one.
+    failed_ids = {f.get("id") for f in failed}
+    for item in items:
+        if item["id"] in failed_ids:
+            payload = {k: v for k, v in item.items() if k != "id"}
+            sb.table("pohonch").update(payload).eq("id", item["id"]).execute()
+
+    return len(items)
+
+
+# ---------------------------------------------------------------------------
+# Batched bilty_wise_kaat write path shared by the two bulk updates
+# ---------------------------------------------------------------------------
+
+def _fetch_existing_kaat(sb, gr_nos: list[str]) -> dict[str, dict]:
+    """Current bilty_wise_kaat values per gr_no (GRs without a row are absent)."""
+    existing: dict[str, dict] = {}
+    for chunk in _chunks(gr_nos, PAGE_SIZE):
+        res = (
+            sb.table("bilty_wise_kaat")
+            .select("gr_no, actual_kaat_rate, kaat, pf, dd_chrg")
+            .in_("gr_no", chunk)
+            .execute()
+        )
+        for r in (res.data or []):
+            existing.setdefault(r["gr_no"], r)
+    return existing
+
+
+def _write_via_rpc(sb, fn: str, items: list[dict], written: set[str]) -> set[str]:
+    """Send items to a bulk_update_bilty_* RPC KAAT_WRITE_CHUNK rows at a time."""
+    for chunk in _chunks(items, KAAT_WRITE_CHUNK):
+        resp = sb.rpc(fn, {"p_rows": chunk}).execute()
+        written.update(resp.data or [])
+    return written
+
+
+def _write_kaat_rows(sb, items: list[dict]) -> set[str]:
+    """
+    Write [{gr_no, actual_kaat_rate, kaat, pf, dd_chrg?}, ...] to bilty_wise_kaat.
+    Uses the bulk_update_bilty_kaat RPC (one statement per KAAT_WRITE_CHUNK
+    rows); falls back to update().in_() grouped by identical payload.
+    Returns the gr_nos that were written.
+    """
+    written: set[str] = set()
+    if not items:
+        return written
+
+    if try_optional(
+        _kaat_rpc_available, lambda: _write_via_rpc(sb, "bulk_update_bilty_kaat", items, written),
+        "bulk_update_bilty_kaat RPC not installed — falling back to grouped updates",
+    ) is not MISSING:
+        return written
+
+    for payload, gr_nos in group_by_payload(items, "gr_no").values():
+        updated, _ = update_grouped(sb, "bilty_wise_kaat", "gr_no", payload, gr_nos)
+        written.update(updated)
+    return written
+
+
+def _write_pf_rows(sb, items: list[dict]) -> set[str]:
+    """
+    Write pf only: [{gr_no, pf, kaat}, ...] where kaat is the value the pf was
+    derived from — a row whose kaat changed since is skipped, so a concurrent
+    kaat rate change is never reverted.  Uses the bulk_update_bilty_pf RPC;
+    falls back to update().in_().eq("kaat") grouped by (pf, kaat).
+    Returns the gr_nos that were written.
+    """
+    written: set[str] = set()
+    if not items:
+        return written
+
+    if try_optional(
+        _pf_rpc_available, lambda: _write_via_rpc(sb, "bulk_update_bilty_pf", items, written),
+        "bulk_update_bilty_pf RPC not installed — falling back to grouped updates",
+    ) is not MISSING:
+        return written
+
+    groups: dict[tuple, list[str]] = {}
+    for it in items:
+        groups.setdefault((it["pf"], it["kaat"]), []).append(it["gr_no"])
+    for (pf, kaat), gr_nos in groups.items():
+        for chunk in _chunks(gr_nos, SYNC_CHUNK):
+            resp = (
+                sb.table("bilty_wise_kaat").update({"pf": pf})
+                .in_("gr_no", chunk).eq("kaat", kaat).execute()
+            )
+            written.update(r["gr_no"] for r in (resp.data or []))
+    return written
+
+
+def _apply_kaat_rate(
+    sb,
+    gr_info: dict[str, dict],
+    new_kaat_rate: float,
+    new_kaat_dd: Optional[float],
+    dry_run: bool,
+) -> dict:
+    """
+    Recalculate kaat / pf for every GR in gr_info ({gr_no: {wt, total,
+    payment_mode}}, in output order) and write them in batches.
+
+    Returns {updated, skipped_gr_nos, pohonch_rows_synced, timing} and, for
+    dry_run, the per-GR old → new `diff` plus a `diff_summary` instead of
+    writing anything.
+    """
+    started = time.perf_counter()
+    existing = _fetch_existing_kaat(sb, list(gr_info.keys()))
+
+    updated = []
+    not_in_kaat = []
+    items = []
+    diff = []
+    for gr_no, info in gr_info.items():
+        cur = existing.get(gr_no)
+        if cur is None:
+            not_in_kaat.append(gr_no)
+            continue
+        wt           = info["wt"]
+        total        = info["total"]
+        payment_mode = info.get("payment_mode", "to-pay")
+        # dd: use new value if caller provided it, else keep existing
+        dd    = new_kaat_dd if new_kaat_dd is not None else (cur.get("dd_chrg") or 0)
+        kaat  = round(wt * new_kaat_rate, 2)
+        # paid bilties: pf is negative (transport owes the consignor)
+        # paid: pf = -kaat (even when kaat=0 → pf=0)
+        # to-pay/foc: pf = freight - kaat - dd
+        pf = round(-kaat, 2) if payment_mode == "paid" else round(total - kaat - dd, 2)
+
+        payload: dict = {"gr_no": gr_no, "actual_kaat_rate": new_kaat_rate, "kaat": kaat, "pf": pf}
+        if new_kaat_dd is not None:
+            payload["dd_chrg"] = new_kaat_dd
+        items.append(payload)
+
+        entry = {
+            "gr_no": gr_no,
+            "wt": wt,
+            "total": total,
+            "kaat_rate": new_kaat_rate,
+            "kaat": kaat,
+            "pf": pf,
+            "kaat_dd": dd,
+        }
+        updated.append(entry)
+        if dry_run:
+            old = {
+                "kaat_rate": cur.get("actual_kaat_rate"),
+                "kaat": cur.get("kaat"),
+                "pf": cur.get("pf"),
+                "kaat_dd": cur.get("dd_chrg"),
+            }
+            new = {"kaat_rate": new_kaat_rate, "kaat": kaat, "pf": pf, "kaat_dd": dd}
+            diff.append({
+                "gr_no": gr_no,
+                "old": old,
+                "new": new,
+                "changed": any(float(old[k] or 0) != float(new[k] or 0) for k in new),
+            })
+
+    if dry_run:
+        elapsed = time.perf_counter() - started
+        return {
+            "dry_run": True,
+            "updated": updated,
+            "skipped_gr_nos": not_in_kaat,
+            "pohonch_rows_synced": 0,
+            "diff_summary": {
+                "changed_count": sum(1 for d in diff if d["changed"]),
+                "unchanged_count": sum(1 for d in diff if not d["changed"]),
+                "kaat_delta": round(sum(float(d["new"]["kaat"] or 0) - float(d["old"]["kaat"] or 0) for d in diff), 2),
+                "pf_delta": round(sum(float(d["new"]["pf"] or 0) - float(d["old"]["pf"] or 0) for d in diff), 2),
+            },
+            "diff": diff,
+            "timing": {"rows": len(items), "seconds": round(elapsed, 3)},
+        }
+
+    write_started = time.perf_counter()
+    written = _write_kaat_rows(sb, items)
+    write_s = time.perf_counter() - write_started
+
+    # Rows deleted between the pre-read and the write count as skipped
+    not_in_kaat.extend(u["gr_no"] for u in updated if u["gr_no"] not in written)
+    updated = [u for u in updated if u["gr_no"] in written]
+
+    # Sync updated values into pohonch bilty_metadata
+    pohonch_touched = _sync_pohonch_metadata(sb, updated)
 
-    return touched
+    return {
+        "updated": updated,
+        "skipped_gr_nos": not_in_kaat,
+        "pohonch_rows_synced": pohonch_touched,
+        "timing": {
+            "rows": len(written),
+            "write_seconds": round(write_s, 3),
+            "rows_per_sec": round(len(written) / write_s, 1) if write_s > 0 else None,
+            "seconds": round(time.perf_counter() - started, 3),
+        },
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -208,13 +443,15 @@ def bulk_update_kaat_rate(
     station_name: str,
     new_kaat_rate: float,
     new_kaat_dd: Optional[float] = None,
+    dry_run: bool = False,
 ) -> dict:
     """
     Update actual_kaat_rate (and optionally dd_chrg) for all bilties of a
     transport in a date range whose destination matches station_name.
     Recalculates kaat = weight * new_kaat_rate and pf = total - kaat.
 
-    Returns a summary with updated count and per-bilty details.
+    dry_run=True returns the computed old → new diff without writing.
+    Returns a summary with updated count, per-bilty details and timing.
     """
     if not transport_gstin:
         return {"status": "error", "message": "transport_gstin is required", "status_code": 400}
@@ -268,58 +505,7 @@ def bulk_update_kaat_rate(
             "updated": [],
         }
 
-    # Fetch existing dd_chrg for all gr_nos so pf = total - kaat - dd is correct
-    existing_dd: dict[str, float] = {}
-    for chunk in _chunks(list(gr_info.keys()), PAGE_SIZE):
-        dd_rows = sb.table("bilty_wise_kaat").select("gr_no, dd_chrg").in_("gr_no", chunk).execute()
-        for r in (dd_rows.data or []):
-            existing_dd[r["gr_no"]] = r.get("dd_chrg") or 0
-
-    # Recalculate and update each GR in bilty_wise_kaat
-    updated = []
-    not_in_kaat = []
-
-    for gr_no, info in gr_info.items():
-        wt           = info["wt"]
-        total        = info["total"]
-        payment_mode = info.get("payment_mode", "to-pay")
-        # dd: use new value if caller provided it, else keep existing
-        dd    = new_kaat_dd if new_kaat_dd is not None else existing_dd.get(gr_no, 0)
-        kaat  = round(wt * new_kaat_rate, 2)
-        # paid bilties: pf is negative (transport owes the consignor)
-        # paid: pf = -kaat (even when kaat=0 → pf=0)
-        # to-pay/foc: pf = freight - kaat - dd
-        pf = round(-kaat, 2) if payment_mode == "paid" else round(total - kaat - dd, 2)
-
-        payload: dict = {
-            "actual_kaat_rate": new_kaat_rate,
-            "kaat": kaat,
-            "pf": pf,
-        }
-        if new_kaat_dd is not None:
-            payload["dd_chrg"] = new_kaat_dd
-
-        res = (
-            sb.table("bilty_wise_kaat")
-            .update(payload)
-            .eq("gr_no", gr_no)
-            .execute()
-        )
-        if res.data:
-            updated.append({
-                "gr_no": gr_no,
-                "wt": wt,
-                "total": total,
-                "kaat_rate": new_kaat_rate,
-                "kaat": kaat,
-                "pf": pf,
-                "kaat_dd": dd,
-            })
-        else:
-            not_in_kaat.append(gr_no)
-
-    # Sync updated values into pohonch bilty_metadata
-    pohonch_touched = _sync_pohonch_metadata(sb, updated)
+    applied = _apply_kaat_rate(sb, gr_info, new_kaat_rate, new_kaat_dd, dry_run)
 
     return {
         "status": "success",
@@ -331,11 +517,9 @@ def bulk_update_kaat_rate(
         "to_date": to_date,
         "new_kaat_rate": new_kaat_rate,
         **({"new_kaat_dd": new_kaat_dd} if new_kaat_dd is not None else {}),
-        "updated_count": len(updated),
-        "skipped_count": len(not_in_kaat),
-        "skipped_gr_nos": not_in_kaat,
-        "pohonch_rows_synced": pohonch_touched,
-        "updated": updated,
+        "updated_count": len(applied["updated"]),
+        "skipped_count": len(applied["skipped_gr_nos"]),
+        **applied,
     }
 
 
@@ -347,6 +531,7 @@ def bulk_update_kaat_by_gr_nos(
     gr_nos: list[str],
     new_kaat_rate: float,
     new_kaat_dd: Optional[float] = None,
+    dry_run: bool = False,
 ) -> dict:
     """
     Update kaat for an explicit list of GR numbers.
@@ -354,7 +539,8 @@ def bulk_update_kaat_by_gr_nos(
     recalculates kaat = weight * new_kaat_rate, pf = total - kaat - dd,
     then writes to bilty_wise_kaat and syncs pohonch.bilty_metadata.
 
-    Returns a summary with per-GR details.
+    dry_run=True returns the computed old → new diff without writing.
+    Returns a summary with per-GR details and timing.
     """
     if not gr_nos:
         return {"status": "error", "message": "gr_nos list is required", "status_code": 400}
@@ -408,71 +594,20 @@ def bulk_update_kaat_by_gr_nos(
     # GRs not found in either table
     not_found = [g for g in unique_gr_nos if g not in gr_info]
 
-    # ── 3. Fetch existing dd_chrg so pf stays correct when dd not supplied ─
-    existing_dd: dict[str, float] = {}
-    for chunk in _chunks(unique_gr_nos, PAGE_SIZE):
-        dd_rows = (
-            sb.table("bilty_wise_kaat")
-            .select("gr_no, dd_chrg")
-            .in_("gr_no", chunk)
-            .execute()
-        )
-        for r in (dd_rows.data or []):
-            existing_dd[r["gr_no"]] = r.get("dd_chrg") or 0
-
-    # ── 4. Recalculate and update bilty_wise_kaat ─────────────────────────
-    updated = []
-    not_in_kaat = []
-
-    for gr_no in unique_gr_nos:
-        if gr_no not in gr_info:
-            continue
-        info         = gr_info[gr_no]
-        wt           = info["wt"]
-        total        = info["total"]
-        payment_mode = info["payment_mode"]
-        dd           = new_kaat_dd if new_kaat_dd is not None else existing_dd.get(gr_no, 0)
-        kaat         = round(wt * new_kaat_rate, 2)
-        pf           = round(-kaat, 2) if payment_mode == "paid" else round(total - kaat - dd, 2)
-
-        payload: dict = {"actual_kaat_rate": new_kaat_rate, "kaat": kaat, "pf": pf}
-        if new_kaat_dd is not None:
-            payload["dd_chrg"] = new_kaat_dd
-
-        res = (
-            sb.table("bilty_wise_kaat")
-            .update(payload)
-            .eq("gr_no", gr_no)
-            .execute()
-        )
-        if res.data:
-            updated.append({
-                "gr_no": gr_no,
-                "wt": wt,
-                "total": total,
-                "kaat_rate": new_kaat_rate,
-                "kaat": kaat,
-                "pf": pf,
-                "kaat_dd": dd,
-            })
-        else:
-            not_in_kaat.append(gr_no)
-
-    # ── 5. Sync updated values into pohonch bilty_metadata ────────────────
-    pohonch_touched = _sync_pohonch_metadata(sb, updated)
+    # ── 3. Recalculate and write bilty_wise_kaat, sync pohonch ────────────
+    ordered = {g: gr_info[g] for g in unique_gr_nos if g in gr_info}
+    applied = _apply_kaat_rate(sb, ordered, new_kaat_rate, new_kaat_dd, dry_run)
 
     return {
         "status": "success",
         "new_kaat_rate": new_kaat_rate,
         **({"new_kaat_dd": new_kaat_dd} if new_kaat_dd is not None else {}),
         "requested_count": len(unique_gr_nos),
-        "updated_count": len(updated),
-        "skipped_count": len(not_in_kaat),
+        "updated_count": len(applied["updated"]),
+        "skipped_count": len(applied["skipped_gr_nos"]),
         "not_found_count": len(not_found),
-        "skipped_gr_nos": not_in_kaat,
         "not_found_gr_nos": not_found,
-        "pohonch_rows_synced": pohonch_touched,
-        "updated": updated,
+        **applied,
     }
 
 
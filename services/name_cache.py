@@ -0,0 +1,122 @@
+"""
+Shared id → name resolution cache for trucks, staff, users, cities and branches.
+List endpoints (challans, truck trips, master data) turn truck_id / driver_id /
+owner_id / created_by UUIDs into display names on every call.  Those mappings
+almost never change, so they are kept here in one size-bounded LRU per kind
+with a TTL, instead of three `in_("id", ...)` queries per list call.
+
+  • resolve_names(kind, ids) — cache hits + ONE in_() query for the misses
+  • prime_names(kind, {id: name}) — warm from rows a service already loaded
+  • invalidate_names(kind, ids) — called by staff_service on writes
+Unknown ids are cached as misses too, so a deleted truck does not cost a
+query on every list.  Trucks are written outside this backend, so their
+freshness relies on the TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from services.supabase_client import get_supabase
+
+NAME_CACHE_TTL_S = 900
+NAME_CACHE_MAX = 5000        # entries per kind
+FETCH_CHUNK = 200            # ids per in_() query
+
+# kind → (table, name column)
+NAME_SOURCES = {
+    "trucks": ("trucks", "truck_number"),
+    "staff": ("staff", "name"),
+    "users": ("users", "name"),
+    "cities": ("cities", "city_name"),
+    "branches": ("branches", "branch_name"),
+}
+
+_MISSING = object()
+_lock = threading.Lock()
+_cache = {kind: OrderedDict() for kind in NAME_SOURCES}   # id → (name, expires_at)
+_stats = {"hits": 0, "misses": 0, "queries": 0, "evictions": 0, "invalidations": 0}
+
+
+def _store(entries: OrderedDict, key, value, expires_at: float):
+    entries[key] = (value, expires_at)
+    entries.move_to_end(key)
+    while len(entries) > NAME_CACHE_MAX:
+        entries.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def resolve_names(kind: str, ids) -> dict:
+    """
+    Return {id: name} for every id that exists in the source table.
+    Names may be None (row exists but name is empty) — callers apply their
+    own fallback.  Ids that do not exist are left out of the result.
+    """
+    ids = {i for i in ids if i}
+    if not ids:
+        return {}
+
+    now = time.monotonic()
+    result, missing = {}, []
+    with _lock:
+        entries = _cache[kind]
+        for i in ids:
+            hit = entries.get(i)
+            if hit and hit[1] > now:
+                entries.move_to_end(i)
+                _stats["hits"] += 1
+                if hit[0] is not _MISSING:
+                    result[i] = hit[0]
+            else:
+                missing.append(i)
+        _stats["misses"] += len(missing)
+
+    if missing:
+        table, col = NAME_SOURCES[kind]
+        sb = get_supabase()
+        fetched = {}
+        for n in range(0, len(missing), FETCH_CHUNK):
+            chunk = missing[n:n + FETCH_CHUNK]
+            resp = sb.table(table).select(f"id, {col}").in_("id", chunk).execute()
+            for row in resp.data or []:
+                fetched[row["id"]] = row.get(col)
+        expires_at = time.monotonic() + NAME_CACHE_TTL_S
+        with _lock:
+            _stats["queries"] += (len(missing) + FETCH_CHUNK - 1) // FETCH_CHUNK
+            entries = _cache[kind]
+            for i in missing:
+                _store(entries, i, fetched.get(i, _MISSING), expires_at)
+        result.update(fetched)
+
+    return result
+
+
+def prime_names(kind: str, names: dict):
+    """Warm the cache with {id: name} pairs the caller already has."""
+    if not names:
+        return
+    expires_at = time.monotonic() + NAME_CACHE_TTL_S
+    with _lock:
+        entries = _cache[kind]
+        for i, name in names.items():
+            if i:
+                _store(entries, i, name, expires_at)
+
+
+def invalidate_names(kind: str, ids=None):
+    """Drop cached names for ids of a kind (None → the whole kind)."""
+    with _lock:
+        _stats["invalidations"] += 1
+        if ids is None:
+            _cache[kind].clear()
+        else:
+            for i in ids:
+                _cache[kind].pop(i, None)
+
+
+def get_name_cache_stats() -> dict:
+    """Snapshot of cache sizes and counters for the metrics endpoint."""
+    with _lock:
+        return {
+            **_stats,
+            "sizes": {kind: len(entries) for kind, entries in _cache.items()},
+            "ttl_s": NAME_CACHE_TTL_S,
+        }
@@ -0,0 +1,172 @@
+"""
+Minimal table PDF writer (no third-party dependency).
+
+Renders a titled, paginated table with the standard Helvetica fonts
+(no embedding needed) and yields the file as byte chunks, one page at a
+time, so the output bytes are never joined into one buffer before they
+are sent (the rows passed in are whatever the caller has loaded).
+Only what the printed sheets need: header lines, a ruled table with a
+repeating column header, footer lines on the last page and page numbers.
+
+table_pages() and write_pdf() are the two halves of render_table_pdf():
+page content streams are self-contained, so pages of several documents
+(e.g. a batch of pohonch sheets) can be cached and written as one file.
+
+    columns = [("GR No", "gr_no", 70, "left"), ("Wt", "wt", 45, "right"), ...]
+    for chunk in render_table_pdf("CHALLAN C-101", ["Truck: UP32 AB 1234"], columns, rows):
+        ...
+"""
+from typing import Iterable, Iterator
+
+A4_PORTRAIT = (595, 842)
+A4_LANDSCAPE = (842, 595)
+MARGIN = 28
+FONT_SIZE = 8
+ROW_HEIGHT = 13
+TITLE_SIZE = 13
+
+
+def _esc(text) -> str:
+    s = "" if text is None else str(text)
+    s = s.encode("latin-1", "replace").decode("latin-1")
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").replace("\r", " ").replace("\n", " ")
+
+
+def _fit(text, width: float, size: float) -> str:
+    """Clip text to roughly fit `width` points (Helvetica ≈ 0.5em per char)."""
+    s = "" if text is None else str(text)
+    max_chars = max(1, int(width / (size * 0.5)) - 1)
+    return s if len(s) <= max_chars else s[:max_chars - 1] + "."
+
+
+def _text(x: float, y: float, text: str, font: str = "F1", size: float = FONT_SIZE) -> str:
+    return f"BT /{font} {size} Tf {x:.1f} {y:.1f} Td ({_esc(text)}) Tj ET\n"
+
+
+def _cell(x: float, y: float, width: float, value, align: str, font: str = "F1") -> str:
+    text = _fit(value, width, FONT_SIZE)
+    if align == "right":
+        x = x + width - 3 - len(text) * FONT_SIZE * 0.5
+    else:
+        x = x + 3
+    return _text(x, y, text, font)
+
+
+class _Writer:
+    """Tracks object offsets while bytes are yielded."""
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+
+    def emit(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        return data
+
+    def obj(self, num: int, body: bytes) -> bytes:
+        self.offsets[num] = self.offset
+        return self.emit(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+
+def table_pages(title: str, header_lines: list, columns: list, rows: Iterable[dict],
+                footer_lines: list = None, landscape: bool = True) -> Iterator[bytes]:
+    """
+    Yield the content stream of each page of a table document.
+    Pages are self-contained (own title, header and page number), so they
+    can be cached and stitched into a larger PDF with write_pdf.
+    """
+    page_w, page_h = A4_LANDSCAPE if landscape else A4_PORTRAIT
+    table_w = sum(c[2] for c in columns)
+    page_no = 0
+    rows_iter = iter(rows)
+    pending = next(rows_iter, None)
+    footer_lines = footer_lines or []
+
+    while True:
+        page_no += 1
+        ops = []
+        y = page_h - MARGIN - TITLE_SIZE
+        if page_no == 1:
+            ops.append(_text(MARGIN, y, title, "F2", TITLE_SIZE))
+            y -= TITLE_SIZE + 4
+            for line in header_lines:
+                ops.append(_text(MARGIN, y, line))
+                y -= ROW_HEIGHT
+        else:
+            ops.append(_text(MARGIN, y, f"{title} (contd.)", "F2", FONT_SIZE + 2))
+            y -= ROW_HEIGHT + 2
+        y -= 4
+
+        # column header
+        ops.append(f"0.9 g {MARGIN} {y - 4:.1f} {table_w:.1f} {ROW_HEIGHT} re f 0 g\n")
+        x = MARGIN
+        for label, _key, width, align in columns:
+            ops.append(_cell(x, y, width, label, align, "F2"))
+            x += width
+        y -= ROW_HEIGHT
+
+        bottom = MARGIN + ROW_HEIGHT * 2
+        while pending is not None and y > bottom:
+            x = MARGIN
+            for _label, key, width, align in columns:
+                ops.append(_cell(x, y, width, pending.get(key), align))
+                x += width
+            ops.append(f"0.8 G {MARGIN} {y - 4:.1f} m {MARGIN + table_w:.1f} {y - 4:.1f} l S 0 G\n")
+            y -= ROW_HEIGHT
+            pending = next(rows_iter, None)
+
+        last = pending is None and y - ROW_HEIGHT * len(footer_lines) > bottom
+        if last:
+            y -= 4
+            for line in footer_lines:
+                ops.append(_text(MARGIN, y, line, "F2"))
+                y -= ROW_HEIGHT
+        ops.append(_text(page_w - MARGIN - 40, MARGIN - 10, f"Page {page_no}"))
+
+        yield "".join(ops).encode("latin-1", "replace")
+        if last:
+            break
+
+
+def write_pdf(pages: Iterable[bytes], landscape: bool = True) -> Iterator[bytes]:
+    """Yield a PDF as byte chunks from an iterable of page content streams."""
+    page_w, page_h = A4_LANDSCAPE if landscape else A4_PORTRAIT
+    w = _Writer()
+    yield w.emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield w.obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    yield w.obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    yield w.obj(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+
+    next_obj = 5
+    page_objs = []
+    for stream in pages:
+        content_num, page_num = next_obj, next_obj + 1
+        next_obj += 2
+        yield w.obj(content_num, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        yield w.obj(page_num, (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            "/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+            % (page_w, page_h, content_num)
+        ).encode())
+        page_objs.append(page_num)
+
+    kids = " ".join(f"{n} 0 R" for n in page_objs)
+    yield w.obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_objs)} >>".encode())
+
+    xref_at = w.offset
+    lines = [b"xref\n", b"0 %d\n" % next_obj, b"0000000000 65535 f \n"]
+    for n in range(1, next_obj):
+        lines.append(b"%010d 00000 n \n" % w.offsets[n])
+    yield w.emit(b"".join(lines))
+    yield w.emit(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_obj, xref_at))
+
+
+def render_table_pdf(title: str, header_lines: list, columns: list, rows: Iterable[dict],
+                     footer_lines: list = None, landscape: bool = True) -> Iterator[bytes]:
+    """
+    Yield a PDF as byte chunks.
+    columns: [(label, key, width_pt, "left"|"right"), ...]
+    rows: dicts looked up by column key (iterated once)
+    """
+    pages = table_pages(title, header_lines, columns, rows, footer_lines, landscape)
+    return write_pdf(pages, landscape)
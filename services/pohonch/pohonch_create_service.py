@@ -13,7 +13,8 @@ Input (from API body):
   created_by       str (uuid)    optional  – falls back to first active user
 
 Auto-generates pohonch_number as <PREFIX><seq:04d>  e.g. NIE0001
-Seq is determined by finding the highest existing number with the same prefix.
+Seq comes from the per-prefix counter in services/sequence.py (seeded from
+the highest existing number with the same prefix).
 
 Bilty data is enriched from:
   bilty table           → freight_amount, wt, no_of_pkg, consignor/ee, date, etc.
@@ -24,6 +25,7 @@ import re
 from datetime import datetime, timezone
 from collections import defaultdict
 from services.supabase_client import get_supabase
+from services.sequence import next_seq
 
 # ── Common words to strip when auto-building prefix ──────────────────────────
 _SKIP_WORDS = {"TRANSPORT", "CARRIER", "ROADLINES", "ROADWAYS", "LOGISTICS",
@@ -61,8 +63,8 @@ def _chunks(lst, n):
         yield lst[i:i + n]
 
 
-def _next_seq(sb, prefix: str) -> int:
-    """Return next integer seq for a given pohonch prefix."""
+def _last_seq(sb, prefix: str) -> int:
+    """Highest seq already used for a pohonch prefix (0 when none)."""
     res = (
         sb.table("pohonch")
         .select("pohonch_number")
@@ -73,10 +75,15 @@ def _next_seq(sb, prefix: str) -> int:
     )
     rows = res.data or []
     if not rows:
-        return 1
+        return 0
     last = rows[0]["pohonch_number"]
     m = re.search(r"(\d+)$", last)
-    return (int(m.group(1)) + 1) if m else 1
+    return int(m.group(1)) if m else 0
+
+
+def _next_seq(sb, prefix: str) -> int:
+    """Return next integer seq for a given pohonch prefix (atomic counter)."""
+    return next_seq(sb, f"pohonch:{prefix}", lambda s: _last_seq(s, prefix))
 
 
 def _get_default_user(sb) -> str:
@@ -272,9 +279,11 @@ def create_pohonch_from_gr_items(
     # Check uniqueness
     dup = sb.table("pohonch").select("id").eq("pohonch_number", pohonch_number).execute()
     if dup.data:
-        # Extremely unlikely but safe: increment until unique
+        # Counter is behind an existing number (e.g. one created outside this
+        # service): draw from the counter until unique so it moves past the
+        # taken numbers instead of every later create colliding again.
         while dup.data:
-            seq += 1
+            seq = max(_next_seq(sb, prefix), seq + 1)
             pohonch_number = f"{prefix}{seq:04d}"
             dup = sb.table("pohonch").select("id").eq("pohonch_number", pohonch_number).execute()
 
@@ -13,10 +13,46 @@ All totals are recalculated from the final bilty_metadata list.
 A signed pohonch is blocked from edits unless force=True is passed.
 """
 import re
+from concurrent.futures import FIRST_COMPLETED, wait
 from datetime import datetime, timezone
 from services.supabase_client import get_supabase
+from services.batch_update import MISSING, batch_update_rows, optional_rpc
+from services.jobs import start_job
+from services.thread_pool import shared_pool
+from services.kaat.kaat_update_service import _write_pf_rows
 from services.pohonch.pohonch_create_service import _chunks, _safe_float
 
+FETCH_CHUNK = 100            # GRs per source-table query
+FETCH_CONCURRENCY = 4        # source-table queries in flight per recalculation
+RECALC_BATCH = 50            # pohonch rebuilt and written per step
+SELECT_PAGE_SIZE = 1000
+BACKGROUND_THRESHOLD = 200   # bulk selections above this run as a background job
+
+_BILTY_COLS = (
+    "gr_no, bilty_date, wt, no_of_pkg, freight_amount, total, "
+    "consignor_name, consignee_name, payment_mode, delivery_type, "
+    "e_way_bill, to_city_id"
+)
+_SBS_COLS = (
+    "gr_no, created_at, weight, no_of_packets, amount, "
+    "consignor, consignee, payment_status, delivery_type, "
+    "e_way_bill, city_id"
+)
+_KAAT_COLS = "gr_no, kaat, pf, dd_chrg, actual_kaat_rate, challan_no"
+
+_GR_PATCHABLE = {
+    "destination", "destination_code", "kaat", "pf", "dd", "kaat_rate",
+    "weight", "packages", "amount", "pohonch_bilty",
+    "e_way_bill", "is_paid", "payment_mode", "delivery_type",
+}
+_TOTAL_KEYS = (
+    "total_bilties", "total_amount", "total_kaat", "total_pf",
+    "total_dd", "total_packages", "total_weight",
+)
+
+# None = not tried yet, False = RPC missing on this database
+_items_rpc_available = {"value": None}
+
 
 def _now():
     return datetime.now(timezone.utc).isoformat()
@@ -191,6 +227,86 @@ def _recalculate_totals(bilty_items: list[dict]) -> dict:
     }
 
 
+def _bounded_fetch(tasks: list) -> list:
+    """
+    Run [(tag, fn, arg), ...] on shared_pool with at most FETCH_CONCURRENCY
+    in flight.  Returns [(tag, rows), ...] in completion order.
+    """
+    out, pending = [], {}
+    for tag, fn, arg in tasks:
+        if len(pending) >= FETCH_CONCURRENCY:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                out.append((pending.pop(f), f.result()))
+        pending[shared_pool.submit(fn, arg)] = tag
+    for f in list(pending):
+        out.append((pending.pop(f), f.result()))
+    return out
+
+
+def _fetch_live_maps(sb, gr_nos: list[str]) -> tuple[dict, dict, dict]:
+    """
+    Live source data for gr_nos → (bilty_map, kaat_map, city_map).
+    bilty and bilty_wise_kaat chunks are fetched concurrently, then
+    station_bilty_summary for GRs not found in bilty, then cities.
+    """
+    def bilty_q(chunk):
+        return sb.table("bilty").select(_BILTY_COLS).in_("gr_no", chunk).execute().data or []
+
+    def kaat_q(chunk):
+        return sb.table("bilty_wise_kaat").select(_KAAT_COLS).in_("gr_no", chunk).execute().data or []
+
+    def sbs_q(chunk):
+        return sb.table("station_bilty_summary").select(_SBS_COLS).in_("gr_no", chunk).execute().data or []
+
+    bilty_map: dict[str, dict] = {}
+    kaat_map: dict[str, dict] = {}
+    chunks = list(_chunks(gr_nos, FETCH_CHUNK))
+    tasks = [("bilty", bilty_q, c) for c in chunks] + [("kaat", kaat_q, c) for c in chunks]
+    for tag, rows in _bounded_fetch(tasks):
+        for r in rows:
+            gr = r.get("gr_no")
+            if not gr:
+                continue
+            if tag == "kaat":
+                kaat_map[gr] = r
+            elif gr not in bilty_map:
+                bilty_map[gr] = r
+
+    missing = [g for g in gr_nos if g not in bilty_map]
+    sbs_tasks = [("sbs", sbs_q, c) for c in _chunks(missing, FETCH_CHUNK)]
+    for _tag, rows in _bounded_fetch(sbs_tasks):
+        for s in rows:
+            gr = s.get("gr_no")
+            if gr and gr not in bilty_map:
+                bilty_map[gr] = {
+                    "gr_no":          gr,
+                    "bilty_date":     (s.get("created_at") or "")[:10],
+                    "wt":             s.get("weight") or 0,
+                    "no_of_pkg":      s.get("no_of_packets") or 0,
+                    "freight_amount": s.get("amount") or 0,
+                    "consignor_name": s.get("consignor") or "",
+                    "consignee_name": s.get("consignee") or "",
+                    "payment_mode":   s.get("payment_status") or "",
+                    "delivery_type":  s.get("delivery_type") or "",
+                    "e_way_bill":     s.get("e_way_bill") or "",
+                    "to_city_id":     s.get("city_id") or "",
+                }
+
+    city_ids = list({b["to_city_id"] for b in bilty_map.values() if b.get("to_city_id")})
+    return bilty_map, kaat_map, _fetch_city_map(sb, city_ids)
+
+
+def _write_pohonch_rows(sb, items: list[dict]):
+    """Write [{id, ...fields}] via bulk_update_rows; rows it rejects are written one by one."""
+    _, failed = batch_update_rows(sb, "pohonch", "id", items)
+    retry = {f.get("id") for f in failed}
+    for item in items:
+        if item["id"] in retry:
+            payload = {k: v for k, v in item.items() if k != "id"}
+            sb.table("pohonch").update(payload).eq("id", item["id"]).execute()
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Main edit function
 # ─────────────────────────────────────────────────────────────────────────────
@@ -349,6 +465,10 @@ def update_gr_fields(
 
     If `destination` is updated, the service looks up the city in the cities
     table and also sets destination_code automatically.
+
+    The patch is a point update of the pohonch_items row (patch_pohonch_item
+    RPC rebuilds bilty_metadata and totals in the same transaction); without
+    the RPC the whole bilty_metadata array is read, patched and rewritten.
     """
     if not gr_no:
         return {"status": "error", "message": "gr_no is required", "status_code": 400}
@@ -359,7 +479,7 @@ def update_gr_fields(
 
     res = (
         sb.table("pohonch")
-        .select("id, pohonch_number, is_signed, bilty_metadata")
+        .select("id, pohonch_number, is_signed")
         .eq("id", pohonch_id)
         .single()
         .execute()
@@ -375,21 +495,10 @@ def update_gr_fields(
             "status_code": 409,
         }
 
-    bilty_meta: list[dict] = row.get("bilty_metadata") or []
-    gr_index = next((i for i, b in enumerate(bilty_meta) if str(b.get("gr_no", "")) == str(gr_no)), None)
-    if gr_index is None:
-        return {"status": "error", "message": f"GR '{gr_no}' not found in this pohonch", "status_code": 404}
-
-    entry = dict(bilty_meta[gr_index])
-
     # Allowed fields — prevents accidental overwrite of gr_no / date / consignor
-    ALLOWED = {
-        "destination", "destination_code", "kaat", "pf", "dd", "kaat_rate",
-        "weight", "packages", "amount", "pohonch_bilty",
-        "e_way_bill", "is_paid", "payment_mode", "delivery_type",
-    }
+    fields: dict = {}
     for field, value in updates.items():
-        if field not in ALLOWED:
+        if field not in _GR_PATCHABLE:
             continue
         # Numeric coercion
         if field in ("kaat", "pf", "dd", "kaat_rate", "weight", "amount"):
@@ -402,7 +511,7 @@ def update_gr_fields(
                 value = int(value)
             except (TypeError, ValueError):
                 value = 0
-        entry[field] = value
+        fields[field] = value
 
     # If destination name changed, auto-resolve destination_code from cities table
     if "destination" in updates and updates["destination"]:
@@ -415,9 +524,38 @@ def update_gr_fields(
         )
         if city_res.data:
             c = city_res.data[0]
-            entry["destination"]      = c.get("city_name", updates["destination"])
-            entry["destination_code"] = c.get("city_code", entry.get("destination_code", ""))
+            fields["destination"] = c.get("city_name", updates["destination"])
+            if "city_code" in c:
+                fields["destination_code"] = c["city_code"]
+
+    message = f"GR '{gr_no}' updated in pohonch {row['pohonch_number']}"
+
+    patched = optional_rpc(sb, _items_rpc_available, "patch_pohonch_item", {
+        "p_pohonch_id": pohonch_id,
+        "p_gr_no": str(gr_no),
+        "p_fields": fields,
+        "p_updated_by": user_id,
+    }, "rewriting bilty_metadata")
+    if patched is not MISSING:
+        if not patched:
+            return {"status": "error", "message": f"GR '{gr_no}' not found in this pohonch", "status_code": 404}
+        updated = patched["pohonch"]
+        return {
+            "status": "success",
+            "message": message,
+            "gr_no": gr_no,
+            "updated_entry": patched["entry"],
+            "new_totals": {k: updated.get(k) for k in _TOTAL_KEYS},
+            "data": updated,
+        }
+
+    meta_res = sb.table("pohonch").select("bilty_metadata").eq("id", pohonch_id).single().execute()
+    bilty_meta: list[dict] = (meta_res.data or {}).get("bilty_metadata") or []
+    gr_index = next((i for i, b in enumerate(bilty_meta) if str(b.get("gr_no", "")) == str(gr_no)), None)
+    if gr_index is None:
+        return {"status": "error", "message": f"GR '{gr_no}' not found in this pohonch", "status_code": 404}
 
+    entry = {**bilty_meta[gr_index], **fields}
     bilty_meta[gr_index] = entry
     totals = _recalculate_totals(bilty_meta)
 
@@ -435,7 +573,7 @@ def update_gr_fields(
 
     return {
         "status": "success",
-        "message": f"GR '{gr_no}' updated in pohonch {row['pohonch_number']}",
+        "message": message,
         "gr_no": gr_no,
         "updated_entry": entry,
         "new_totals": totals,
@@ -491,70 +629,10 @@ def recalculate_pohonch(
 
     gr_nos = [str(b.get("gr_no", "")) for b in bilty_meta if b.get("gr_no")]
 
-    # ── 1. Bilty table ────────────────────────────────────────────────────────
-    bilty_map: dict[str, dict] = {}
-    for chunk in _chunks(gr_nos, 50):
-        r = (
-            sb.table("bilty")
-            .select("gr_no, bilty_date, wt, no_of_pkg, freight_amount, total, "
-                    "consignor_name, consignee_name, payment_mode, delivery_type, "
-                    "e_way_bill, to_city_id")
-            .in_("gr_no", chunk)
-            .execute()
-        )
-        for b in r.data or []:
-            gr = b.get("gr_no")
-            if gr and gr not in bilty_map:
-                bilty_map[gr] = b
-
-    # ── 2. station_bilty_summary fallback ────────────────────────────────────
-    missing = [g for g in gr_nos if g not in bilty_map]
-    if missing:
-        for chunk in _chunks(missing, 50):
-            r = (
-                sb.table("station_bilty_summary")
-                .select("gr_no, created_at, weight, no_of_packets, amount, "
-                        "consignor, consignee, payment_status, delivery_type, "
-                        "e_way_bill, city_id")
-                .in_("gr_no", chunk)
-                .execute()
-            )
-            for s in r.data or []:
-                gr = s.get("gr_no")
-                if gr and gr not in bilty_map:
-                    bilty_map[gr] = {
-                        "gr_no":          gr,
-                        "bilty_date":     (s.get("created_at") or "")[:10],
-                        "wt":             s.get("weight") or 0,
-                        "no_of_pkg":      s.get("no_of_packets") or 0,
-                        "freight_amount": s.get("amount") or 0,
-                        "consignor_name": s.get("consignor") or "",
-                        "consignee_name": s.get("consignee") or "",
-                        "payment_mode":   s.get("payment_status") or "",
-                        "delivery_type":  s.get("delivery_type") or "",
-                        "e_way_bill":     s.get("e_way_bill") or "",
-                        "to_city_id":     s.get("city_id") or "",
-                    }
-
-    # ── 3. bilty_wise_kaat ────────────────────────────────────────────────────
-    kaat_map: dict[str, dict] = {}
-    for chunk in _chunks(gr_nos, 50):
-        r = (
-            sb.table("bilty_wise_kaat")
-            .select("gr_no, kaat, pf, dd_chrg, actual_kaat_rate, challan_no")
-            .in_("gr_no", chunk)
-            .execute()
-        )
-        for k in r.data or []:
-            gr = k.get("gr_no")
-            if gr:
-                kaat_map[gr] = k
-
-    # ── 4. Cities ─────────────────────────────────────────────────────────────
-    city_ids = list({b["to_city_id"] for b in bilty_map.values() if b.get("to_city_id")})
-    city_map = _fetch_city_map(sb, city_ids)
+    # ── 1. Live bilty / station / kaat / city data ───────────────────────────
+    bilty_map, kaat_map, city_map = _fetch_live_maps(sb, gr_nos)
 
-    # ── 5. Rebuild bilty_metadata with fresh values ───────────────────────────
+    # ── 2. Rebuild bilty_metadata with fresh values ───────────────────────────
     old_totals = {
         "total_kaat":    _safe_float(row.get("total_kaat")),
         "total_pf":      _safe_float(row.get("total_pf")),
@@ -564,6 +642,7 @@ def recalculate_pohonch(
 
     new_meta = []
     not_found = []
+    pf_fixes: dict[str, dict] = {}
     for old_entry in bilty_meta:
         gr = str(old_entry.get("gr_no", ""))
         b = bilty_map.get(gr)
@@ -618,8 +697,9 @@ def recalculate_pohonch(
 
         # Also fix bilty_wise_kaat.pf if it differs from the correct value
         if kaat_val and abs(pf_val - pf_raw) > 0.01:
-            sb.table("bilty_wise_kaat").update({"pf": pf_val}).eq("gr_no", gr).execute()
+            pf_fixes[gr] = {"gr_no": gr, "pf": pf_val, "kaat": k.get("kaat")}
 
+    _write_pf_rows(sb, list(pf_fixes.values()))
     new_totals = _recalculate_totals(new_meta)
 
     update_payload = {
@@ -654,129 +734,52 @@ def recalculate_pohonch(
 # 4. Bulk recalculate — re-fetch live data for multiple pohonch at once
 # ─────────────────────────────────────────────────────────────────────────────
 
-def bulk_recalculate_pohonch(
-    pohonch_ids: list[str] | None = None,
-    pohonch_numbers: list[str] | None = None,
-    transport_gstin: str | None = None,
-    transport_name: str | None = None,
-    user_id: str | None = None,
-    force: bool = False,
-) -> dict:
-    """
-    Recalculate multiple pohonch in one call by re-fetching live data from
-    bilty, bilty_wise_kaat, station_bilty_summary and cities tables.
+def _select_pohonch_ids(sb, pohonch_ids, pohonch_numbers, transport_gstin, transport_name):
+    """Ids of the active pohonch matching ONE selector (paged), or None when none given."""
+    ids, page = [], 0
+    while True:
+        lo = page * SELECT_PAGE_SIZE
+        q = sb.table("pohonch").select("id").eq("is_active", True)
+        if pohonch_ids:
+            q = q.in_("id", pohonch_ids)
+        elif pohonch_numbers:
+            q = q.in_("pohonch_number", pohonch_numbers)
+        elif transport_gstin:
+            q = q.ilike("transport_gstin", f"%{transport_gstin.strip()}%")
+        elif transport_name:
+            q = q.ilike("transport_name", f"%{transport_name.strip()}%")
+        else:
+            return None
+        batch = q.order("created_at").order("id").range(lo, lo + SELECT_PAGE_SIZE - 1).execute().data or []
+        ids.extend(r["id"] for r in batch)
+        if len(batch) < SELECT_PAGE_SIZE:
+            return ids
+        page += 1
 
-    Selection — supply ONE of:
-      pohonch_ids      list[uuid]  — recalculate specific pohonch by UUID
-      pohonch_numbers  list[str]   — recalculate by pohonch_number (e.g. ["NIE0001","NIE0002"])
-      transport_gstin  str         — recalculate ALL active pohonch for this transport GSTIN
-      transport_name   str         — recalculate ALL active pohonch for this transport name
 
-    Returns a summary per-pohonch (old vs new totals + diff) and aggregate counts.
-    Signed pohonch are skipped unless force=True.
-    """
-    sb = get_supabase()
-
-    # ── Fetch target pohonch list ─────────────────────────────────────────────
-    q = sb.table("pohonch").select(
+def _recalculate_batch(sb, ids: list[str], user_id: str | None, force: bool) -> tuple[list, dict]:
+    """Rebuild and write back one batch of pohonch; returns (results, counts)."""
+    res = sb.table("pohonch").select(
         "id, pohonch_number, is_signed, transport_name, transport_gstin, "
         "bilty_metadata, total_kaat, total_pf, total_amount, total_bilties"
-    ).eq("is_active", True)
-
-    if pohonch_ids:
-        q = q.in_("id", pohonch_ids)
-    elif pohonch_numbers:
-        q = q.in_("pohonch_number", pohonch_numbers)
-    elif transport_gstin:
-        q = q.ilike("transport_gstin", f"%{transport_gstin.strip()}%")
-    elif transport_name:
-        q = q.ilike("transport_name", f"%{transport_name.strip()}%")
-    else:
-        return {
-            "status": "error",
-            "message": "Provide one of: pohonch_ids, pohonch_numbers, transport_gstin, or transport_name",
-            "status_code": 400,
-        }
-
-    pohonch_rows = q.execute().data or []
-    if not pohonch_rows:
-        return {"status": "success", "message": "No pohonch found matching criteria",
-                "processed": 0, "skipped": 0, "results": []}
+    ).in_("id", ids).execute()
+    by_id = {r["id"]: r for r in (res.data or [])}
+    pohonch_rows = [by_id[i] for i in ids if i in by_id]
 
-    # ── Collect ALL gr_nos from ALL pohonch in one pass ───────────────────────
+    # ── Collect ALL gr_nos from the batch in one pass ─────────────────────────
     all_gr_nos: list[str] = []
     for row in pohonch_rows:
         meta = row.get("bilty_metadata") or []
         all_gr_nos.extend(str(b.get("gr_no", "")) for b in meta if b.get("gr_no"))
     all_gr_nos = list(dict.fromkeys(all_gr_nos))   # deduplicate, preserve order
 
-    # ── Bulk-fetch bilty data ─────────────────────────────────────────────────
-    bilty_map: dict[str, dict] = {}
-    for chunk in _chunks(all_gr_nos, 100):
-        r = (
-            sb.table("bilty")
-            .select("gr_no, bilty_date, wt, no_of_pkg, freight_amount, total, "
-                    "consignor_name, consignee_name, payment_mode, delivery_type, "
-                    "e_way_bill, to_city_id")
-            .in_("gr_no", chunk)
-            .execute()
-        )
-        for b in r.data or []:
-            gr = b.get("gr_no")
-            if gr and gr not in bilty_map:
-                bilty_map[gr] = b
-
-    missing_grs = [g for g in all_gr_nos if g not in bilty_map]
-    if missing_grs:
-        for chunk in _chunks(missing_grs, 100):
-            r = (
-                sb.table("station_bilty_summary")
-                .select("gr_no, created_at, weight, no_of_packets, amount, "
-                        "consignor, consignee, payment_status, delivery_type, "
-                        "e_way_bill, city_id")
-                .in_("gr_no", chunk)
-                .execute()
-            )
-            for s in r.data or []:
-                gr = s.get("gr_no")
-                if gr and gr not in bilty_map:
-                    bilty_map[gr] = {
-                        "gr_no":          gr,
-                        "bilty_date":     (s.get("created_at") or "")[:10],
-                        "wt":             s.get("weight") or 0,
-                        "no_of_pkg":      s.get("no_of_packets") or 0,
-                        "freight_amount": s.get("amount") or 0,
-                        "consignor_name": s.get("consignor") or "",
-                        "consignee_name": s.get("consignee") or "",
-                        "payment_mode":   s.get("payment_status") or "",
-                        "delivery_type":  s.get("delivery_type") or "",
-                        "e_way_bill":     s.get("e_way_bill") or "",
-                        "to_city_id":     s.get("city_id") or "",
-                    }
-
-    # ── Bulk-fetch kaat data ──────────────────────────────────────────────────
-    kaat_map: dict[str, dict] = {}
-    for chunk in _chunks(all_gr_nos, 100):
-        r = (
-            sb.table("bilty_wise_kaat")
-            .select("gr_no, kaat, pf, dd_chrg, actual_kaat_rate, challan_no")
-            .in_("gr_no", chunk)
-            .execute()
-        )
-        for k in r.data or []:
-            gr = k.get("gr_no")
-            if gr:
-                kaat_map[gr] = k
-
-    # ── Bulk-fetch city data ──────────────────────────────────────────────────
-    city_ids = list({b["to_city_id"] for b in bilty_map.values() if b.get("to_city_id")})
-    city_map = _fetch_city_map(sb, city_ids)
+    bilty_map, kaat_map, city_map = _fetch_live_maps(sb, all_gr_nos)
 
     # ── Process each pohonch ──────────────────────────────────────────────────
     results = []
-    processed = 0
-    skipped_signed = 0
-    skipped_empty = 0
+    counts = {"processed": 0, "skipped_signed": 0, "skipped_empty": 0}
+    pf_fixes: dict[str, dict] = {}
+    items = []
 
     for row in pohonch_rows:
         pno = row["pohonch_number"]
@@ -787,13 +790,13 @@ def bulk_recalculate_pohonch(
                 "status": "skipped",
                 "reason": "signed — pass force=true to override",
             })
-            skipped_signed += 1
+            counts["skipped_signed"] += 1
             continue
 
         bilty_meta: list[dict] = row.get("bilty_metadata") or []
         if not bilty_meta:
             results.append({"pohonch_number": pno, "status": "skipped", "reason": "no bilty entries"})
-            skipped_empty += 1
+            counts["skipped_empty"] += 1
             continue
 
         old_totals = {
@@ -852,19 +855,19 @@ def bulk_recalculate_pohonch(
 
             # Fix bilty_wise_kaat.pf if the stored value differs from the correct one
             if kaat_val and abs(pf_val - pf_raw) > 0.01:
-                sb.table("bilty_wise_kaat").update({"pf": pf_val}).eq("gr_no", gr).execute()
+                pf_fixes[gr] = {"gr_no": gr, "pf": pf_val, "kaat": k.get("kaat")}
 
         new_totals = _recalculate_totals(new_meta)
         update_payload = {
+            "id": row["id"],
             **new_totals,
             "bilty_metadata": new_meta,
             "updated_at": _now(),
         }
         if user_id:
             update_payload["updated_by"] = user_id
-
-        sb.table("pohonch").update(update_payload).eq("id", row["id"]).execute()
-        processed += 1
+        items.append(update_payload)
+        counts["processed"] += 1
 
         results.append({
             "pohonch_number": pno,
@@ -883,11 +886,85 @@ def bulk_recalculate_pohonch(
             "not_refreshed_gr_nos": not_found_grs,
         })
 
+    # ── Batched write-back ────────────────────────────────────────────────────
+    _write_pf_rows(sb, list(pf_fixes.values()))
+    _write_pohonch_rows(sb, items)
+    return results, counts
+
+
+def _run_bulk_recalculate(report, ids: list[str], user_id: str | None, force: bool) -> dict:
+    """Recalculate `ids` RECALC_BATCH at a time; report(done) after each batch."""
+    sb = get_supabase()
+    results = []
+    totals = {"processed": 0, "skipped_signed": 0, "skipped_empty": 0}
+    done = 0
+    for batch in _chunks(ids, RECALC_BATCH):
+        batch_results, counts = _recalculate_batch(sb, batch, user_id, force)
+        results.extend(batch_results)
+        for key, n in counts.items():
+            totals[key] += n
+        done += len(batch)
+        report(done)
+
     return {
         "status":        "success",
-        "total_found":   len(pohonch_rows),
-        "processed":     processed,
-        "skipped_signed": skipped_signed,
-        "skipped_empty":  skipped_empty,
+        "total_found":   len(ids),
+        **totals,
         "results":       results,
     }
+
+
+def bulk_recalculate_pohonch(
+    pohonch_ids: list[str] | None = None,
+    pohonch_numbers: list[str] | None = None,
+    transport_gstin: str | None = None,
+    transport_name: str | None = None,
+    user_id: str | None = None,
+    force: bool = False,
+    background: bool | None = None,
+) -> dict:
+    """
+    Recalculate multiple pohonch in one call by re-fetching live data from
+    bilty, bilty_wise_kaat, station_bilty_summary and cities tables.
+
+    Selection — supply ONE of:
+      pohonch_ids      list[uuid]  — recalculate specific pohonch by UUID
+      pohonch_numbers  list[str]   — recalculate by pohonch_number (e.g. ["NIE0001","NIE0002"])
+      transport_gstin  str         — recalculate ALL active pohonch for this transport GSTIN
+      transport_name   str         — recalculate ALL active pohonch for this transport name
+
+    Pohonch are processed RECALC_BATCH at a time: source tables are fetched
+    with bounded concurrency, then PF corrections and pohonch rows are
+    written back in batches.
+
+    background: True → always run as a background job, False → always
+    inline, None → background only when more than BACKGROUND_THRESHOLD
+    pohonch match.  A background call returns job_id; poll GET /api/jobs/{job_id}.
+
+    Returns a summary per-pohonch (old vs new totals + diff) and aggregate counts.
+    Signed pohonch are skipped unless force=True.
+    """
+    sb = get_supabase()
+
+    ids = _select_pohonch_ids(sb, pohonch_ids, pohonch_numbers, transport_gstin, transport_name)
+    if ids is None:
+        return {
+            "status": "error",
+            "message": "Provide one of: pohonch_ids, pohonch_numbers, transport_gstin, or transport_name",
+            "status_code": 400,
+        }
+    if not ids:
+        return {"status": "success", "message": "No pohonch found matching criteria",
+                "processed": 0, "skipped": 0, "results": []}
+
+    if background or (background is None and len(ids) > BACKGROUND_THRESHOLD):
+        job = start_job("pohonch_recalculate", len(ids), _run_bulk_recalculate, ids, user_id, force)
+        return {
+            "status":     "success",
+            "message":    f"Recalculating {len(ids)} pohonch in the background — poll GET /api/jobs/{job['id']}",
+            "background": True,
+            "job_id":     job["id"],
+            "data":       job,
+        }
+
+    return _run_bulk_recalculate(lambda done: None, ids, user_id, force)
@@ -0,0 +1,63 @@
+"""
+Pohonch GR Index
+Looks up which pohonch rows hold a given set of GR numbers.
+
+Reads pohonch_items (migrations/012_pohonch_items.sql), the normalized
+line-item table kept in step with pohonch.bilty_metadata, through its gr_no
+index — so callers touch only the pohonch rows that actually contain the
+GRs.  If the table is not installed the lookup falls back to scanning
+pohonch.bilty_metadata page by page (the old cost, but still correct).
+"""
+from services.batch_update import MISSING, is_table_missing, try_optional
+
+IN_CHUNK = 200
+SCAN_PAGE_SIZE = 1000
+
+# None = not tried yet, False = table missing on this database
+_index_available = {"value": None}
+
+
+def _scan_bilty_metadata(sb, wanted: set) -> dict:
+    found: dict[str, set] = {}
+    page = 0
+    while True:
+        lo = page * SCAN_PAGE_SIZE
+        batch = sb.table("pohonch").select("id, bilty_metadata").order("id").range(
+            lo, lo + SCAN_PAGE_SIZE - 1
+        ).execute().data or []
+        for row in batch:
+            for entry in (row.get("bilty_metadata") or []):
+                gr = entry.get("gr_no") if isinstance(entry, dict) else None
+                if gr in wanted:
+                    found.setdefault(gr, set()).add(row["id"])
+        if len(batch) < SCAN_PAGE_SIZE:
+            break
+        page += 1
+    return found
+
+
+def _lookup_index(sb, wanted: list) -> dict:
+    found: dict[str, set] = {}
+    for i in range(0, len(wanted), IN_CHUNK):
+        resp = sb.table("pohonch_items").select("gr_no, pohonch_id").in_(
+            "gr_no", wanted[i:i + IN_CHUNK]
+        ).execute()
+        for r in (resp.data or []):
+            found.setdefault(r["gr_no"], set()).add(r["pohonch_id"])
+    return found
+
+
+def pohonch_ids_for_grs(sb, gr_nos) -> dict:
+    """{gr_no: {pohonch_id, ...}} for every GR that appears in some pohonch."""
+    wanted = [str(g) for g in dict.fromkeys(gr_nos) if g]
+    if not wanted:
+        return {}
+
+    found = try_optional(
+        _index_available, lambda: _lookup_index(sb, wanted),
+        "pohonch_items table not installed — falling back to bilty_metadata scan",
+        missing=is_table_missing,
+    )
+    if found is not MISSING:
+        return found
+    return _scan_bilty_metadata(sb, set(wanted))
@@ -0,0 +1,238 @@
+"""
+Pohonch PDF Service
+Batch print of pohonch sheets — a set of ids, or a transport + date window —
+rendered server-side into ONE multi-page PDF.
+
+Each sheet's pages (content streams from pdf_writer.table_pages) are cached
+per pohonch id together with its updated_at.  Every write path (edit, GR
+patch, recalculate, kaat sync, sign) bumps pohonch.updated_at, so a changed
+sheet simply misses and is re-rendered; an unchanged one is reused even when
+it is printed as part of a different batch.
+
+A reprint costs one header query (id, pohonch_number, updated_at) plus one
+bilty_metadata read per FETCH_CHUNK sheets that are not cached.  The file is
+streamed sheet by sheet while it is assembled.  The fragment cache is an LRU
+capped at PDF_CACHE_MAX_BYTES.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from services.supabase_client import get_supabase
+from services.pdf_writer import table_pages, write_pdf
+
+PDF_CACHE_MAX_BYTES = 32 * 1024 * 1024
+BATCH_MAX = 500            # pohonch per PDF
+FETCH_CHUNK = 50           # full rows read per round trip on a miss
+SELECT_PAGE_SIZE = 1000
+
+SHEET_COLS = (
+    "id, pohonch_number, transport_name, transport_gstin, challan_metadata, "
+    "bilty_metadata, total_bilties, total_amount, total_kaat, total_pf, total_dd, "
+    "total_packages, total_weight, is_signed, signed_at, created_at, updated_at"
+)
+
+POHONCH_COLUMNS = [
+    ("S.No", "sno", 28, "right"),
+    ("GR No", "gr_no", 62, "left"),
+    ("Date", "date", 54, "left"),
+    ("Challan", "challan_no", 55, "left"),
+    ("Consignor", "consignor", 100, "left"),
+    ("Consignee", "consignee", 100, "left"),
+    ("Destination", "destination", 70, "left"),
+    ("Pkgs", "packages", 32, "right"),
+    ("Wt", "weight", 42, "right"),
+    ("Amount", "amount", 55, "right"),
+    ("Kaat", "kaat", 48, "right"),
+    ("DD", "dd", 38, "right"),
+    ("PF", "pf", 52, "right"),
+    ("Bilty", "pohonch_bilty", 50, "left"),
+]
+
+_lock = threading.Lock()
+_cache: OrderedDict = OrderedDict()   # pohonch_id → {"version", "pages", "bytes"}
+_cache_bytes = {"value": 0}
+_stats = {"hits": 0, "renders": 0, "batches": 0, "evictions": 0}
+
+
+def _fmt_num(v, digits: int = 2) -> str:
+    if v in (None, ""):
+        return ""
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return str(v)
+    return str(int(f)) if f.is_integer() else f"{f:.{digits}f}"
+
+
+def _render_sheet(p: dict) -> list:
+    """Page content streams for one pohonch sheet."""
+    def table_rows():
+        for i, b in enumerate(p.get("bilty_metadata") or [], 1):
+            yield {
+                **b,
+                "sno": i,
+                "date": (b.get("date") or "")[:10],
+                "packages": _fmt_num(b.get("packages"), 0),
+                "weight": _fmt_num(b.get("weight")),
+                "amount": _fmt_num(b.get("amount")),
+                "kaat": _fmt_num(b.get("kaat")),
+                "dd": _fmt_num(b.get("dd")),
+                "pf": _fmt_num(b.get("pf")),
+            }
+
+    signed = f"Signed: {(p.get('signed_at') or '')[:10]}" if p.get("is_signed") else "Unsigned"
+    header = [
+        f"Transport: {p.get('transport_name') or ''}    GSTIN: {p.get('transport_gstin') or ''}",
+        f"Date: {(p.get('created_at') or '')[:10]}    {signed}",
+        f"Challans: {', '.join(str(c) for c in (p.get('challan_metadata') or []))}",
+    ]
+    footer = [
+        f"Bilties: {p.get('total_bilties') or 0}    Packages: {_fmt_num(p.get('total_packages'), 0)}"
+        f"    Weight: {_fmt_num(p.get('total_weight'))}",
+        f"Amount: {_fmt_num(p.get('total_amount'))}    Kaat: {_fmt_num(p.get('total_kaat'))}"
+        f"    DD: {_fmt_num(p.get('total_dd'))}    PF: {_fmt_num(p.get('total_pf'))}",
+    ]
+    title = f"POHONCH {p.get('pohonch_number') or ''}"
+    return list(table_pages(title, header, POHONCH_COLUMNS, table_rows(), footer, landscape=True))
+
+
+def _cached_pages(pohonch_id: str, version: str):
+    with _lock:
+        entry = _cache.get(pohonch_id)
+        if entry and entry["version"] == version:
+            _cache.move_to_end(pohonch_id)
+            _stats["hits"] += 1
+            return entry["pages"]
+    return None
+
+
+def _store(pohonch_id: str, version: str, pages: list):
+    size = sum(len(pg) for pg in pages)
+    with _lock:
+        _stats["renders"] += 1
+        if size > PDF_CACHE_MAX_BYTES:
+            return
+        old = _cache.pop(pohonch_id, None)
+        if old:
+            _cache_bytes["value"] -= old["bytes"]
+        _cache[pohonch_id] = {"version": version, "pages": pages, "bytes": size}
+        _cache_bytes["value"] += size
+        while _cache_bytes["value"] > PDF_CACHE_MAX_BYTES and _cache:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes["value"] -= evicted["bytes"]
+            _stats["evictions"] += 1
+
+
+def _select_headers(sb, pohonch_ids, transport_gstin, date_from, date_to) -> list:
+    """(id, pohonch_number, updated_at) of the sheets to print, in print order."""
+    if pohonch_ids:
+        ids = list(dict.fromkeys(str(i) for i in pohonch_ids if i))
+        by_id = {}
+        for i in range(0, len(ids), SELECT_PAGE_SIZE):
+            res = sb.table("pohonch").select("id, pohonch_number, updated_at").in_(
+                "id", ids[i:i + SELECT_PAGE_SIZE]
+            ).execute()
+            by_id.update({r["id"]: r for r in (res.data or [])})
+        return [by_id[i] for i in ids if i in by_id]
+
+    rows, page = [], 0
+    while True:
+        lo = page * SELECT_PAGE_SIZE
+        q = (
+            sb.table("pohonch")
+            .select("id, pohonch_number, updated_at")
+            .eq("is_active", True)
+            .eq("transport_gstin", transport_gstin.strip().upper())
+        )
+        if date_from:
+            q = q.gte("created_at", date_from)
+        if date_to:
+            q = q.lte("created_at", f"{date_to[:10]}T23:59:59.999999")
+        batch = q.order("pohonch_number").order("id").range(lo, lo + SELECT_PAGE_SIZE - 1).execute().data or []
+        rows.extend(batch)
+        if len(batch) < SELECT_PAGE_SIZE or len(rows) > BATCH_MAX:
+            return rows
+        page += 1
+
+
+def _iter_pages(sb, headers: list):
+    """Pages of every sheet in order — cached ones reused, the rest fetched per chunk."""
+    for i in range(0, len(headers), FETCH_CHUNK):
+        chunk = headers[i:i + FETCH_CHUNK]
+        cached = {h["id"]: _cached_pages(h["id"], str(h.get("updated_at"))) for h in chunk}
+        misses = [pid for pid, pages in cached.items() if pages is None]
+        fresh = {}
+        if misses:
+            res = sb.table("pohonch").select(SHEET_COLS).in_("id", misses).execute()
+            fresh = {r["id"]: r for r in (res.data or [])}
+        for h in chunk:
+            pages = cached[h["id"]]
+            if pages is None:
+                row = fresh.get(h["id"])
+                if not row:
+                    continue   # deleted since the header query
+                pages = _render_sheet(row)
+                _store(row["id"], str(row.get("updated_at")), pages)
+            yield from pages
+
+
+def get_pohonch_batch_pdf(
+    pohonch_ids: list | None = None,
+    transport_gstin: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> dict:
+    """
+    One PDF holding the sheets of pohonch_ids (in the given order), or of
+    every active pohonch of transport_gstin created in [date_from, date_to]
+    (ordered by pohonch_number).  On success data.chunks is an iterator of
+    bytes for a streaming response.
+    """
+    if not pohonch_ids and not transport_gstin:
+        return {"status": "error", "message": "Provide pohonch_ids or transport_gstin", "status_code": 400}
+    try:
+        sb = get_supabase()
+        headers = _select_headers(sb, pohonch_ids, transport_gstin, date_from, date_to)
+        if not headers:
+            return {"status": "error", "message": "No pohonch found for the selection", "status_code": 404}
+        if len(headers) > BATCH_MAX:
+            return {
+                "status": "error",
+                "message": f"Selection has more than {BATCH_MAX} pohonch — narrow the date window",
+                "status_code": 400,
+            }
+
+        raw = "|".join(f"{h['id']}:{h.get('updated_at')}" for h in headers)
+        version = hashlib.sha1(raw.encode()).hexdigest()[:16]
+        with _lock:
+            _stats["batches"] += 1
+            cached = sum(
+                1 for h in headers
+                if h["id"] in _cache and _cache[h["id"]]["version"] == str(h.get("updated_at"))
+            )
+
+        if len(headers) == 1:
+            filename = f"pohonch_{headers[0]['pohonch_number']}.pdf"
+        else:
+            filename = f"pohonch_batch_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
+        return {"status": "success", "data": {
+            "filename": filename,
+            "version": version,
+            "count": len(headers),
+            "cached": cached,
+            "chunks": write_pdf(_iter_pages(sb, headers), landscape=True),
+        }}
+    except Exception as e:
+        return {"status": "error", "message": str(e), "status_code": 500}
+
+
+def get_pohonch_pdf_stats() -> dict:
+    """Snapshot of cache size and counters for the metrics endpoint."""
+    with _lock:
+        return {
+            **_stats,
+            "entries": len(_cache),
+            "bytes": _cache_bytes["value"],
+            "max_bytes": PDF_CACHE_MAX_BYTES,
+        }
@@ -4,6 +4,8 @@ List, get, update, sign pohonch records.
 """
 from datetime import datetime, timezone
 from services.supabase_client import get_supabase
+from services.batch_update import decode_cursor, encode_cursor, is_table_missing, optional_rpc
+from services.thread_pool import shared_pool
 
 POHONCH_COLS = (
     "id, pohonch_number, transport_name, transport_gstin, admin_transport_id, "
@@ -16,6 +18,11 @@ POHONCH_COLS = (
 
 PAGE_SIZE = 40
 
+GR_LOOKUP_COLS = (
+    "id, pohonch_number, transport_name, transport_gstin, "
+    "crossing_bill_id, is_signed, is_active, created_at"
+)
+
 
 def _now():
     return datetime.now(timezone.utc).isoformat()
@@ -23,8 +30,79 @@ def _now():
 
 # ─────────────────────────────────────────────────────────────
 # LIST  GET /api/pohonch/list
+# Two paging modes:
+#   • offset  — page / page_size (original behaviour)
+#   • keyset  — pass cursor ("" for the first page); rows are ordered by
+#               (created_at DESC, id DESC) and the next page starts after
+#               next_cursor, so deep pages cost the same as page 1.
+# search_mode: contains (default, ilike %q% on number / transport name) |
+#   prefix — pohonch_number LIKE 'Q%' (pattern-indexed, migration 013)
+# summary: count, signed / unsigned and amount / kaat / pf / dd sums for the
+#   whole filter, from one pohonch_list_summary aggregate that also stands
+#   in for count="exact".  Computed for the FIRST page only (cursor="" or
+#   page=1) — clients keep it while paging, so later pages cost one query.
 # ─────────────────────────────────────────────────────────────
 
+SEARCH_MODES = {"contains", "prefix"}
+SUMMARY_COLS = "is_signed, total_bilties, total_amount, total_kaat, total_pf, total_dd"
+SUMMARY_SCAN_PAGE = 1000
+
+# None = not tried yet, False = RPC missing on this database
+_summary_rpc_available = {"value": None}
+
+
+def _apply_list_filters(query, f: dict):
+    if f["is_active"] is not None:
+        query = query.eq("is_active", f["is_active"])
+    if f["is_signed"] is not None:
+        query = query.eq("is_signed", f["is_signed"])
+    if f["transport_gstin"]:
+        query = query.eq("transport_gstin", f["transport_gstin"])
+    elif f["transport_name"]:
+        query = query.ilike("transport_name", f"%{f['transport_name']}%")
+    if f["search"]:
+        if f["search_mode"] == "prefix":
+            query = query.like("pohonch_number", f"{f['search']}%")
+        else:
+            query = query.or_(
+                f"pohonch_number.ilike.%{f['search']}%,"
+                f"transport_name.ilike.%{f['search']}%"
+            )
+    return query
+
+
+def _list_summary(sb, f: dict) -> dict:
+    return optional_rpc(
+        sb, _summary_rpc_available, "pohonch_list_summary", {f"p_{k}": v for k, v in f.items()},
+        "summing list rows page by page", lambda: _scan_summary(sb, f),
+    )
+
+
+def _scan_summary(sb, f: dict) -> dict:
+    summary = {
+        "count": 0, "signed": 0, "unsigned": 0, "total_bilties": 0,
+        "total_amount": 0.0, "total_kaat": 0.0, "total_pf": 0.0, "total_dd": 0.0,
+    }
+    page = 0
+    while True:
+        lo = page * SUMMARY_SCAN_PAGE
+        batch = _apply_list_filters(
+            sb.table("pohonch").select(SUMMARY_COLS), f
+        ).order("id").range(lo, lo + SUMMARY_SCAN_PAGE - 1).execute().data or []
+        for r in batch:
+            summary["count"] += 1
+            summary["signed" if r.get("is_signed") else "unsigned"] += 1
+            summary["total_bilties"] += int(r.get("total_bilties") or 0)
+            for k in ("total_amount", "total_kaat", "total_pf", "total_dd"):
+                summary[k] += float(r.get(k) or 0)
+        if len(batch) < SUMMARY_SCAN_PAGE:
+            break
+        page += 1
+    for k in ("total_amount", "total_kaat", "total_pf", "total_dd"):
+        summary[k] = round(summary[k], 2)
+    return summary
+
+
 def list_pohonch(
     transport_name: str | None = None,
     transport_gstin: str | None = None,
@@ -33,44 +111,83 @@ def list_pohonch(
     page: int = 1,
     page_size: int = PAGE_SIZE,
     search: str | None = None,
+    cursor: str | None = None,
+    search_mode: str = "contains",
+    summary: bool = True,
 ) -> dict:
-    sb = get_supabase()
+    if search_mode not in SEARCH_MODES:
+        return {"status": "error", "message": f"Invalid search_mode: {search_mode}", "status_code": 400}
 
-    offset = (page - 1) * page_size
-
-    query = (
-        sb.table("pohonch")
-        .select(POHONCH_COLS, count="exact")
-        .order("created_at", desc=True)
-        .range(offset, offset + page_size - 1)
-    )
+    sb = get_supabase()
+    search = (search or "").strip()
+    f = {
+        "is_active": is_active,
+        "is_signed": is_signed,
+        "transport_gstin": (transport_gstin or "").strip().upper() or None,
+        "transport_name": (transport_name or "").strip() or None,
+        "search": (search.upper() if search_mode == "prefix" else search) or None,
+        "search_mode": search_mode,
+    }
 
-    if is_active is not None:
-        query = query.eq("is_active", is_active)
-    if is_signed is not None:
-        query = query.eq("is_signed", is_signed)
-    if transport_gstin:
-        query = query.eq("transport_gstin", transport_gstin.strip().upper())
-    elif transport_name:
-        query = query.ilike("transport_name", f"%{transport_name.strip()}%")
-    if search:
-        query = query.or_(
-            f"pohonch_number.ilike.%{search}%,"
-            f"transport_name.ilike.%{search}%"
+    keyset = cursor is not None
+    summary = summary and (cursor == "" if keyset else page == 1)
+    if keyset or summary:
+        # The summary's count replaces COUNT(*); keyset paging needs no total
+        query = sb.table("pohonch").select(POHONCH_COLS)
+    else:
+        query = sb.table("pohonch").select(POHONCH_COLS, count="exact")
+    query = _apply_list_filters(query, f)
+
+    if keyset:
+        if cursor:
+            try:
+                after_ts, after_id = decode_cursor(cursor)
+            except Exception:
+                return {"status": "error", "message": "Invalid cursor", "status_code": 400}
+            query = query.or_(
+                f'created_at.lt."{after_ts}",'
+                f'and(created_at.eq."{after_ts}",id.lt."{after_id}")'
+            )
+        # One extra row tells whether another page exists
+        query = query.order("created_at", desc=True).order("id", desc=True).limit(page_size + 1)
+    else:
+        offset = (page - 1) * page_size
+        query = (
+            query.order("created_at", desc=True)
+            .order("id", desc=True)
+            .range(offset, offset + page_size - 1)
         )
 
+    summary_future = shared_pool.submit(_list_summary, sb, f) if summary else None
     res = query.execute()
+    totals = summary_future.result() if summary_future else None
     rows = res.data or []
-    total = res.count or 0
-
-    return {
-        "status": "success",
-        "data": rows,
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size if page_size else 1,
-    }
+
+    if keyset:
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        last = rows[-1] if rows else None
+        result = {
+            "status": "success",
+            "data": rows,
+            "total": totals["count"] if totals else None,
+            "page_size": page_size,
+            "has_more": has_more,
+            "next_cursor": encode_cursor(last["created_at"], last["id"]) if has_more and last else None,
+        }
+    else:
+        total = totals["count"] if totals else (res.count or 0)
+        result = {
+            "status": "success",
+            "data": rows,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total + page_size - 1) // page_size if page_size else 1,
+        }
+    if totals is not None:
+        result["summary"] = totals
+    return result
 
 
 # ─────────────────────────────────────────────────────────────
@@ -109,6 +226,56 @@ def get_pohonch_by_number(pohonch_number: str) -> dict:
     return {"status": "success", "data": res.data}
 
 
+# ─────────────────────────────────────────────────────────────
+# GET BY GR  GET /api/pohonch/gr/{gr_no}
+# Point lookup on pohonch_items.gr_no; falls back to a bilty_metadata
+# containment filter when the items table is not installed.
+# ─────────────────────────────────────────────────────────────
+
+def find_pohonch_by_gr(gr_no: str) -> dict:
+    sb = get_supabase()
+    gr_no = (gr_no or "").strip()
+    if not gr_no:
+        return {"status": "error", "message": "gr_no is required", "status_code": 400}
+
+    try:
+        items = sb.table("pohonch_items").select("*").eq("gr_no", gr_no).execute().data or []
+    except Exception as e:
+        if not is_table_missing(e):
+            raise
+        items = None
+
+    if items is None:
+        rows = (
+            sb.table("pohonch")
+            .select(GR_LOOKUP_COLS + ", bilty_metadata")
+            .contains("bilty_metadata", [{"gr_no": gr_no}])
+            .execute()
+        ).data or []
+        data = []
+        for row in rows:
+            meta = row.pop("bilty_metadata", None) or []
+            entry = next((b for b in meta if str(b.get("gr_no", "")) == gr_no), None)
+            data.append({**row, "entry": entry})
+        return {"status": "success", "gr_no": gr_no, "data": data}
+
+    if not items:
+        return {"status": "success", "gr_no": gr_no, "data": []}
+
+    headers = sb.table("pohonch").select(GR_LOOKUP_COLS).in_(
+        "id", [i["pohonch_id"] for i in items]
+    ).execute().data or []
+    by_id = {h["id"]: h for h in headers}
+    data = []
+    for item in items:
+        header = by_id.get(item["pohonch_id"])
+        if not header:
+            continue
+        entry = {k: v for k, v in item.items() if k not in ("pohonch_id", "position", "extra")}
+        data.append({**header, "entry": {**(item.get("extra") or {}), **entry}})
+    return {"status": "success", "gr_no": gr_no, "data": data}
+
+
 # ─────────────────────────────────────────────────────────────
 # UPDATE  PUT /api/pohonch/{pohonch_id}
 # ─────────────────────────────────────────────────────────────
@@ -0,0 +1,66 @@
+"""
+Document Number Allocator
+Atomic counters for pohonch / crossing-bill / invoice numbers, backed by the
+doc_sequences table and next_doc_seq RPC (migrations/011_doc_sequences.sql).
+
+    seq = next_seq(sb, "pohonch:NIE", scan_last)          # → 17
+    first, last = allocate_block(sb, "crossing_bill:CB-202610-", 5, scan_last)
+
+scan_last(sb) returns the highest number already issued for the key (the
+old ilike + order desc + limit 1 lookup).  It runs once per key per process
+to seed the counter above existing documents, and on every call only when
+the RPC is not installed (the old, racy behaviour).
+
+prefetch > 1 reserves a block per round trip and hands numbers out from
+memory; numbers stay unique but a worker restart leaves gaps and the two
+gunicorn workers interleave, so document numbers keep the default of 1.
+"""
+import threading
+from services.batch_update import MISSING, try_optional
+
+_lock = threading.Lock()
+_seeded: set = set()
+_blocks: dict = {}         # key → [next, last] reserved in this process
+
+# None = not tried yet, False = RPC missing on this database
+_rpc_available = {"value": None}
+
+
+def _reserve(sb, key: str, count: int, scan_last) -> int:
+    """Reserve `count` numbers; returns the last one."""
+    floor = 0
+    if key not in _seeded:
+        floor = scan_last(sb)
+    resp = sb.rpc("next_doc_seq", {"p_key": key, "p_count": count, "p_floor": floor}).execute()
+    with _lock:
+        _seeded.add(key)
+    return int(resp.data)
+
+
+def allocate_block(sb, key: str, count: int, scan_last) -> tuple[int, int]:
+    """Reserve `count` consecutive numbers for key; returns (first, last)."""
+    count = max(1, int(count))
+    last = try_optional(
+        _rpc_available, lambda: _reserve(sb, key, count, scan_last),
+        "next_doc_seq RPC not installed — falling back to max-number scan",
+    )
+    if last is not MISSING:
+        return last - count + 1, last
+
+    first = scan_last(sb) + 1
+    return first, first + count - 1
+
+
+def next_seq(sb, key: str, scan_last, prefetch: int = 1) -> int:
+    """Next number for key (see module docstring for prefetch)."""
+    if prefetch > 1:
+        with _lock:
+            block = _blocks.get(key)
+            if block and block[0] <= block[1]:
+                block[0] += 1
+                return block[0] - 1
+        first, last = allocate_block(sb, key, prefetch, scan_last)
+        with _lock:
+            _blocks[key] = [first + 1, last]
+        return first
+    return allocate_block(sb, key, 1, scan_last)[0]
@@ -3,6 +3,7 @@ Staff Service — list, get, create, update, deactivate.
 """
 from datetime import datetime, timezone
 from services.supabase_client import get_supabase
+from services.name_cache import invalidate_names, prime_names
 
 STAFF_COLS = (
     "id, name, post, mobile_number, license_number, "
@@ -79,6 +80,8 @@ def create_staff(data: dict) -> dict:
             "updated_at":     now,
         }
         resp = sb.table("staff").insert(record).execute()
+        if resp.data:
+            prime_names("staff", {resp.data[0]["id"]: resp.data[0].get("name")})
         return {"status": "success", "data": (resp.data or [{}])[0], "message": "Staff created"}
     except Exception as e:
         return {"status": "error", "message": str(e), "status_code": 500}
@@ -93,6 +96,7 @@ def update_staff(staff_id: str, data: dict) -> dict:
             return {"status": "error", "message": "No updatable fields provided", "status_code": 400}
         update["updated_at"] = _now()
         resp = sb.table("staff").update(update).eq("id", staff_id).execute()
+        invalidate_names("staff", [staff_id])
         if not resp.data:
             return {"status": "error", "message": "Staff not found", "status_code": 404}
         return {"status": "success", "data": resp.data[0], "message": "Staff updated"}
@@ -104,6 +108,7 @@ def deactivate_staff(staff_id: str) -> dict:
     try:
         sb = get_supabase()
         resp = sb.table("staff").update({"is_active": False, "updated_at": _now()}).eq("id", staff_id).execute()
+        invalidate_names("staff", [staff_id])
         if not resp.data:
             return {"status": "error", "message": "Staff not found", "status_code": 404}
         return {"status": "success", "message": "Staff deactivated"}
@@ -8,5 +8,10 @@ from concurrent.futures import ThreadPoolExecutor
 
 # Single shared pool — max 10 worker threads for internal parallelism.
 # This is separate from the FastAPI _executor (20 workers) in app.py.
-# Total worst case: 20 (outer) + 10 (inner) = 30 threads — safe for Render.
 shared_pool = ThreadPoolExecutor(max_workers=10)
+
+# Background jobs (services/jobs.py) — long bulk operations that outlive
+# the request.  Kept apart from shared_pool so a job waiting on its own
+# shared_pool fan-out can never starve it.
+# Total worst case: 20 (outer) + 10 (inner) + 2 (jobs) = 32 threads — safe for Render.
+job_pool = ThreadPoolExecutor(max_workers=2)
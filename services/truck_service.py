@@ -1,7 +1,10 @@
 """
 Truck Service — list and get trucks.
+Trucks are written outside this backend; every read refreshes the shared
+name cache so challan / trip lists pick up renamed truck numbers.
 """
 from services.supabase_client import get_supabase
+from services.name_cache import prime_names
 
 TRUCK_COLS = (
     "id, truck_number, truck_type, tyre_count, brand, "
@@ -30,6 +33,7 @@ def list_trucks(
         offset = (page - 1) * page_size
         q = q.order("truck_number").range(offset, offset + page_size - 1)
         resp = q.execute()
+        prime_names("trucks", {t["id"]: t["truck_number"] for t in (resp.data or [])})
         total = resp.count if resp.count is not None else len(resp.data or [])
         return {
             "status": "success",
@@ -51,6 +55,7 @@ def get_truck(truck_id: str) -> dict:
         resp = sb.table("trucks").select(TRUCK_COLS).eq("id", truck_id).single().execute()
         if not resp.data:
             return {"status": "error", "message": "Truck not found", "status_code": 404}
+        prime_names("trucks", {resp.data["id"]: resp.data["truck_number"]})
         return {"status": "success", "data": resp.data}
     except Exception as e:
         return {"status": "error", "message": str(e), "status_code": 500}